@@ -0,0 +1,7 @@
+#!encoding: utf-8
+
+"""
+Benchmark suite of the library.
+
+Run with: PYTHONPATH=src python -m benchmarks --help
+"""
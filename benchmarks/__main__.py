@@ -0,0 +1,8 @@
+#!encoding: utf-8
+
+import sys
+
+from .runner import main
+
+
+sys.exit(main())
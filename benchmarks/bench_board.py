@@ -0,0 +1,30 @@
+#!encoding: utf-8
+
+"""
+Benchmarks of saving and restoring the state of a board.
+"""
+from .bench_snapshot import make_board
+from .runner import benchmark
+
+
+@benchmark("board.create_memento", players=[2, 8])
+def create_memento(players):
+    return make_board(players).create_memento
+
+
+@benchmark("board.set_memento", players=[2, 8])
+def set_memento(players):
+    board = make_board(players)
+    memento = board.create_memento()
+    return lambda: board.set_memento(memento)
+
+
+@benchmark("board.checkpoint", players=[2, 8])
+def checkpoint(players):
+    board = make_board(players)
+    deck = board.search_component("name == 'Deck0'")
+    def func():
+        checkpoint = board.checkpoint()
+        deck.draw(5)
+        board.rollback(checkpoint)
+    return func
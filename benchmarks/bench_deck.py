@@ -0,0 +1,54 @@
+#!encoding: utf-8
+
+"""
+Benchmarks of deck operations. Cards taken from deck are put back, so that
+every call works on a deck of the same size.
+"""
+from gagarin.core.deck import Deck
+from gagarin.core.card import Card
+
+from .runner import benchmark
+
+
+def make_deck(size):
+    deck = Deck(name="Deck")
+    for i in range(size):
+        deck.add(Card(value=i % 13, colour=i // 13 % 4))
+    return deck
+
+
+@benchmark("deck.draw", size=[52, 520], number=[1, 10])
+def draw(size, number):
+    deck = make_deck(size)
+    def func():
+        for card in deck.draw(number):
+            deck.add(card, "bottom")
+    return func
+
+
+@benchmark("deck.deal", size=[52, 520])
+def deal(size):
+    deck = make_deck(size)
+    def func():
+        for pile in deck.deal(4, size // 4):
+            for card in pile:
+                deck.add(card, "bottom")
+    return func
+
+
+@benchmark("deck.search", size=[52, 520], query=["function", "string"])
+def search(size, query):
+    deck = make_deck(size)
+    if query == "function":
+        predicate = lambda c: c.get("value") == 3
+    else:
+        predicate = "value == 3"
+    def func():
+        for card in deck.search(predicate):
+            deck.add(card, "bottom")
+    return func
+
+
+@benchmark("deck.shuffle", size=[52, 520])
+def shuffle(size):
+    return make_deck(size).shuffle
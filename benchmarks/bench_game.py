@@ -0,0 +1,126 @@
+#!encoding: utf-8
+
+"""
+Throughput of full games of Battle, of playouts from the start of games and
+of alpha-beta searches, and overhead of engine on a game doing nothing. Games
+are seeded, or random module is, so that every call plays the same game.
+"""
+import random
+
+from gagarin.core.agent import Agent
+from gagarin.core.board import Board
+from gagarin.core.game import Game
+from gagarin.core.games.battle import Battle, BattleAgent
+from gagarin.core.games.nim import Nim, NimAgent
+from gagarin.core.alphabeta import AlphaBetaAgent
+
+from .runner import benchmark
+
+
+def make_game(turns, seed=1):
+    if seed is None:
+        #Unseeded games draw from random module
+        random.seed(1)
+    game = Battle(turns, seed=seed)
+    game.add_agent(BattleAgent("A"))
+    game.add_agent(BattleAgent("B"))
+    return game
+
+
+class NoopGame(Game):
+    """
+    Game whose phases do nothing but ask each agent in turn.
+    """
+
+    def __init__(self, phases, seed=None):
+        super(NoopGame, self).__init__(None, seed)
+        self.add_phase("main")
+        self.set_phases_order(["main"])
+        self._phases_count = phases
+        self._remaining = 0
+
+    def setup_board(self):
+        self._remaining = self._phases_count
+        return Board()
+
+    def prepare_phase(self, phase):
+        self._remaining -= 1
+        if self._remaining < 0:
+            self.declare_end()
+
+
+class NoopAgent(Agent):
+    def take_actions(self, game, phase):
+        return [ ]
+
+
+@benchmark("game.noop", unit="phase", loop=["mainloop", "step"],
+        seed=[None, 1])
+def noop(loop, seed, phases=1000):
+    game = NoopGame(phases, seed)
+    game.add_agent(NoopAgent("A"))
+    game.add_agent(NoopAgent("B"))
+    if loop == "mainloop":
+        return game.mainloop, phases
+    def func():
+        decisions = game.reset()
+        while decisions:
+            decisions = game.step([[ ] for decision in decisions])
+    return func, phases
+
+
+@benchmark("game.battle.mainloop", unit="game", turns=[100, 1000],
+        seed=[1, None])
+def mainloop(turns, seed):
+    return lambda: make_game(turns, seed).mainloop()
+
+
+@benchmark("game.battle.step", unit="game", turns=[100, 1000], seed=[1, None])
+def step(turns, seed):
+    def func():
+        game = make_game(turns, seed)
+        decisions = game.reset()
+        while decisions:
+            decisions = game.step([d.get_agent().take_actions(game,
+                    d.get_phase()) for d in decisions])
+    return func
+
+
+@benchmark("game.battle.playout", unit="playout", turns=[100, 1000])
+def playout(turns):
+    game = make_game(turns)
+    game.reset()
+    checkpoint = game.checkpoint()
+    def func():
+        game.playout()
+        game.restore(checkpoint)
+    return func
+
+
+@benchmark("game.nim.playout", unit="playout", heaps=[3, 6])
+def nim_playout(heaps):
+    game = Nim(tuple(range(3, 3 + heaps)), seed=1)
+    game.add_agent(NimAgent("A"))
+    game.add_agent(NimAgent("B"))
+    game.reset()
+    checkpoint = game.checkpoint()
+    def func():
+        game.playout()
+        game.restore(checkpoint)
+    return func
+
+
+@benchmark("game.nim.alphabeta", unit="node", depth=[2, 4])
+def nim_alphabeta(depth):
+    agent = AlphaBetaAgent("A", max_depth=depth)
+    game = Nim((3, 4, 5, 6), seed=1)
+    game.add_agent(agent)
+    game.add_agent(NimAgent("B"))
+    game.reset()
+    def func():
+        #Each search starts from an empty transposition table
+        agent.reset()
+        agent.take_actions(game, "main")
+    #Searches are identical: rate in nodes per second
+    func()
+    return func, agent.get_statistics().last_nodes
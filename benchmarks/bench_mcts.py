@@ -0,0 +1,90 @@
+#!encoding: utf-8
+
+"""
+Scaling of parallel MCTS with the number of worker processes, measured in
+iterations per second on the first decision of Nim.
+
+Run with: PYTHONPATH=src python -m benchmarks.bench_mcts [max workers]
+"""
+import atexit
+import concurrent.futures
+import os
+import sys
+
+from gagarin.core.games.nim import Nim, NimAgent
+from gagarin.core.mcts import MCTSAgent, ParallelMCTSAgent
+
+from .runner import benchmark
+
+
+HEAPS = (3, 4, 5, 6)
+#Worker pools of registered benchmarks by number of workers, kept for the run
+_executors = { }
+
+
+@atexit.register
+def _shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown()
+    _executors.clear()
+
+
+def make_game(agent):
+    game = Nim(HEAPS, seed=1)
+    game.add_agent(agent)
+    game.add_agent(NimAgent("Opponent"))
+    game.reset()
+    return game
+
+
+def make_search(agent):
+    game = make_game(agent)
+    def func():
+        #Search from scratch, not from the tree of the previous call
+        agent.reset()
+        agent.take_actions(game, "main")
+    return func
+
+
+def search(agent):
+    agent.take_actions(make_game(agent), "main")
+    return agent.get_statistics().get_iterations_per_second()
+
+
+@benchmark("mcts.search", unit="search")
+def serial_search(iterations=400):
+    agent = MCTSAgent("MCTS", iterations=iterations)
+    return make_search(agent)
+
+
+@benchmark("mcts.parallel_search", unit="search", mode=["root", "leaf"],
+        workers=[2])
+def parallel_search(mode, workers, iterations=400):
+    if workers not in _executors:
+        _executors[workers] = concurrent.futures.ProcessPoolExecutor(workers)
+    agent = ParallelMCTSAgent("MCTS", _executors[workers], workers, mode,
+            iterations=iterations)
+    return make_search(agent)
+
+
+def main(max_workers=None, time_limit=2.):
+    max_workers = max_workers or os.cpu_count()
+    serial = search(MCTSAgent("MCTS", time_limit=time_limit))
+    print("{:<8}{:>8}{:>16}{:>10}".format("mode", "workers", "iterations/s",
+            "speedup"))
+    print("{:<8}{:>8}{:>16.1f}{:>10.2f}".format("serial", 1, serial, 1.))
+    workers = 1
+    while workers <= max_workers:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            for mode in ["root", "leaf"]:
+                rate = search(ParallelMCTSAgent("MCTS", executor, workers,
+                        mode, time_limit=time_limit))
+                print("{:<8}{:>8}{:>16.1f}{:>10.2f}".format(mode, workers,
+                        rate, rate / serial))
+        if workers == max_workers:
+            break
+        workers = min(workers * 2, max_workers)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
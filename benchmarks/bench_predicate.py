@@ -0,0 +1,42 @@
+#!encoding: utf-8
+
+"""
+Benchmarks of predicates: string queries of growing complexity against
+functions.
+"""
+from gagarin.core.card import Card
+from gagarin.core.predicate import Predicate
+
+from .runner import benchmark
+
+
+def make_query(terms):
+    """
+    Create a query joining conditions, all of them true for make_card.
+
+    :param terms: number of conditions
+    :type terms: int
+    :rtype: str
+    """
+    conditions = ["name == 'Card'", "1 <= value <= 10", "colour == 'Heart'",
+            "cost < 4"]
+    return " and ".join(conditions[i % len(conditions)]
+            for i in range(terms))
+
+
+def make_card():
+    return Card(name="Card", value=5, colour="Heart", cost=2)
+
+
+@benchmark("predicate.query", terms=[1, 4, 16])
+def query(terms):
+    predicate = Predicate(make_query(terms))
+    card = make_card()
+    return lambda: predicate(card)
+
+
+@benchmark("predicate.function")
+def function():
+    predicate = Predicate(lambda c: c.get("name") == "Card")
+    card = make_card()
+    return lambda: predicate(card)
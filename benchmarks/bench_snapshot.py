@@ -0,0 +1,73 @@
+#!encoding: utf-8
+
+"""
+Compare size and speed of binary snapshots against raw pickle of a board.
+
+Run with: PYTHONPATH=src python -m benchmarks.bench_snapshot
+"""
+import pickle
+import timeit
+
+from gagarin.core.board import Board
+from gagarin.core.zone import Zone
+from gagarin.core.deck import Deck
+from gagarin.core.card import Card
+from gagarin.core.die import Die, Face
+from gagarin.core.token import Token, TokenPool
+from gagarin.core import snapshot
+
+from .runner import benchmark
+
+
+def make_board(players=4):
+    board = Board(name="Board", turn=0)
+    faces = [Face(value=v) for v in range(1, 7)]
+    for p in range(players):
+        deck = Deck(name="Deck{}".format(p))
+        for colour in ["Spade", "Heart", "Diamond", "Club"]:
+            for value in range(1, 14):
+                deck.add(Card(value=value, colour=colour, cost=value % 4))
+        hand = Zone(name="Hand{}".format(p))
+        for card in deck.draw(5):
+            hand.add(card)
+        bank = TokenPool(name="Bank{}".format(p))
+        bank.put(Token(value=1), 20)
+        bank.put(Token(value=5), 4)
+        for c in [deck, hand, bank, Die(faces, colour="Red")]:
+            board.add(c)
+    return board
+
+
+@benchmark("snapshot.dumps", compression=[None, "zlib", "lzma"])
+def dumps(compression):
+    board = make_board()
+    return lambda: snapshot.dumps(board, compression)
+
+
+@benchmark("snapshot.loads", compression=[None, "zlib", "lzma"])
+def loads(compression):
+    data = snapshot.dumps(make_board(), compression)
+    return lambda: snapshot.loads(data)
+
+
+def main(number=200):
+    board = make_board()
+    raw = pickle.dumps(vars(board))
+    print("{:<16}{:>10}{:>14}{:>14}".format("format", "bytes", "dump (us)",
+            "load (us)"))
+    t_dump = timeit.timeit(lambda: pickle.dumps(vars(board)), number=number)
+    t_load = timeit.timeit(lambda: pickle.loads(raw), number=number)
+    print("{:<16}{:>10}{:>14.1f}{:>14.1f}".format("pickle", len(raw),
+            t_dump / number * 1e6, t_load / number * 1e6))
+    for compression in [None, "zlib", "lzma"]:
+        data = snapshot.dumps(board, compression)
+        t_dump = timeit.timeit(lambda: snapshot.dumps(board, compression),
+                number=number)
+        t_load = timeit.timeit(lambda: snapshot.loads(data), number=number)
+        print("{:<16}{:>10}{:>14.1f}{:>14.1f}".format(
+                "snapshot/{}".format(compression), len(data),
+                t_dump / number * 1e6, t_load / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!encoding: utf-8
+
+"""
+Benchmarks of searches in trees of zones.
+"""
+from gagarin.core.zone import Zone
+from gagarin.core.card import Card
+
+from .runner import benchmark
+
+
+def make_tree(depth, width):
+    """
+    Create a tree of zones: each zone holds width sub-zones down to depth,
+    zones of the last level holding width cards.
+
+    :rtype: Zone
+    """
+    root = Zone(name="Root")
+    level = [root]
+    for d in range(depth):
+        next_level = [ ]
+        for zone in level:
+            for w in range(width):
+                if d == depth - 1:
+                    zone.add(Card(name="Card", value=w))
+                else:
+                    child = Zone(name="Zone{}".format(w))
+                    zone.add(child)
+                    next_level.append(child)
+        level = next_level
+    return root
+
+
+@benchmark("zone.search_all_components", depth=[2, 4], width=[4, 8],
+        query=["function", "string"])
+def search_all_components(depth, width, query):
+    tree = make_tree(depth, width)
+    if query == "function":
+        predicate = lambda c: c.get("value") == 0
+    else:
+        predicate = "value == 0"
+    return lambda: tree.search_all_components(predicate)
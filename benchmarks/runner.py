@@ -0,0 +1,210 @@
+#!encoding: utf-8
+
+"""
+Registration, measurement and comparison of benchmarks.
+
+A benchmark is a setup function registered with the benchmark decorator: it
+receives one combination of the parameters of benchmark and returns the
+function to be timed, which takes no argument, or a tuple of this function
+and the number of units it processes per call (nodes of a search...) for
+rates. Results are saved as JSON and compared against a baseline saved by a
+previous run, benchmarks slower than baseline by more than a tolerance being
+reported as regressions.
+"""
+import importlib
+import itertools
+import json
+import platform
+import sys
+import timeit
+
+
+#Modules of the suite, imported by load
+SUITES = ["benchmarks.bench_predicate", "benchmarks.bench_zone",
+        "benchmarks.bench_deck", "benchmarks.bench_board",
+        "benchmarks.bench_game", "benchmarks.bench_snapshot",
+        "benchmarks.bench_mcts"]
+
+_registry = [ ]
+
+
+def benchmark(name, unit="call", **params):
+    """
+    Register a benchmark.
+
+    Usage::
+
+        @benchmark("deck.shuffle", size=[52, 520])
+        def shuffle(size):
+            deck = make_deck(size)
+            return deck.shuffle
+
+    :param name: name of benchmark
+    :type name: str
+    :param unit: what a call of timed function does, for rates
+    :type unit: str
+    :param params: lists of values of each parameter
+    """
+    def decorator(setup):
+        _registry.append((name, unit, setup, params))
+        return setup
+    return decorator
+
+
+def load(suites=None):
+    """
+    Import modules of benchmarks.
+
+    :param suites: names of modules, SUITES by default
+    :type suites: list
+    :return: registered benchmarks
+    :rtype: list
+    """
+    for suite in suites or SUITES:
+        importlib.import_module(suite)
+    return list(_registry)
+
+
+def get_key(result):
+    """
+    Identify a result by benchmark name and parameters.
+
+    :rtype: str
+    """
+    return "{}[{}]".format(result["name"], ",".join("{}={}".format(k, v)
+            for k, v in sorted(result["params"].items())))
+
+
+def measure(func, repeat=5, min_time=0.2):
+    """
+    Time a function.
+
+    :param func: function without argument
+    :type func: callable
+    :param repeat: number of measures, the fastest one is kept
+    :type repeat: int
+    :param min_time: minimum duration of a measure in seconds
+    :type min_time: float
+    :return: seconds per call
+    :rtype: float
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed,
+                1e-9) * 1.2))
+    best = elapsed / number
+    for i in range(repeat - 1):
+        best = min(best, timer.timeit(number) / number)
+    return best
+
+
+def run(benchmarks, pattern=None, repeat=5, min_time=0.2, output=None):
+    """
+    Run benchmarks.
+
+    :param benchmarks: registered benchmarks, see load
+    :type benchmarks: list
+    :param pattern: run only benchmarks whose key contains this string
+    :type pattern: str
+    :param output: text file where progress is printed
+    :return: results: dictionaries with name, params, unit, seconds and rate
+    :rtype: list
+    """
+    results = [ ]
+    for name, unit, setup, params in benchmarks:
+        names = list(params)
+        for values in itertools.product(*[params[n] for n in names]):
+            result = {"name": name, "params": dict(zip(names, values)),
+                    "unit": unit}
+            if pattern is not None and pattern not in get_key(result):
+                continue
+            func = setup(**result["params"])
+            count = 1
+            if isinstance(func, tuple):
+                func, count = func
+            seconds = measure(func, repeat, min_time)
+            result["seconds"] = seconds
+            result["rate"] = count / seconds
+            results.append(result)
+            if output is not None:
+                output.write("{:<60} {:>14.3f} us {:>14.1f} {}/s\n".format(
+                        get_key(result), seconds * 1e6, result["rate"], unit))
+    return results
+
+
+def dump(results, file):
+    """
+    Save results as JSON, along with the platform they were measured on.
+    """
+    json.dump({"python": platform.python_version(),
+            "machine": platform.machine(), "platform": platform.platform(),
+            "results": results}, file, indent=1, sort_keys=True)
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compare results against a baseline.
+
+    :param results: results of run
+    :type results: list
+    :param baseline: content of a saved JSON file
+    :type baseline: dict
+    :param tolerance: relative slowdown allowed
+    :type tolerance: float
+    :return: tuples (key, baseline seconds, seconds, ratio) of all results
+        found in baseline, and keys of regressions
+    :rtype: tuple
+    """
+    reference = {get_key(r): r["seconds"] for r in baseline["results"]}
+    comparisons = [ ]
+    regressions = [ ]
+    for result in results:
+        key = get_key(result)
+        if key not in reference:
+            continue
+        ratio = result["seconds"] / reference[key]
+        comparisons.append((key, reference[key], result["seconds"], ratio))
+        if ratio > 1. + tolerance:
+            regressions.append(key)
+    return comparisons, regressions
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="benchmarks",
+            description="Run benchmarks of the library.")
+    parser.add_argument("-k", "--filter", help="run benchmarks whose name "
+            "and parameters contain this string")
+    parser.add_argument("-o", "--output", help="save results to JSON file")
+    parser.add_argument("-b", "--baseline", help="compare results against "
+            "JSON file saved by a previous run")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.2,
+            help="relative slowdown allowed against baseline (default: 0.2)")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+            help="number of measures of each benchmark (default: 5)")
+    parser.add_argument("--min-time", type=float, default=0.2,
+            help="minimum duration of a measure in seconds (default: 0.2)")
+    args = parser.parse_args(argv)
+    results = run(load(), args.filter, args.repeat, args.min_time,
+            sys.stdout)
+    if args.output:
+        with open(args.output, "w") as f:
+            dump(results, f)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparisons, regressions = compare(results, baseline,
+                args.tolerance)
+        print()
+        for key, reference, seconds, ratio in comparisons:
+            print("{:<60} {:>7.2f}x{}".format(key, ratio, "  REGRESSION"
+                    if key in regressions else ""))
+        if regressions:
+            print("\n{} regression(s) above {:.0%} tolerance".format(
+                    len(regressions), args.tolerance))
+            return 1
+    return 0
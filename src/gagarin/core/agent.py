@@ -3,25 +3,243 @@
 """
 Base classes for agents and actions.
 """
+import asyncio
+import itertools
+import random
+import weakref
 
 class Agent():
     def __init__(self, name):
         self._name = name
+        self._random = None
 
     def get_name(self):
         return self._name
 
+    def set_random(self, generator):
+        """
+        Set the random generator of agent: games with a seed give each agent
+        its own generator.
+
+        :param generator: random generator, None to use random module
+        :type generator: random.Random
+        """
+        self._random = generator
+
+    def get_random(self):
+        """
+        Get the random generator agent shall use for its decisions.
+
+        :rtype: random.Random
+        """
+        return self._random or random
+
     def reset(self):
         pass
 
     def take_actions(self, game, phase):
         raise NotImplementedError
 
+    def take_actions_batch(self, games, phase):
+        """
+        Take actions in several games at once.
+
+        Defaults to take_actions for each game: agents evaluating a model
+        should override it to evaluate all games in a single batch.
+
+        :param games: games in which agent shall take actions
+        :type games: list
+        :param phase: current phase of all games
+        :type phase: str
+        :return: actions for each game
+        :rtype: list
+        """
+        return [self.take_actions(game, phase) for game in games]
+
+    async def atake_actions(self, game, phase):
+        """
+        Take actions in asynchronous game loop.
+
+        Defaults to take_actions in a separate thread, so that agents of a
+        simultaneous phase think concurrently: agents waiting for remote
+        players should override it.
+        """
+        return await asyncio.to_thread(self.take_actions, game, phase)
+
+
+#Interned actions by class and properties
+_interned = weakref.WeakValueDictionary()
+
+
+def _make_action(cls, properties):
+    return cls(**dict(properties))
+
 
 class Action():
-    def __init__(self, **properties):
+    """
+    Action of an agent: immutable record of named properties.
+
+    Actions are interned: creating an action with the same properties as an
+    existing one returns the existing instance, so that actions are compared
+    by identity and hashed in constant time. Properties must be hashable.
+    """
+    __slots__ = ("_properties", "_hash", "__weakref__")
+
+    def __new__(cls, **properties):
+        properties = tuple(sorted(properties.items()))
+        key = (cls, properties)
+        try:
+            action = _interned.get(key)
+        except TypeError:
+            raise TypeError("Action properties must be hashable: {}"
+                    .format(dict(properties)))
+        if action is None:
+            action = object.__new__(cls)
+            object.__setattr__(action, "_properties", properties)
+            object.__setattr__(action, "_hash", hash(key))
+            _interned[key] = action
+        return action
+
+    def __getattr__(self, name):
+        if not name.startswith("_"):
+            for key, value in self._properties:
+                if key == name:
+                    return value
+        raise AttributeError("{!r} has no property {!r}".format(self, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Action is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Action is immutable")
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        #Unpickled actions are interned in the receiving process
+        return (_make_action, (type(self), self._properties))
+
+    def get(self, name, default=None):
+        """
+        Get a property of action.
+
+        :param name: name of property
+        :type name: str
+        :param default: value returned if action has no such property
         """
-        Constructor.
+        for key, value in self._properties:
+            if key == name:
+                return value
+        return default
+
+    def get_properties(self):
+        """
+        Get properties of action.
+
+        :rtype: dict
         """
-        for key, value in properties.items():
-            setattr(self, key, value)
+        return dict(self._properties)
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+                "{}={!r}".format(key, value)
+                for key, value in self._properties))
+
+
+class ActionSpace():
+    """
+    Finite set of actions of a game, numbered by dense integer ids.
+
+    Ids range from 0 to len(space) - 1 and can index arrays of policies or
+    visit counts, or replace actions sent to other processes.
+    """
+
+    def __init__(self, actions):
+        """
+        Initializer.
+
+        :param actions: all actions of game, in order of ids; any hashable
+            values can be used although Action is preferred
+        :type actions: iterable
+        """
+        self._actions = tuple(actions)
+        self._ids = {action: i for i, action in enumerate(self._actions)}
+        if len(self._ids) != len(self._actions):
+            raise ValueError("Duplicate actions in action space")
+
+    @classmethod
+    def product(cls, **domains):
+        """
+        Create the space of actions having all combinations of values.
+
+        Ids follow the order of keyword arguments, the last one varying
+        fastest::
+
+            ActionSpace.product(kind=["play", "discard"], card=range(52))
+
+        :rtype: ActionSpace
+        """
+        names = list(domains)
+        return cls(Action(**dict(zip(names, values))) for values in
+                itertools.product(*[domains[name] for name in names]))
+
+    def __len__(self):
+        return len(self._actions)
+
+    def __iter__(self):
+        return iter(self._actions)
+
+    def __contains__(self, action):
+        try:
+            return action in self._ids
+        except TypeError:
+            return False
+
+    def __reduce__(self):
+        return (ActionSpace, (self._actions,))
+
+    def encode(self, action):
+        """
+        Get the id of an action.
+
+        :rtype: int
+        """
+        try:
+            return self._ids[action]
+        except (KeyError, TypeError):
+            raise ValueError("Action not in space: {!r}".format(action))
+
+    def decode(self, index):
+        """
+        Get the action of an id.
+
+        :param index: id of action
+        :type index: int
+        """
+        if index < 0:
+            raise IndexError("Negative action id: {}".format(index))
+        return self._actions[index]
+
+    def encode_all(self, actions):
+        """
+        Get the ids of actions.
+
+        :rtype: list
+        """
+        ids = self._ids
+        try:
+            return [ids[action] for action in actions]
+        except (KeyError, TypeError):
+            raise ValueError("Actions not in space: {!r}".format(actions))
+
+    def decode_all(self, indices):
+        """
+        Get the actions of ids.
+
+        :rtype: list
+        """
+        return [self.decode(index) for index in indices]
+
+    def __repr__(self):
+        return "ActionSpace({} actions)".format(len(self._actions))
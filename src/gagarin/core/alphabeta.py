@@ -0,0 +1,354 @@
+#!encoding: utf-8
+
+"""
+Alpha-beta search agent for deterministic games of perfect information
+between two players.
+
+The agent searches moves by negamax with alpha-beta pruning and iterative
+deepening. Moves are played through Game.step and undone with Game.checkpoint
+and Game.restore, which roll back the changes of the board: games declared
+deterministic (see Game.deterministic) do not save their random streams at
+each node. Results are
+stored in a bounded transposition table indexed by Game.get_state_hash, and
+moves are ordered by the best move of table, then killer moves and history
+heuristic.
+
+Values are given from the point of view of the agent to decide: an agent
+deciding several times in a row keeps its point of view. Agents of a
+simultaneous phase are searched as if they decided in turn.
+"""
+import time
+
+from .agent import Agent
+from .clock import Deadline
+
+
+#Value of a won game, decreased by its number of moves
+WIN = 1000000
+
+#Bounds of values stored in transposition table
+_EXACT = 0
+_LOWER = 1
+_UPPER = 2
+
+
+#Values of games solved by search
+_SOLVED = WIN // 2
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _to_table(value, ply):
+    #Solved values are stored relative to the state, not to the root
+    if value >= _SOLVED:
+        return value + ply
+    if value <= -_SOLVED:
+        return value - ply
+    return value
+
+
+def _from_table(value, ply):
+    if value >= _SOLVED:
+        return value - ply
+    if value <= -_SOLVED:
+        return value + ply
+    return value
+
+
+class AlphaBetaStatistics():
+    """
+    Effort of searches of an agent.
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.nodes = 0
+        self.elapsed = 0.
+        self.last_nodes = 0
+        self.last_depth = 0
+        self.last_value = 0
+
+    def update(self, nodes, elapsed, depth, value):
+        """
+        Account for a search.
+
+        :param nodes: number of states visited
+        :type nodes: int
+        :param elapsed: duration of search in seconds
+        :type elapsed: float
+        :param depth: depth of last completed iteration
+        :type depth: int
+        :param value: value of best move at this depth
+        :type value: float
+        """
+        self.searches += 1
+        self.nodes += nodes
+        self.elapsed += elapsed
+        self.last_nodes = nodes
+        self.last_depth = depth
+        self.last_value = value
+
+    def get_nodes_per_second(self):
+        """
+        Get mean number of visited states per second over all searches.
+
+        :rtype: float
+        """
+        return self.nodes / self.elapsed if self.elapsed else 0.
+
+    def __repr__(self):
+        return "AlphaBetaStatistics(searches={}, nodes={}, elapsed={:.6f}, " \
+                "nodes_per_second={:.1f})".format(self.searches, self.nodes,
+                self.elapsed, self.get_nodes_per_second())
+
+
+class AlphaBetaAgent(Agent):
+    """
+    Agent choosing its actions by alpha-beta search.
+
+    Each decision is searched with increasing depths until the maximum depth
+    is reached, the game is solved, or the time limit or deadline of game
+    (see Game.set_time_control) expires. The best move of the last completed
+    depth is played. Without limit, the game is searched to its end. The
+    agent plays a single action per decision.
+
+    The game itself is searched, then restored: see Game.searching.
+    """
+
+    def __init__(self, name, max_depth=None, time_limit=None,
+            table_size=1 << 16):
+        """
+        Initializer.
+
+        :param name: name of agent
+        :type name: str
+        :param max_depth: maximum number of moves searched ahead
+        :type max_depth: int
+        :param time_limit: time per decision in seconds
+        :type time_limit: float
+        :param table_size: number of entries of transposition table
+        :type table_size: int
+        """
+        super(AlphaBetaAgent, self).__init__(name)
+        self._max_depth = max_depth
+        self._time_limit = time_limit
+        self._table_size = table_size
+        self._table = [None] * table_size
+        self._killers = { }
+        self._history = { }
+        self._statistics = AlphaBetaStatistics()
+        self._nodes = 0
+        self._limits = ()
+        self._complete = True
+
+    def reset(self):
+        self._table = [None] * self._table_size
+        self._killers = { }
+        self._history = { }
+
+    def __getstate__(self):
+        #Copies sent to other processes start with empty tables
+        state = self.__dict__.copy()
+        state["_table"] = None
+        state["_killers"] = { }
+        state["_history"] = { }
+        state["_limits"] = ()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._table = [None] * self._table_size
+
+    def get_statistics(self):
+        """
+        Get effort of searches of agent.
+
+        :rtype: AlphaBetaStatistics
+        """
+        return self._statistics
+
+    def evaluate(self, game, agent):
+        """
+        Evaluate a state of game which is not searched further.
+
+        Ended games are evaluated by scores. Games still running are
+        evaluated as a draw: override it to use a heuristic, whose values
+        shall stay below WIN / 2 in absolute value.
+
+        :param game: game in state to be evaluated
+        :type game: Game
+        :param agent: agent from whose point of view state is evaluated
+        :type agent: Agent
+        :rtype: float
+        """
+        if not game.is_ended():
+            return 0
+        scores = game.get_scores()
+        own = scores[agent.get_name()]
+        other = max(score for name, score in scores.items()
+                if name != agent.get_name())
+        if own > other:
+            return WIN
+        if own < other:
+            return -WIN
+        return 0
+
+    def take_actions(self, game, phase):
+        actions = game.list_legal_actions(phase, self)
+        if len(actions) <= 1:
+            return actions
+        deadline = game.get_deadline(self)
+        self._limits = (Deadline(self._time_limit), deadline)
+        self._nodes = 0
+        self._killers = { }
+        board = game.get_board()
+        recording = board.is_recording()
+        start = time.perf_counter()
+        best = actions[0]
+        value = 0
+        depth = 0
+        with game.searching():
+            checkpoint = game.checkpoint()
+            try:
+                while self._max_depth is None or depth < self._max_depth:
+                    try:
+                        result = self._search_root(game, depth + 1)
+                    except _Timeout:
+                        break
+                    depth += 1
+                    value, best, complete = result
+                    deadline.propose([best])
+                    #Game solved, or searched to its end
+                    if complete or abs(value) >= _SOLVED:
+                        break
+            finally:
+                game.restore(checkpoint)
+                if not recording:
+                    board.commit()
+        self._statistics.update(self._nodes, time.perf_counter() - start,
+                depth, value)
+        return [best]
+
+    def _search_root(self, game, depth):
+        """
+        Search current state to given depth.
+
+        :return: value, best move and whether no state was cut by depth
+        :rtype: tuple
+        """
+        self._complete = True
+        value, move = self._negamax(game, depth, 0, -WIN - 1, WIN + 1)
+        return value, move, self._complete
+
+    def _negamax(self, game, depth, ply, alpha, beta):
+        """
+        Search a state with pending decisions.
+
+        :return: value from the point of view of deciding agent, best move
+        :rtype: tuple
+        """
+        self._nodes += 1
+        if self._nodes % 256 == 0:
+            for limit in self._limits:
+                if limit.expired():
+                    raise _Timeout
+        decision = game.get_pending_decisions()[0]
+        agent = decision.get_agent()
+        if depth == 0:
+            self._complete = False
+            return self.evaluate(game, agent), None
+        key = game.get_state_hash()
+        slot = key % self._table_size
+        entry = self._table[slot]
+        table_move = None
+        if entry is not None and entry[0] == key:
+            table_move = entry[4]
+            if entry[1] >= depth:
+                value = _from_table(entry[2], ply)
+                flag = entry[3]
+                if flag == _EXACT or (flag == _LOWER and value >= beta) or \
+                        (flag == _UPPER and value <= alpha):
+                    if not entry[5]:
+                        self._complete = False
+                    return value, table_move
+        alpha_origin = alpha
+        complete = self._complete
+        self._complete = True
+        actions = game.list_legal_actions(decision.get_phase(), agent)
+        checkpoint = game.checkpoint()
+        best = -WIN - 1
+        best_move = None
+        for action in self._order(actions, table_move, ply):
+            game.step([[ ] if action is None else [action]])
+            try:
+                value = self._child_value(game, agent, depth, ply, alpha,
+                        beta)
+            finally:
+                game.restore(checkpoint)
+            if value > best:
+                best = value
+                best_move = action
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        if action is not None:
+                            self._on_cutoff(action, depth, ply)
+                        break
+        if best <= alpha_origin:
+            flag = _UPPER
+        elif best >= beta:
+            flag = _LOWER
+        else:
+            flag = _EXACT
+        if entry is None or entry[0] != key or depth >= entry[1]:
+            self._table[slot] = (key, depth, _to_table(best, ply), flag,
+                    best_move, self._complete)
+        self._complete = complete and self._complete
+        return best, best_move
+
+    def _child_value(self, game, agent, depth, ply, alpha, beta):
+        """
+        Get value of state after a move, from the point of view of agent who
+        moved.
+        """
+        decisions = game.get_pending_decisions()
+        if not decisions:
+            value = self.evaluate(game, agent)
+            #Quicker wins and slower losses are preferred
+            if value >= _SOLVED:
+                return value - ply - 1
+            if value <= -_SOLVED:
+                return value + ply + 1
+            return value
+        if decisions[0].get_agent() is agent:
+            return self._negamax(game, depth - 1, ply + 1, alpha, beta)[0]
+        return -self._negamax(game, depth - 1, ply + 1, -beta, -alpha)[0]
+
+    def _order(self, actions, table_move, ply):
+        """
+        Order moves: best move of table, killer moves of ply, then by
+        history heuristic.
+        """
+        if not actions:
+            return [None]
+        history = self._history
+        first = [ ]
+        if table_move is not None and table_move in actions:
+            first.append(table_move)
+        for killer in self._killers.get(ply, ()):
+            if killer not in first and killer in actions:
+                first.append(killer)
+        rest = [a for a in actions if a not in first]
+        rest.sort(key=lambda a: -history.get(a, 0))
+        return first + rest
+
+    def _on_cutoff(self, action, depth, ply):
+        killers = self._killers.get(ply)
+        if killers is None:
+            self._killers[ply] = [action]
+        elif action not in killers:
+            killers.insert(0, action)
+            del killers[2:]
+        self._history[action] = self._history.get(action, 0) + depth * depth
@@ -0,0 +1,361 @@
+#!encoding: utf-8
+
+"""
+Archive of many board states in a single file.
+
+States are appended as independent snapshots (see snapshot module), each of them
+keyed by a game identifier and a turn number. The file is made of segments: a
+segment is a sequence of records followed by an index block giving the key,
+offset and size of each of them. Index blocks are chained backwards from the
+end of the file, so that opening an archive only reads its indexes, and states
+are loaded on demand through a memory map.
+
+Records written after the last index block (for instance when a process was
+killed before closing the archive) are recovered by scanning them on opening.
+"""
+import mmap
+import os
+import struct
+
+from . import snapshot
+from . import varint
+
+
+MAGIC = b"GAGA"
+FORMAT_VERSION = 1
+
+_RECORD = 0x52
+_INDEX = 0x49
+_INT_ID = 0
+_STR_ID = 1
+_FOOTER_MAGIC = b"GAIX"
+_FOOTER = struct.Struct("<Q4s")
+_HEADER_SIZE = len(MAGIC) + 1
+
+
+class ArchiveError(ValueError):
+    """
+    Exception raised for malformed archives.
+    """
+    pass
+
+
+def _write_key(buffer, game_id, turn):
+    if isinstance(game_id, int):
+        buffer.append(_INT_ID)
+        varint.write(buffer, varint.zigzag(game_id))
+    elif isinstance(game_id, str):
+        buffer.append(_STR_ID)
+        data = game_id.encode("utf-8")
+        varint.write(buffer, len(data))
+        buffer.extend(data)
+    else:
+        raise TypeError("Game identifier must be int or str, not {}".format(
+                game_id.__class__.__name__))
+    varint.write(buffer, varint.zigzag(turn))
+
+
+def _read_key(data, offset):
+    kind = data[offset]
+    if kind == _INT_ID:
+        game_id, offset = varint.decode(data, offset + 1)
+        game_id = varint.unzigzag(game_id)
+    elif kind == _STR_ID:
+        size, offset = varint.decode(data, offset + 1)
+        game_id = bytes(data[offset:offset + size]).decode("utf-8")
+        offset += size
+    else:
+        raise ArchiveError("Invalid game identifier kind: {}".format(kind))
+    turn, offset = varint.decode(data, offset)
+    return (game_id, varint.unzigzag(turn)), offset
+
+
+class SnapshotArchive():
+    """
+    Append-only archive of board states with random access by game and turn.
+
+    Usage::
+
+        with SnapshotArchive("games.gaga", "a") as archive:
+            archive.append(game_id, turn, board)
+        with SnapshotArchive("games.gaga") as archive:
+            board = archive.load(game_id, 12)
+            for batch in archive.iter_batches(256):
+                ...
+
+    Appending a state already stored under the same key shadows it.
+    """
+
+    def __init__(self, path, mode="r", compression=None, segment_size=1024):
+        """
+        Initializer.
+
+        :param path: path of archive file
+        :type path: str
+        :param mode: "r" to read, "a" to append (archive is created if needed)
+            or "w" to create a new archive
+        :type mode: str
+        :param compression: compression of appended states, None, "zlib" or
+            "lzma"
+        :type compression: str
+        :param segment_size: number of records per segment
+        :type segment_size: int
+        """
+        if mode not in ("r", "a", "w"):
+            raise ValueError("Invalid mode: {}".format(mode))
+        self._path = path
+        self._mode = mode
+        self._compression = compression
+        self._segment_size = segment_size
+        #Key -> (offset, size) of snapshot, in order of insertion
+        self._index = { }
+        self._pending = [ ]
+        self._last_index = 0
+        self._map = None
+        self._mapped_size = 0
+        if mode == "w" or (mode == "a" and (not os.path.exists(path) or
+                os.path.getsize(path) == 0)):
+            self._file = open(path, "w+b")
+            self._file.write(MAGIC + bytes([FORMAT_VERSION]))
+            self._size = _HEADER_SIZE
+        else:
+            self._file = open(path, "rb" if mode == "r" else "r+b")
+            self._size = os.fstat(self._file.fileno()).st_size
+            self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        """
+        Iterate over stored states in order of insertion.
+
+        :return: tuples (game_id, turn, board)
+        """
+        for batch in self.iter_batches():
+            yield from batch
+
+    def keys(self):
+        """
+        Get keys of stored states in order of insertion.
+
+        :return: list of tuples (game_id, turn)
+        :rtype: list
+        """
+        return list(self._index)
+
+    def turns(self, game_id):
+        """
+        Get stored turns of a game.
+
+        :rtype: list
+        """
+        return sorted(t for g, t in self._index if g == game_id)
+
+    def append(self, game_id, turn, board):
+        """
+        Append a state at the end of archive.
+
+        :param game_id: identifier of game
+        :type game_id: int or str
+        :param turn: turn of game
+        :type turn: int
+        :param board: state to be stored
+        :type board: Component
+        """
+        if self._mode == "r":
+            raise IOError("Archive is opened for reading")
+        data = snapshot.dumps(board, self._compression)
+        buffer = bytearray([_RECORD])
+        _write_key(buffer, game_id, turn)
+        varint.write(buffer, len(data))
+        offset = self._size + len(buffer)
+        self._file.seek(self._size)
+        self._file.write(buffer)
+        self._file.write(data)
+        self._size = offset + len(data)
+        key = (game_id, turn)
+        self._index.pop(key, None)
+        self._index[key] = (offset, len(data))
+        self._pending.append(key)
+        if len(self._pending) >= self._segment_size:
+            self._write_index()
+
+    def load(self, game_id, turn, into=None):
+        """
+        Load a stored state.
+
+        :param game_id: identifier of game
+        :type game_id: int or str
+        :param turn: turn of game
+        :type turn: int
+        :param into: component to be overwritten by the loaded state
+        :type into: Component
+        :rtype: Component
+        :raise KeyError: if no state is stored under given key
+        """
+        offset, size = self._index[(game_id, turn)]
+        return snapshot.loads(self._view(offset, size), into)
+
+    def iter_batches(self, batch_size=64, game_id=None):
+        """
+        Stream stored states in batches, in order of insertion.
+
+        States are only loaded when their batch is produced.
+
+        :param batch_size: number of states per batch
+        :type batch_size: int
+        :param game_id: only stream states of given game
+        :type game_id: int or str
+        :return: lists of tuples (game_id, turn, board)
+        """
+        keys = [k for k in self._index if game_id is None or k[0] == game_id]
+        for i in range(0, len(keys), batch_size):
+            batch = [ ]
+            for g, t in keys[i:i + batch_size]:
+                offset, size = self._index[(g, t)]
+                batch.append((g, t, snapshot.loads(self._view(offset, size))))
+            yield batch
+
+    def flush(self):
+        """
+        Write index of pending records and flush file.
+        """
+        if self._mode == "r":
+            return
+        if self._pending:
+            self._write_index()
+        self._file.flush()
+
+    def close(self):
+        """
+        Flush and close archive.
+        """
+        if self._file is None:
+            return
+        self.flush()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+        self._file = None
+
+    def _view(self, offset, size):
+        if self._map is None or self._mapped_size < offset + size:
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+            self._mapped_size = len(self._map)
+        #Slicing the map only reads pages of the requested record
+        return self._map[offset:offset + size]
+
+    def _write_index(self):
+        buffer = bytearray()
+        varint.write(buffer, self._last_index)
+        varint.write(buffer, len(self._pending))
+        for key in self._pending:
+            _write_key(buffer, *key)
+            offset, size = self._index[key]
+            varint.write(buffer, offset)
+            varint.write(buffer, size)
+        header = bytearray([_INDEX])
+        varint.write(header, len(buffer))
+        start = self._size
+        self._file.seek(start)
+        self._file.write(header)
+        self._file.write(buffer)
+        self._file.write(_FOOTER.pack(start, _FOOTER_MAGIC))
+        self._size = start + len(header) + len(buffer) + _FOOTER.size
+        self._last_index = start
+        self._pending = [ ]
+
+    def _open(self):
+        if self._size < _HEADER_SIZE:
+            raise ArchiveError("Not a snapshot archive")
+        data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if data[:len(MAGIC)] != MAGIC:
+                raise ArchiveError("Not a snapshot archive")
+            if data[len(MAGIC)] > FORMAT_VERSION:
+                raise ArchiveError("Unsupported archive version: {}".format(
+                        data[len(MAGIC)]))
+            #A cleanly closed archive ends with the footer of its last index
+            #block, otherwise records have to be scanned
+            end = self._size
+            if end >= _HEADER_SIZE + _FOOTER.size:
+                last, magic = _FOOTER.unpack_from(data, end - _FOOTER.size)
+                if magic == _FOOTER_MAGIC and _HEADER_SIZE <= last < end:
+                    segments = [ ]
+                    start = last
+                    while start:
+                        start, entries = self._read_index(data, start)
+                        segments.append(entries)
+                    for entries in reversed(segments):
+                        for key, offset, size in entries:
+                            self._index.pop(key, None)
+                            self._index[key] = (offset, size)
+                    self._last_index = last
+                    return
+            self._scan(data)
+        finally:
+            data.close()
+
+    def _read_index(self, data, start):
+        if data[start] != _INDEX:
+            raise ArchiveError("Corrupted index at offset {}".format(start))
+        size, offset = varint.decode(data, start + 1)
+        previous, offset = varint.decode(data, offset)
+        count, offset = varint.decode(data, offset)
+        entries = [ ]
+        for i in range(count):
+            key, offset = _read_key(data, offset)
+            position, offset = varint.decode(data, offset)
+            length, offset = varint.decode(data, offset)
+            entries.append((key, position, length))
+        return previous, entries
+
+    def _scan(self, data):
+        #Archive was not closed: rebuild index by reading all frames
+        self._index = { }
+        self._pending = [ ]
+        self._last_index = 0
+        offset = _HEADER_SIZE
+        end = len(data)
+        while offset < end:
+            try:
+                tag = data[offset]
+                if tag == _RECORD:
+                    key, position = _read_key(data, offset + 1)
+                    size, position = varint.decode(data, position)
+                    if position + size > end:
+                        break
+                    self._index.pop(key, None)
+                    self._index[key] = (position, size)
+                    self._pending.append(key)
+                    offset = position + size
+                elif tag == _INDEX:
+                    size, position = varint.decode(data, offset + 1)
+                    if position + size + _FOOTER.size > end:
+                        break
+                    self._last_index = offset
+                    self._pending = [ ]
+                    offset = position + size + _FOOTER.size
+                else:
+                    break
+            except (EOFError, IndexError, ArchiveError, UnicodeDecodeError):
+                break
+        #Drop truncated trailing bytes so that appending stays consistent
+        self._size = offset
+        if self._mode != "r":
+            self._file.truncate(offset)
@@ -3,21 +3,189 @@
 """
 Base class for board.
 """
+import contextlib
+import copy
 import pickle
 
 
-from .zone import Zone, Component
+from .zone import Zone, Component, _epochs
+from . import snapshot
 
 
 class Board(Zone):
     """
     Abstraction of a full board with memento design pattern.
+
+    The board maintains a Zobrist hash of its state: properties, card and token
+    faces, card rotations, die faces, locations of components and order of
+    cards in decks. Order of components in a zone does not change the hash.
+    The hash is computed by the first call of get_hash, so that boards whose
+    hash is never used do not pay for it, then updated incrementally: a
+    change only updates the hashes cached by the changed component and its
+    containers, moving a component does not walk its children.
+
+    Changes may also be recorded in an undo journal: see checkpoint and rollback
+    methods. Undoing changes is proportional to the number of changes, not to
+    the size of the board.
+
+    A board may be forked into copy-on-write children: see fork method.
     """
+    _transient_fields = Component._transient_fields + ("_journal",
+            "_deferred")
+    #Number of nested deferred_hash contexts
+    _deferred = 0
+
     def __init__(self, **properties):
         """
         Constructor.
         """
         super(Board, self).__init__(**properties)
+        self._journal = None
+        self._epoch = next(_epochs)
+        self._board = self
+
+    def _after_load(self):
+        """
+        Rebuild transient fields once the board has been loaded from a snapshot.
+
+        Components shall have been loaded first.
+        """
+        super(Board, self)._after_load()
+        self.__dict__.update(_journal=None, _epoch=next(_epochs))
+        self._bind(self)
+
+    def get_hash(self):
+        """
+        Get the 64-bit hash of board state.
+
+        Hashes of boards sharing the same components (or restored from the same
+        memento) are equal when their components are in the same state.
+        The hash is only meaningful within a single process.
+
+        The first call computes the hash of the whole board, next calls only
+        compute the parts changed within deferred_hash.
+
+        :rtype: int
+        """
+        return self._get_zhash()
+
+    def compute_hash(self):
+        """
+        Compute the hash of board state from scratch.
+
+        This walks the whole board and is only meant to check the consistency of
+        the incremental hash returned by get_hash.
+
+        :rtype: int
+        """
+        return self._zobrist_tree(None)
+
+    @contextlib.contextmanager
+    def deferred_hash(self):
+        """
+        Context manager deferring updates of the hash of board.
+
+        Within it, changes only forget the hashes cached by the changed
+        components and their containers, instead of computing features. The
+        next call to get_hash computes the forgotten hashes only, from the
+        cached hashes of unchanged components. Long sequences of changes whose
+        hashes are not needed, like playouts, run faster.
+        """
+        self._deferred += 1
+        try:
+            yield self
+        finally:
+            self._deferred -= 1
+
+    def checkpoint(self):
+        """
+        Create a checkpoint the board can be rolled back to.
+
+        The first call starts recording an inverse operation for every change
+        made to the components of the board.
+
+        :return: checkpoint
+        :rtype: int
+        """
+        if self._journal is None:
+            self._journal = [ ]
+        return len(self._journal)
+
+    def is_recording(self):
+        """
+        State whether changes are recorded for checkpoints.
+
+        :rtype: bool
+        """
+        return self._journal is not None
+
+    def rollback(self, checkpoint):
+        """
+        Undo all changes made since given checkpoint.
+
+        Checkpoints created after the given one become invalid. Components
+        removed from the board since the checkpoint are put back in their state
+        at the time of their removal: they stay attached to the board once
+        removed, so that their changes are recorded as well.
+
+        :param checkpoint: checkpoint created by checkpoint method
+        :type checkpoint: int
+        :return: current instance
+        :rtype: Board
+        """
+        journal = self._journal
+        if journal is None or checkpoint > len(journal):
+            raise ValueError("Invalid checkpoint: {}".format(checkpoint))
+        #Inverse operations shall not be recorded
+        self._journal = None
+        entries = journal[checkpoint:]
+        del journal[checkpoint:]
+        try:
+            for entry in reversed(entries):
+                entry[0](*entry[1:])
+        finally:
+            self._journal = journal
+        return self
+
+    def fork(self):
+        """
+        Create a lightweight copy of the board.
+
+        The fork shares all its components with this board. A component is only
+        copied when it is first reached from one of the boards, by a search, an
+        iteration or a removal, so that memory grows with the number of changed
+        components, not with the size of the board.
+
+        Both boards stay fully usable but references to components obtained
+        before forking are stale: they shall be looked up again from the board,
+        otherwise changing them raises SharedComponentError. So do components
+        removed from the board before forking: put them back first. The undo
+        journal of this board is committed.
+
+        :return: forked board
+        :rtype: Board
+        """
+        fork = object.__new__(self.__class__)
+        fork.__dict__.update(self._copy_state())
+        fork.__dict__.update(_board=fork, _epoch=next(_epochs), _journal=None,
+                _shared_children=True, _deferred=0)
+        if "_random" in fork.__dict__:
+            #Fork draws the same random numbers as this board, independently
+            fork.__dict__["_random"] = copy.copy(self._random)
+        #Components are now shared by both boards
+        self.__dict__.update(_epoch=next(_epochs), _journal=None,
+                _shared_children=True)
+        return fork
+
+    def commit(self):
+        """
+        Stop recording changes and forget about all checkpoints.
+
+        :return: current instance
+        :rtype: Board
+        """
+        self._journal = None
+        return self
 
     def create_memento(self):
         """
@@ -25,14 +193,22 @@ class Board(Zone):
 
         :rtype: str
         """
-        return pickle.dumps(vars(self))
+        #Components shared with a fork would drag the other board along
+        self._own_tree()
+        #Undo journal is not part of board state
+        journal = self._journal
+        self._journal = None
+        try:
+            return pickle.dumps(vars(self))
+        finally:
+            self._journal = journal
 
     def set_memento(self, memento):
         """
         Restore board object state from a string.
 
         You can create string representing board state with create_memento
-        method of Board class.
+        method of Board class. All checkpoints become invalid.
 
         :param memento: string representing board state
         :type memento: str
@@ -40,29 +216,47 @@ class Board(Zone):
         :rtype: Board
         """
         previous_state = pickle.loads(memento)
+        journal = self._journal
+        deferred = self._deferred
         vars(self).clear()
         vars(self).update(previous_state)
+        self._deferred = deferred
+        #Components refer to the unpickled copy of the board
+        self._bind(self)
+        #Stamp may come from another process
+        self._touch()
+        if journal is not None:
+            self._journal = [ ]
         return self
 
-    def save_to_file(self, file):
+    def save_to_file(self, file, compression=None):
         """
         Save board state to file.
 
+        The board is saved in the binary snapshot format (see snapshot module),
+        compact and safe to load but slower than create_memento, which pickles
+        the board.
+
         :param file: file object to save board state
         :type filename: file-like object
+        :param compression: None, "zlib" or "lzma"
+        :type compression: str
         :return: current instance
         :rtype: Board
         """
-        file.write(self.create_memento())
+        snapshot.dump(self, file, compression)
         return self
 
     def load_from_file(self, file):
         """
         Load board state from file.
 
+        All checkpoints become invalid.
+
         :param filename: file object to load board state
         :type filename: file-like object
         :return: current instance
         :rtype: Board
         """
-        return self.set_memento(file.read())
+        snapshot.load(file, into=self)
+        return self
@@ -10,6 +10,8 @@ class Card(Zone):
 	"""
 	Base class for a card in game.
 	"""
+	_zobrist_fields = ("_face_up", "_angle")
+
 	def __init__(self, **properties):
 		"""
 		Constructor.
@@ -27,6 +29,8 @@ class Card(Zone):
 
 		:rtype: bool
 		"""
+		if self._tracking:
+			self._track()
 		return self._face_up
 
 	def is_face_down(self):
@@ -35,6 +39,8 @@ class Card(Zone):
 
 		:rtype: bool
 		"""
+		if self._tracking:
+			self._track()
 		return not self._face_up
 
 	def is_visible(self):
@@ -52,7 +58,7 @@ class Card(Zone):
 		:return: current instance
 		:rtype: Card
 		"""
-		self._face_up = not self._face_up
+		self._set_field("_face_up", not self._face_up)
 		return self
 
 	def set_face_up(self, toggle=True):
@@ -64,7 +70,7 @@ class Card(Zone):
 		:return: current instance
 		:rtype: Card
 		"""
-		self._face_up = toggle
+		self._set_field("_face_up", toggle)
 		return self
 
 	def set_face_down(self, toggle=True):
@@ -76,7 +82,7 @@ class Card(Zone):
 		:return: current instance
 		:rtype: Card
 		"""
-		self._face_up = not toggle
+		self._set_field("_face_up", not toggle)
 		return self
 
 	def rotate(self, value):
@@ -90,7 +96,7 @@ class Card(Zone):
 		:return: current instance
 		:rtype: Card
 		"""
-		self._angle += int(value)
+		self._set_field("_angle", self._angle + int(value))
 		return self
 
 	def set_rotation(self, value):
@@ -102,7 +108,7 @@ class Card(Zone):
 		:return: current instance
 		:rtype: Card		
 		"""
-		self._angle = int(value)
+		self._set_field("_angle", int(value))
 		return self
 
 	def get_rotation(self):
@@ -112,6 +118,8 @@ class Card(Zone):
 		:return: rotation angle
 		:rtype: int
 		"""
+		if self._tracking:
+			self._track()
 		return self._angle
 
 	def tap(self):
@@ -141,6 +149,8 @@ class Card(Zone):
 		:return: is card tapped ?
 		:rtype: bool
 		"""
+		if self._tracking:
+			self._track()
 		return self._angle == 90
 
 	def is_untapped(self):
@@ -150,4 +160,6 @@ class Card(Zone):
 		:return: is card untapped ?
 		:rtype: bool
 		"""
+		if self._tracking:
+			self._track()
 		return self._angle == 0
@@ -0,0 +1,169 @@
+#!encoding: utf-8
+
+"""
+Time budgets of agents: time controls, deadlines and thinking statistics.
+"""
+import time
+
+
+class Deadline():
+    """
+    Deadline of a decision, given to agents so that they can stop thinking in
+    time.
+
+    Anytime agents should check expired regularly and propose their best
+    actions so far: if they run out of time, these actions are played.
+    """
+
+    def __init__(self, seconds=None):
+        """
+        Initializer.
+
+        :param seconds: time allowed from now, None for no limit
+        :type seconds: float
+        """
+        self._start = time.perf_counter()
+        self._end = None if seconds is None else self._start + seconds
+        self._expired = False
+        self._best = None
+
+    def is_unlimited(self):
+        return self._end is None
+
+    def elapsed(self):
+        """
+        Get time elapsed since the start of decision in seconds.
+
+        :rtype: float
+        """
+        return time.perf_counter() - self._start
+
+    def remaining(self):
+        """
+        Get time remaining before deadline in seconds.
+
+        :return: remaining time, None if there is no limit
+        :rtype: float
+        """
+        if self._end is None:
+            return None
+        if self._expired:
+            return 0.
+        return max(self._end - time.perf_counter(), 0.)
+
+    def expired(self):
+        """
+        Check whether deadline has passed.
+
+        :rtype: bool
+        """
+        if not self._expired and self._end is not None and \
+                time.perf_counter() >= self._end:
+            self._expired = True
+        return self._expired
+
+    def expire(self):
+        """
+        Declare deadline passed: agent still thinking shall stop.
+        """
+        self._expired = True
+
+    def propose(self, actions):
+        """
+        Propose best actions found so far.
+
+        :param actions: actions to be played if time runs out
+        :type actions: list
+        """
+        self._best = list(actions)
+
+    def get_best(self):
+        """
+        Get best actions proposed so far.
+
+        :return: actions, None if agent has not proposed any
+        :rtype: list
+        """
+        return self._best
+
+
+class TimeControl():
+    """
+    Time allowed to an agent: per decision, and for the whole game like a chess
+    clock.
+    """
+
+    def __init__(self, per_decision=None, bank=None, increment=0.):
+        """
+        Initializer.
+
+        :param per_decision: time allowed for each decision in seconds
+        :type per_decision: float
+        :param bank: time allowed for the whole game in seconds
+        :type bank: float
+        :param increment: time added to bank after each decision in seconds
+        :type increment: float
+        """
+        self.per_decision = per_decision
+        self.bank = bank
+        self.increment = increment
+
+    def get_allowed(self, bank):
+        """
+        Get time allowed for next decision.
+
+        :param bank: time remaining in bank, None if game has no bank
+        :type bank: float
+        :return: time in seconds, None for no limit
+        :rtype: float
+        """
+        if bank is None:
+            return self.per_decision
+        if self.per_decision is None:
+            return bank
+        return min(self.per_decision, bank)
+
+    def __repr__(self):
+        return "TimeControl(per_decision={}, bank={}, increment={})".format(
+                self.per_decision, self.bank, self.increment)
+
+
+class ThinkingStatistics():
+    """
+    Thinking time of an agent.
+    """
+
+    def __init__(self):
+        self.decisions = 0
+        self.total = 0.
+        self.longest = 0.
+        self.timeouts = 0
+
+    def update(self, elapsed, timed_out=False):
+        """
+        Account for a decision.
+
+        :param elapsed: thinking time in seconds
+        :type elapsed: float
+        :param timed_out: whether agent ran out of time
+        :type timed_out: bool
+        """
+        self.decisions += 1
+        self.total += elapsed
+        if elapsed > self.longest:
+            self.longest = elapsed
+        if timed_out:
+            self.timeouts += 1
+
+    def get_mean(self):
+        """
+        Get mean thinking time per decision in seconds.
+
+        :rtype: float
+        """
+        return self.total / self.decisions if self.decisions else 0.
+
+    def __repr__(self):
+        return "ThinkingStatistics(decisions={}, total={:.6f}, " \
+                "longest={:.6f}, timeouts={})".format(self.decisions,
+                self.total, self.longest, self.timeouts)
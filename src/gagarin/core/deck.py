@@ -3,17 +3,21 @@
 """
 Base class for a deck in game. A deck is a collection of cards
 """
-import random
-
 from .zone import Component
 from .card import Card
 from .predicate import Predicate
+from . import zobrist
 
 
 class Deck(Component):
     """
     Deck class: collection of cards.
     """
+    _zobrist_fields = ("_face_up",)
+    _transient_fields = Component._transient_fields + ("_zorder",)
+    #Polynomial hash of the order of cards, kept along with _zhash
+    _zorder = 0
+
     def __init__(self, face_up=False, **properties):
         """
         Constructor.
@@ -38,12 +42,12 @@ class Deck(Component):
         :rtype: Deck
         """
         if position == "top":
-            self._cards.insert(0, card.set_face_up(self._face_up))
+            self._insert_card(0, card.set_face_up(self._face_up))
         elif position == "bottom":
-            self._cards.append(card.set_face_up(self._face_up))
+            self._insert_card(len(self), card.set_face_up(self._face_up))
         elif position == "random":
-            index = random.randint(0, len(self))
-            self._cards.insert(index, card.set_face_up(self._face_up))
+            index = self.get_random().randint(0, len(self))
+            self._insert_card(index, card.set_face_up(self._face_up))
         else:
             raise ValueError("Unknown 'position' for Deck.add: {}"
                     .format(position))
@@ -56,6 +60,8 @@ class Deck(Component):
         :return: number of cards
         :rtype: int
         """
+        if self._tracking:
+            self._track()
         return len(self._cards)
 
     def shuffle(self):
@@ -65,7 +71,9 @@ class Deck(Component):
         :return: current deck
         :rtype: Deck
         """
-        random.shuffle(self._cards)
+        cards = list(self._cards)
+        self.get_random().shuffle(cards)
+        self._set_cards(cards)
         return self
 
     def draw(self, number=1, face_up=True):
@@ -82,7 +90,7 @@ class Deck(Component):
         out = [ ]
         for i in range(number):
             try:
-                card = self._cards.pop(0)
+                card = self._pop_card(0)
             except IndexError:
                 break
             else:
@@ -118,9 +126,9 @@ class Deck(Component):
         out = [ ]
         i = 0
         while True:
-            card = self._cards[i].set_face_up(True)
+            card = self._own_child(i).set_face_up(True)
             if filter(card):
-                out.append(self._cards.pop(i))
+                out.append(self._pop_card(i))
             else:
                 i += 1
                 card.set_face_down()
@@ -149,7 +157,7 @@ class Deck(Component):
         i = 0
         stop = False
         while not stop:
-            card = self._cards.pop(0).set_face_up(face_up)
+            card = self._pop_card(0).set_face_up(face_up)
             out[i].append(card)
             i = (i + 1) % piles
             stop = True
@@ -166,6 +174,9 @@ class Deck(Component):
 
         :rtype: iterator
         """
+        if self._tracking:
+            self._track()
+        self._own_children()
         return iter(self._cards)
 
     def is_empty(self):
@@ -174,4 +185,118 @@ class Deck(Component):
 
         :rtype: bool
         """
+        if self._tracking:
+            self._track()
         return len(self._cards) == 0
+
+    def _insert_card(self, index, card):
+        """
+        Insert a card at given position in deck (0 is the top).
+
+        :param index: position of card
+        :type index: int
+        :param card: card to be inserted
+        :type card: Card
+        """
+        board = self._writable_board()
+        card._writable_board()
+        self._touch()
+        cards = self._cards
+        cards.insert(index, card)
+        card.__dict__["_container"] = self
+        if board is not None:
+            card._attach(board)
+            if board._journal is not None:
+                board._journal.append((self._pop_card, index))
+        if self._hashing():
+            if index == 0:
+                order = zobrist.push_front(self._zorder, card._zkey)
+            elif index == len(cards) - 1:
+                order = zobrist.push_back(self._zorder, card._zkey, index)
+            else:
+                order = zobrist.sequence([c._zkey for c in cards])
+            self._move_card(card, order)
+
+    def _pop_card(self, index):
+        """
+        Remove the card at given position in deck (0 is the top).
+
+        :param index: position of card
+        :type index: int
+        :return: removed card
+        :rtype: Card
+        """
+        board = self._writable_board()
+        if board is not None and self._shared_children:
+            #Removed card is no longer shared
+            self._own_child(index)
+        self._touch()
+        cards = self._cards
+        card = cards.pop(index)
+        if board is not None and board._journal is not None:
+            #Later changes of the drawn card are recorded as well
+            board._journal.append((self._insert_card, index, card))
+        if self._hashing():
+            if index == 0:
+                order = zobrist.pop_front(self._zorder, card._zkey)
+            elif index == len(cards):
+                order = zobrist.pop_back(self._zorder, card._zkey, index)
+            else:
+                order = zobrist.sequence([c._zkey for c in cards])
+            self._move_card(card, order)
+        card.__dict__["_container"] = None
+        return card
+
+    def _set_cards(self, cards):
+        """
+        Replace the cards of deck, keeping the same set of cards.
+
+        :param cards: new ordered cards
+        :type cards: list
+        """
+        board = self._writable_board()
+        self._touch()
+        if board is not None and board._journal is not None:
+            board._journal.append((self._set_cards, self._cards))
+        self.__dict__["_cards"] = cards
+        if self._hashing():
+            order = zobrist.sequence([c._zkey for c in cards])
+            self._rehash(zobrist.order(self._zkey, self._zorder)
+                    ^ zobrist.order(self._zkey, order))
+            self.__dict__["_zorder"] = order
+
+    def _move_card(self, card, order):
+        """
+        Update hashes when a card is inserted or removed.
+
+        :param card: inserted or removed card
+        :type card: Card
+        :param order: polynomial hash of cards keys after the move
+        :type order: int
+        """
+        self._rehash(card._get_zhash() ^ zobrist.location(card, self)
+                ^ zobrist.order(self._zkey, self._zorder)
+                ^ zobrist.order(self._zkey, order))
+        self.__dict__["_zorder"] = order
+
+    def _iter_children(self):
+        """
+        Iterate over the cards of deck.
+
+        :rtype: iterable
+        """
+        return self._cards
+
+    def _zobrist_state(self):
+        """
+        Compute the hash contribution of the deck own state.
+
+        The hash of the order of cards is computed again and kept for
+        incremental updates.
+
+        :rtype: int
+        """
+        order = zobrist.sequence([c._zkey for c in self._cards])
+        self.__dict__["_zorder"] = order
+        return (super(Deck, self)._zobrist_state()
+                ^ zobrist.order(self._zkey, order))
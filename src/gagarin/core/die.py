@@ -3,7 +3,6 @@
 """
 Base classes for dice in game.
 """
-import random
 
 from .zone import Component
 
@@ -26,6 +25,8 @@ class Die(Component):
 	"""
 	Suitable class for all kind of dice.
 	"""
+	_zobrist_fields = ("_visible_face",)
+
 	def __init__(self, faces, **properties):
 		"""
 		Constructor.
@@ -54,7 +55,7 @@ class Die(Component):
 
 		:rtype: Face
 		"""
-		self._visible_face = random.choice(self._faces)
+		self._set_field("_visible_face", self.get_random().choice(self._faces))
 		return self._visible_face
 
 	def get_visible_face(self):
@@ -63,6 +64,8 @@ class Die(Component):
 
 		:rtype: Face
 		"""
+		if self._tracking:
+			self._track()
 		return self._visible_face
 
 	def set_visible_face(self, predicate):
@@ -74,6 +77,6 @@ class Die(Component):
 		"""
 		for f in self._faces:
 			if predicate(f):
-				self._visible_face = f
+				self._set_field("_visible_face", f)
 				break
 		return self
@@ -2,22 +2,153 @@
 """
 Base class for game engine.
 """
+import asyncio
+import concurrent.futures
+import contextlib
+import copy
+import itertools
+import os
+import pickle
+import random
+import threading
+from multiprocessing import shared_memory
+
+try:
+    import numpy
+except ImportError: # pragma: no cover
+    numpy = None
+
+from . import zobrist
+from . import rng
+from .log import INFO, WARNING, DISABLED, LogWriter
+from .trace import TraceError
+from .clock import Deadline, TimeControl, ThinkingStatistics
+from .zone import Component, tracking, track_reads
 
 class GameEnded(Exception):
     pass
 
+#Game unpickled by a worker process for current phase, shared by its agents
+_remote_game = (None, None)
+_dispatches = itertools.count()
+#Size from which pickled games are sent to worker processes through shared
+#memory rather than with each agent: smaller ones are cheaper to copy
+_SHARED_DUMP_SIZE = 1 << 16
+#Guards the searchers of games, see Game.searching
+_searchers_lock = threading.Lock()
+
+
+def _remote_take_actions(key, data, index, phase, seed):
+    global _remote_game
+    if _remote_game[0] != key:
+        if isinstance(data, tuple):
+            #Pickled game is read from shared memory by first agent of phase
+            name, size = data
+            memory = shared_memory.SharedMemory(name)
+            try:
+                data = bytes(memory.buf[:size])
+            finally:
+                memory.close()
+        _remote_game = (key, pickle.loads(data))
+    game = _remote_game[1]
+    agent = game.get_agents()[index]
+    if seed is not None:
+        #Random generators are not sent: they are derived from a seed drawn
+        #by agent in the main process, so that each phase draws new numbers
+        streams = rng.SeedSequence(seed).spawn(3)
+        game._random = streams[0].generator()
+        game.get_board().set_random(streams[1].generator())
+        agent.set_random(streams[2].generator())
+    return agent.take_actions(game, phase)
+
+
+class Decision():
+    """
+    Decision awaited from an agent.
+    """
+    __slots__ = ("_game", "_phase", "_agent")
+
+    def __init__(self, game, phase, agent):
+        self._game = game
+        self._phase = phase
+        self._agent = agent
+
+    def get_phase(self):
+        return self._phase
+
+    def get_agent(self):
+        return self._agent
+
+    def get_legal_actions(self):
+        return self._game.get_legal_actions(self._phase, self._agent)
+
+    def __repr__(self):
+        return "Decision(phase={!r}, agent={!r})".format(self._phase,
+                self._agent.get_name())
+
+
 class Game():
-    def __init__(self, logger):
+    #Names of attributes of subclasses saved by checkpoints: their values are
+    #not copied and shall therefore be replaced, not changed in place
+    _checkpoint_fields = ()
+    #Whether hooks return right after calling declare_end, so that playouts
+    #may end games with a flag instead of raising GameEnded
+    end_by_flag = False
+    _ending_by_flag = False
+    #Whether engine and board draw no random numbers once the board is set up
+    #(no chance events), so that checkpoints leave random streams out
+    deterministic = False
+    #Thread searching game and number of nested searches, see searching
+    _searcher = (None, 0)
+    #Whether reset resets agents and gives them random generators, False for
+    #agents shared with other games
+    _owns_agents = True
+
+    def __init__(self, logger, seed=None):
         self._board = None
         self._agents = [ ]
         self._phases = { }
         self._agents_order = None
         self._phases_order = None
         self._board_setup_func = None
-        self._logger = logger
+        self._logger = None
+        self._log_level = INFO
+        #Lowest level of events written, DISABLED without logger
+        self._log_gate = DISABLED
+        self.set_logger(logger)
+        self._executor = None
+        self._game_ended = True
+        self._phase_index = 0
+        self._agent_index = 0
+        self._pending_actions = ()
+        self._seed_sequence = None
+        self._random = None
+        self._time_controls = { }
+        self._banks = { }
+        self._deadlines = { }
+        self._thinking = { }
+        self._legal_actions = { }
+        self._legal_masks = { }
+        self._episode = None
+        self._trace = None
+        self._profiler = None
+        if seed is not None:
+            self.set_seed(seed)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_logger"] = None
+        state["_log_gate"] = DISABLED
+        state["_executor"] = None
+        state["_trace"] = None
+        state["_profiler"] = None
+        state.pop("_searcher", None)
+        return state
 
     def add_agent(self, agent):
         self._agents.append(agent)
+        if self._profiler is not None:
+            self._profiler.attach_agent(agent)
 
     def clear_agents(self):
         self._agents = [ ]
@@ -43,51 +174,856 @@ class Game():
     def set_phases_order(self, order):
         self._phases_order = order
 
+    def set_seed(self, seed):
+        """
+        Set the root seed of random streams of game.
+
+        Each reset spawns independent generators for the engine, the board and
+        each agent from the root seed, so that the n-th game played after
+        setting the seed is always the same. Without seed, random module is
+        used.
+
+        :param seed: root seed, or node of a seed tree
+        :type seed: int or rng.SeedSequence
+        """
+        if seed is not None and not isinstance(seed, rng.SeedSequence):
+            seed = rng.SeedSequence(seed)
+        self._seed_sequence = seed
+        self._random = None
+
+    def get_seed(self):
+        """
+        Get the root seed of random streams of game.
+
+        :rtype: rng.SeedSequence
+        """
+        return self._seed_sequence
+
+    def get_random(self):
+        """
+        Get the random generator of engine, in use while setting up the board
+        and resolving actions.
+
+        :rtype: random.Random
+        """
+        return self._random or random
+
+    def set_time_control(self, per_decision=None, bank=None, increment=0.,
+            agent=None):
+        """
+        Set time allowed to an agent to take actions in mainloop and
+        amainloop.
+
+        An agent who runs out of time plays the best actions it has proposed
+        to its deadline (see get_deadline), or default actions of phase. When
+        time is limited, agents think in a separate thread on a copy of the
+        game sharing its agents, so that game goes on without waiting for an
+        agent who runs out of time: this agent shall stop by itself once its
+        deadline has expired, before being asked again. Its actions shall not
+        refer to components of the board, which belong to the copy.
+
+        :param per_decision: time allowed for each decision in seconds
+        :type per_decision: float
+        :param bank: time allowed for the whole game in seconds
+        :type bank: float
+        :param increment: time added to bank after each decision in seconds
+        :type increment: float
+        :param agent: agent, None to set the default of all agents
+        :type agent: Agent
+        """
+        if per_decision is None and bank is None:
+            self._time_controls.pop(agent, None)
+        else:
+            self._time_controls[agent] = TimeControl(per_decision, bank,
+                    increment)
+
+    def get_time_control(self, agent):
+        """
+        Get time allowed to an agent.
+
+        :return: time control, None if time is not limited
+        :rtype: TimeControl
+        """
+        return self._time_controls.get(agent, self._time_controls.get(None))
+
+    def get_remaining_bank(self, agent):
+        """
+        Get time remaining in the bank of an agent.
+
+        :return: time in seconds, None if agent has no bank
+        :rtype: float
+        """
+        control = self.get_time_control(agent)
+        if control is None or control.bank is None:
+            return None
+        return self._banks.get(agent, control.bank)
+
+    def get_deadline(self, agent):
+        """
+        Get deadline of the current decision of an agent.
+
+        :rtype: Deadline
+        """
+        try:
+            return self._deadlines[agent]
+        except KeyError:
+            return Deadline()
+
+    def get_thinking_statistics(self, agent):
+        """
+        Get thinking time of an agent over all games played with mainloop,
+        while its time was limited.
+
+        :rtype: ThinkingStatistics
+        """
+        try:
+            return self._thinking[agent]
+        except KeyError:
+            return self._thinking.setdefault(agent, ThinkingStatistics())
+
+    def set_profiler(self, profiler):
+        """
+        Profile hooks of game and decisions of agents.
+
+        Profiling replaces methods of game and agents instances: unprofiled
+        games run at full speed.
+
+        :param profiler: profiler, None to stop profiling
+        :type profiler: profiler.Profiler
+        """
+        if self._profiler is not None:
+            self._profiler.detach(self)
+        self._profiler = profiler
+        if profiler is not None:
+            profiler.attach(self)
+
+    def get_profiler(self):
+        return self._profiler
+
+    def set_executor(self, executor):
+        """
+        Dispatch decisions of agents in simultaneous phases to an executor.
+
+        With a thread pool, each agent decides on its own copy of the game,
+        sharing its agents (see set_time_control), so that agents may search
+        it at once. With a process pool, the game is pickled once per phase,
+        in shared memory if it is large, unpickled once by each worker
+        process, and each agent decides on a copy: changes made to agents while deciding are
+        lost, and game, agents and actions must be picklable. Random
+        generators are not pickled: each agent having its own generator
+        draws a seed from it, from which the generators of its copy are
+        derived. Actions are resolved in order of agents in both cases, and
+        shall not refer to components of the board.
+
+        :param executor: thread or process pool, None to decide sequentially
+        :type executor: concurrent.futures.Executor
+        """
+        self._executor = executor
+
     def declare_end(self):
-        raise GameEnded
+        if self._ending_by_flag:
+            self._game_ended = True
+        else:
+            raise GameEnded
 
-    def mainloop(self):
+    def is_ended(self):
+        """
+        Check whether game has ended.
+
+        :rtype: bool
+        """
+        return self._game_ended
+
+    def reset(self):
+        """
+        Start a new game and run it until the first decision.
+
+        :return: pending decisions
+        :rtype: list
+        """
+        episode = None
+        if self._seed_sequence is not None:
+            episode = self._seed_sequence.spawn(1)[0]
+        return self._reset(episode)
+
+    def _reset(self, episode):
+        """
+        Start a new game with random streams spawned from given seed.
+
+        :param episode: seed of game, None to use random module
+        :type episode: rng.SeedSequence
+        """
+        self._episode = episode
+        streams = None
+        if episode is not None:
+            streams = episode.spawn(2 + len(self._agents))
+            self._random = streams[0].generator()
+        if self._trace is not None:
+            self._trace.begin(episode, self._phases_order,
+                    [agent.get_name() for agent in self._agents])
         #Setup board
         self._game_ended = False
-        self._board = self.setup_board()
+        with rng.using(self._random):
+            self._board = self.setup_board()
+        if streams is not None:
+            self._board.set_random(streams[1].generator())
+            if self._owns_agents:
+                for agent, stream in zip(self._agents, streams[2:]):
+                    agent.set_random(stream.generator())
+        self._legal_actions = { }
+        self._legal_masks = { }
         #Setup agents
-        for agent in self.get_agents():
-            agent.reset()
-        #Run loop
-        while True:
+        self._banks = { }
+        self._deadlines = { }
+        if self._owns_agents:
+            for agent in self.get_agents():
+                agent.reset()
+        #Cursor of game: current phase, current agent and actions of agents
+        #who have already decided in a simultaneous phase
+        self._phase_index = 0
+        self._agent_index = 0
+        self._pending_actions = ()
+        try:
+            with rng.using(self._random):
+                self.prepare_phase(self._phases_order[0])
+        except GameEnded:
+            self._end()
+        return self.get_pending_decisions()
+
+    def get_pending_decisions(self):
+        """
+        Get decisions the game is waiting for.
+
+        In a simultaneous phase, all agents who have not decided yet are
+        waiting, otherwise only the current agent. An ended game waits for no
+        decision.
+
+        :rtype: list
+        """
+        if self._game_ended:
+            return [ ]
+        phase = self._phases_order[self._phase_index]
+        agents = self.get_agents()
+        if self._phases[phase]["simultaneous"]:
+            return [Decision(self, phase, agent) for agent in
+                    agents[len(self._pending_actions):]]
+        return [Decision(self, phase, agents[self._agent_index])]
+
+    def step(self, actions):
+        """
+        Take pending decisions and run the game until the next decisions.
+
+        In a simultaneous phase, actions may be given for the first pending
+        decisions only: they are resolved once all agents have decided.
+
+        :param actions: list of actions of each pending decision, in order
+        :type actions: list
+        :return: pending decisions
+        :rtype: list
+        :raise GameEnded: if game has already ended
+        """
+        generator = self._random
+        if generator is None or rng.current() is generator:
+            #Unseeded game, or stream already in use, see mainloop
+            return self._step(actions)
+        with rng.using(generator):
+            return self._step(actions)
+
+    def _step(self, actions):
+        if self._game_ended:
+            raise GameEnded
+        phase = self._phases_order[self._phase_index]
+        agents = self.get_agents()
+        if self._trace is not None:
+            self._record(phase, agents, actions)
+        try:
+            if self._phases[phase]["simultaneous"]:
+                self._pending_actions += tuple(actions)
+                if len(self._pending_actions) < len(agents):
+                    return self.get_pending_decisions()
+                agent_actions = self._pending_actions
+                self._pending_actions = ()
+                for agent, actions in zip(agents, agent_actions):
+                    for action in actions:
+                        self.resolve_action(phase, agent, action)
+                self._agent_index = len(agents)
+            else:
+                agent = agents[self._agent_index]
+                for action in actions[0]:
+                    self.resolve_action(phase, agent, action)
+                self._agent_index += 1
+            if self._agent_index >= len(agents):
+                #Terminate phase and setup next one
+                self.terminate_phase(phase)
+                self._phase_index = (self._phase_index + 1) % \
+                        len(self._phases_order)
+                self._agent_index = 0
+                self.prepare_phase(self._phases_order[self._phase_index])
+        except GameEnded:
+            self._end()
+        return self.get_pending_decisions()
+
+    def playout(self, policy=None, generator=None, max_decisions=None):
+        """
+        Play current game quickly to its end, for rollouts of searches.
+
+        Actions are chosen by a policy instead of agents: neither log nor
+        trace are written, actions are not checked, and games setting
+        end_by_flag end without exception.
+
+        :param policy: function (game, phase, agent, legal actions,
+            generator) returning the action to play, a random legal action by
+            default
+        :type policy: callable
+        :param generator: random generator of policy, the one of game by
+            default
+        :type generator: random.Random
+        :param max_decisions: number of decisions after which to stop
+        :type max_decisions: int
+        :return: scores if game has ended, None otherwise
+        :rtype: dict
+        """
+        if generator is None:
+            generator = self.get_random()
+        if policy is None:
+            def choose(phase, agent):
+                actions = self.list_legal_actions(phase, agent)
+                if not actions:
+                    return actions
+                return [actions[int(generator.random() * len(actions))]]
+        else:
+            def choose(phase, agent):
+                actions = self.list_legal_actions(phase, agent)
+                if not actions:
+                    return actions
+                return [policy(self, phase, agent, actions, generator)]
+        board = self._board
+        #Hash of board is only computed again if asked for after playout
+        deferred = (contextlib.nullcontext() if board is None
+                else board.deferred_hash())
+        with self.silenced(), deferred:
+            self._ending_by_flag = self.end_by_flag
             try:
-                #Phases loop
-                for phase in self._phases_order:
-                    #Setup phase
-                    self.prepare_phase(phase)
-                    simultaneous = self._phases[phase]["simultaneous"]
-                    #Call for actions and resolve
-                    if simultaneous:
-                        agent_actions = { }
-                        for agent in self.get_agents():
-                            actions = agent.take_actions(self, phase)
-                            agent_actions[agent] = actions
-                        for agent in self.get_agents():
-                            for action in agent_actions[agent]:
-                                self.resolve_action(phase, agent, action)
-                    else:
-                        for agent in self.get_agents():
-                            actions = agent.take_actions(self, phase)
-                            for action in actions:
-                                self.resolve_action(phase, agent, action)
-                    #Terminate phase
-                    self.terminate_phase(phase)
+                with rng.using(self._random):
+                    self._playout(choose, max_decisions)
             except GameEnded:
-                break
+                self._game_ended = True
+            finally:
+                self._ending_by_flag = False
+        if not self._game_ended:
+            return None
+        return self.get_scores()
+
+    def _playout(self, choose, max_decisions):
+        order = self._phases_order
+        phases = self._phases
+        decisions = 0
+        while not self._game_ended:
+            if max_decisions is not None and decisions >= max_decisions:
+                return
+            phase = order[self._phase_index]
+            agents = self.get_agents()
+            if phases[phase]["simultaneous"]:
+                chosen = list(self._pending_actions)
+                decisions += len(agents) - len(chosen)
+                for agent in agents[len(chosen):]:
+                    chosen.append(choose(phase, agent))
+                self._pending_actions = ()
+                for agent, actions in zip(agents, chosen):
+                    for action in actions:
+                        self.resolve_action(phase, agent, action)
+                        if self._game_ended:
+                            return
+                self._agent_index = len(agents)
+            else:
+                agent = agents[self._agent_index]
+                decisions += 1
+                for action in choose(phase, agent):
+                    self.resolve_action(phase, agent, action)
+                    if self._game_ended:
+                        return
+                self._agent_index += 1
+            if self._agent_index >= len(agents):
+                self.terminate_phase(phase)
+                if self._game_ended:
+                    return
+                self._phase_index = (self._phase_index + 1) % len(order)
+                self._agent_index = 0
+                self.prepare_phase(order[self._phase_index])
+
+    def _end(self):
+        self._game_ended = True
+        self.flush_log()
+        if self._trace is not None:
+            self._trace.end()
+
+    def _record(self, phase, agents, actions):
+        space = self.get_action_space()
+        if self._phases[phase]["simultaneous"]:
+            first = len(self._pending_actions)
+        else:
+            first = self._agent_index
+            actions = actions[:1]
+        for i, agent_actions in enumerate(actions):
+            self._trace.record(self._phase_index, first + i,
+                    space.encode_all(agent_actions))
+
+    def record(self, writer):
+        """
+        Record the next games played into a trace stream.
+
+        Each reset starts a new trace, holding the seed of game and the
+        actions of each decision encoded by the action space of game.
+
+        :param writer: trace writer, None to stop recording
+        :type writer: trace.TraceWriter
+        :return: current instance
+        :rtype: Game
+        """
+        if self._trace is not None:
+            self._trace.end()
+        self._trace = writer
+        return self
+
+    def replay(self, trace):
+        """
+        Play a recorded game again, without calling agents nor logging.
+
+        The game shall have the same agents, in the same order, as the
+        recorded one. Games without seed are replayed deterministically only
+        if they do not draw random numbers.
+
+        :param trace: recorded game
+        :type trace: trace.Trace
+        :return: current instance, in the state of the end of trace
+        :rtype: Game
+        :raise TraceError: if trace does not match game
+        """
+        if [agent.get_name() for agent in self._agents] != trace.agents:
+            raise TraceError("Trace agents {} differ from game agents"
+                    .format(trace.agents))
+        if list(self._phases_order) != trace.phases:
+            raise TraceError("Trace phases {} differ from game phases"
+                    .format(trace.phases))
+        space = self.get_action_space()
+        seed = trace.seed
+        if seed is not None:
+            #Spawning streams changes a seed: the one of trace is left as it is
+            seed = rng.SeedSequence(seed.get_entropy(), seed.get_spawn_key())
+        with self.silenced():
+            decisions = self._reset(seed)
+            for phase, agent, ids in trace.decisions:
+                if not decisions or self._phase_index != phase or \
+                        decisions[0].get_agent() is not \
+                        self.get_agents()[agent]:
+                    raise TraceError("Trace diverges from game at decision "
+                            "of agent {} in phase {}".format(agent, phase))
+                decisions = self.step([[space.decode(i) for i in ids]])
+        return self
+
+    @contextlib.contextmanager
+    def silenced(self):
+        """
+        Context manager disabling log and trace recording, for replays and
+        searches playing hypothetical moves.
+        """
+        logger, gate, writer = self._logger, self._log_gate, self._trace
+        self._logger = None
+        self._log_gate = DISABLED
+        self._trace = None
+        try:
+            yield self
+        finally:
+            self._logger, self._log_gate, self._trace = logger, gate, writer
+
+    @contextlib.contextmanager
+    def searching(self):
+        """
+        Context manager for agents searching the game itself: they play
+        hypothetical moves and restore a checkpoint afterwards, so that nothing
+        else shall use the game meanwhile. Log and trace are disabled, see
+        silenced.
+
+        Searches may be nested within a thread, but a game cannot be searched
+        by two threads at once, like agents sharing a thread pool in a
+        simultaneous phase: give them a process pool instead.
+
+        :raise RuntimeError: if game is being searched by another thread
+        """
+        thread = threading.get_ident()
+        with _searchers_lock:
+            searcher, depth = self._searcher
+            if depth and searcher != thread:
+                raise RuntimeError("Game is already being searched by "
+                        "another thread")
+            self._searcher = (thread, depth + 1)
+        try:
+            with self.silenced():
+                yield self
+        finally:
+            with _searchers_lock:
+                self._searcher = (thread, depth)
+
+    def resample(self, generator):
+        """
+        Reseed all random streams of game (or random module if game has no
+        seed) from a generator, so that chance events following are drawn
+        anew. Used by searches exploring several outcomes of a state; restore
+        a checkpoint to get the original streams back.
+
+        :param generator: source of seeds
+        :type generator: random.Random
+        """
+        for stream in self._get_streams():
+            stream.seed(generator.getrandbits(64))
+
+    def checkpoint(self):
+        """
+        Capture the complete state of engine: board, position in phases,
+        pending simultaneous actions, agents order, state of random streams
+        (or random module if game has no seed) and checkpoint fields of
+        subclasses.
+
+        Saving the state of random streams costs far more than the rest:
+        deterministic games leave them out, agents' streams included, so that
+        checkpoints are cheap enough to be taken at every node of a search.
+
+        Changes to the board are recorded from the first checkpoint on, see
+        Board.checkpoint: call get_board().commit() to stop recording them.
+
+        :return: checkpoint to be given to restore
+        :rtype: tuple
+        """
+        board = self._board
+        order = self._agents_order
+        return (board, None if board is None else board.checkpoint(),
+                self._game_ended, self._phase_index, self._agent_index,
+                self._pending_actions, tuple(self._agents),
+                None if order is None else tuple(order), self._random,
+                () if self.deterministic else
+                tuple((g, g.getstate()) for g in self._get_streams()),
+                tuple(getattr(self, name) for name in self._checkpoint_fields))
+
+    def restore(self, checkpoint):
+        """
+        Restore the state of engine captured by a checkpoint.
+
+        Checkpoints created after the given one become invalid.
+
+        :param checkpoint: checkpoint created by checkpoint method
+        :type checkpoint: tuple
+        :return: current instance
+        :rtype: Game
+        """
+        (board, board_checkpoint, self._game_ended, self._phase_index,
+                self._agent_index, self._pending_actions, agents, order,
+                self._random, streams, fields) = checkpoint
+        if board is not None:
+            board.rollback(board_checkpoint)
+        self._board = board
+        self._agents = list(agents)
+        self._agents_order = None if order is None else list(order)
+        for generator, state in streams:
+            generator.setstate(state)
+        for name, value in zip(self._checkpoint_fields, fields):
+            setattr(self, name, value)
+        return self
+
+    def _get_streams(self):
+        streams = [self.get_random()]
+        board = self._board
+        if board is not None and board._random is not None:
+            streams.append(board._random)
+        for agent in self._agents:
+            if agent._random is not None:
+                streams.append(agent._random)
+        return streams
+
+    def get_state_hash(self):
+        """
+        Get the 64-bit hash of the state of game: board and position in phases.
+
+        The state of random module is not part of the hash.
+
+        :rtype: int
+        """
+        return zobrist.mix(self._board.get_hash(), zobrist.value_key((
+                self._game_ended, self._phase_index, self._agent_index,
+                self._pending_actions)))
+
+    def _play(self):
+        """
+        Play a game, yielding each time agents shall take actions.
+
+        Yields tuples (phase, agents) and expects to be sent back the list of
+        actions of each of these agents.
+        """
+        decisions = self.reset()
+        while decisions:
+            actions = yield decisions[0].get_phase(), [d.get_agent()
+                    for d in decisions]
+            decisions = self.step(actions)
+
+    def mainloop(self):
+        decisions = self.reset()
+        #Stream of game is put in use once for all steps: agents deciding in
+        #this thread use it too
+        with rng.using(self._random):
+            while decisions:
+                phase = decisions[0].get_phase()
+                if len(decisions) > 1:
+                    actions = self._take_simultaneous_actions(
+                            [d.get_agent() for d in decisions], phase)
+                elif self._time_controls:
+                    actions = [self._decide(decisions[0].get_agent(), phase)]
+                else:
+                    actions = [decisions[0].get_agent().take_actions(self,
+                            phase)]
+                decisions = self.step(actions)
+
+    def _start_decision(self, agent, control):
+        deadline = Deadline(control.get_allowed(self.get_remaining_bank(agent)))
+        self._deadlines[agent] = deadline
+        return deadline
+
+    def _decide(self, agent, phase):
+        control = self.get_time_control(agent)
+        if control is None:
+            return agent.take_actions(self, phase)
+        game = self._copy_for_agents()
+        deadline = self._start_decision(agent, control)
+        future = concurrent.futures.Future()
+        if not deadline.expired():
+            #Otherwise bank is empty: agent is not even asked
+            game._deadlines = {agent: deadline}
+            def think():
+                try:
+                    future.set_result(agent.take_actions(game, phase))
+                except BaseException as e:
+                    future.set_exception(e)
+            future.set_running_or_notify_cancel()
+            threading.Thread(target=think, daemon=True).start()
+        return self._end_decision(agent, phase, deadline, future)
+
+    def _end_decision(self, agent, phase, deadline, future):
+        if deadline is None:
+            return future.result()
+        try:
+            actions = future.result(deadline.remaining())
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            actions = None
+        return self._account_decision(agent, phase, deadline, actions)
+
+    def _account_decision(self, agent, phase, deadline, actions):
+        """
+        Close the decision of an agent whose time is limited.
+
+        :param actions: actions taken by agent, None if it ran out of time
+        :type actions: list
+        :return: actions to be played
+        :rtype: list
+        """
+        timed_out = actions is None
+        if timed_out:
+            #Agent still thinking on its copy of game is abandoned: it shall
+            #stop by itself, its expired deadline telling it so
+            deadline.expire()
+            actions = deadline.get_best()
+            if actions is None:
+                actions = self.default_actions(phase, agent)
+            self.log(WARNING, "   {} ran out of time\n", agent.get_name())
+        elapsed = deadline.elapsed()
+        self.get_thinking_statistics(agent).update(elapsed, timed_out)
+        control = self.get_time_control(agent)
+        if control.bank is not None:
+            self._banks[agent] = max(self.get_remaining_bank(agent) - elapsed,
+                    0.) + control.increment
+        del self._deadlines[agent]
+        return actions
+
+    def _copy_for_agents(self):
+        """
+        Copy game for agents thinking in other threads, who may keep using it
+        after their deadline: agents are shared with the copy, board and
+        random streams of game are not.
+
+        :rtype: Game
+        """
+        return copy.deepcopy(self, {id(agent): agent for agent in self._agents})
+
+    def _take_simultaneous_actions(self, agents, phase):
+        if self._executor is None:
+            return [self._decide(agent, phase) for agent in agents]
+        controls = [self.get_time_control(agent) for agent in agents]
+        if isinstance(self._executor, concurrent.futures.ProcessPoolExecutor):
+            data = self._dump_for_agents()
+            if len(data) < _SHARED_DUMP_SIZE:
+                return self._submit_remote(agents, phase, controls, data)
+            memory = shared_memory.SharedMemory(create=True, size=len(data))
+            try:
+                memory.buf[:len(data)] = data
+                return self._submit_remote(agents, phase, controls,
+                        (memory.name, len(data)))
+            finally:
+                #Workers abandoned after their deadline cannot read it anymore
+                memory.close()
+                memory.unlink()
+        games = [self._copy_for_agents() for agent in agents]
+        deadlines = [None if control is None else
+                self._start_decision(agent, control)
+                for agent, control in zip(agents, controls)]
+        futures = [ ]
+        for agent, game, deadline in zip(agents, games, deadlines):
+            if deadline is not None:
+                game._deadlines = {agent: deadline}
+            futures.append(self._executor.submit(agent.take_actions, game,
+                    phase))
+        return [self._end_decision(agent, phase, deadline, future)
+                for agent, deadline, future in zip(agents, deadlines, futures)]
+
+    def _submit_remote(self, agents, phase, controls, data):
+        """
+        Dispatch decisions of agents to a process pool and wait for them.
+
+        :param data: pickled game, or name and size of the shared memory
+            holding it
+        :type data: bytes
+        """
+        deadlines = [None if control is None else
+                self._start_decision(agent, control)
+                for agent, control in zip(agents, controls)]
+        key = (os.getpid(), next(_dispatches))
+        all_agents = self.get_agents()
+        futures = [self._executor.submit(_remote_take_actions, key, data,
+                all_agents.index(agent), phase, None if agent._random is None
+                else agent._random.getrandbits(64)) for agent in agents]
+        return [self._end_decision(agent, phase, deadline, future)
+                for agent, deadline, future in zip(agents, deadlines, futures)]
+
+    def _dump_for_agents(self):
+        """
+        Pickle game for agents deciding in other processes.
+
+        Random generators, most of a pickled game, are left out: see
+        _remote_take_actions.
+
+        :rtype: bytes
+        """
+        board = self._board
+        generators = (self._random, board._random,
+                [agent._random for agent in self._agents])
+        self._random = None
+        board.set_random(None)
+        for agent in self._agents:
+            agent._random = None
+        try:
+            return pickle.dumps(self, pickle.HIGHEST_PROTOCOL)
+        finally:
+            self._random = generators[0]
+            board.set_random(generators[1])
+            for agent, generator in zip(self._agents, generators[2]):
+                agent._random = generator
+
+    async def amainloop(self):
+        """
+        Asynchronous game loop.
+
+        In simultaneous phases, agents take their actions concurrently, each
+        on its own copy of the game. In other phases, they still act one after
+        another. Time allowed to agents is limited like in mainloop, see
+        set_time_control.
+        """
+        play = self._play()
+        try:
+            phase, agents = next(play)
+            while True:
+                actions = await asyncio.gather(*[
+                        self._atake_actions(agent, phase, len(agents) > 1)
+                        for agent in agents])
+                phase, agents = play.send(actions)
+        except StopIteration:
+            pass
+
+    async def _atake_actions(self, agent, phase, shared):
+        control = self.get_time_control(agent)
+        if control is None:
+            return await agent.atake_actions(self._copy_for_agents()
+                    if shared else self, phase)
+        game = self._copy_for_agents()
+        deadline = self._start_decision(agent, control)
+        actions = None
+        if not deadline.expired():
+            game._deadlines = {agent: deadline}
+            try:
+                actions = await asyncio.wait_for(agent.atake_actions(game,
+                        phase), deadline.remaining())
+            except asyncio.TimeoutError:
+                pass
+        return self._account_decision(agent, phase, deadline, actions)
 
     def get_board(self):
         return self._board
 
+    def set_logger(self, logger):
+        """
+        Set the destination of log.
+
+        :param logger: file-like object or LogWriter, None to disable log
+        """
+        if logger is not None and not isinstance(logger, LogWriter):
+            logger = LogWriter(logger)
+        self._logger = logger
+        self.set_log_level(self._log_level)
+
+    def get_logger(self):
+        """
+        Get the writer of log.
+
+        :rtype: LogWriter
+        """
+        return self._logger
+
+    def set_log_level(self, level):
+        """
+        Set the lowest level of events written to log.
+
+        :param level: level from log module, DISABLED to disable log
+        :type level: int
+        """
+        self._log_level = level
+        self._log_gate = DISABLED if self._logger is None else level
+
+    def get_log_level(self):
+        return self._log_level
+
+    def log(self, level, template, *args):
+        """
+        Log an event.
+
+        Template is formatted with arguments only if event is written.
+
+        :param level: level of event, from log module
+        :type level: int
+        :param template: str.format template
+        :type template: str
+        """
+        if level >= self._log_gate:
+            self._logger.write_event(template, args)
+
+    def flush_log(self):
+        """
+        Write events buffered by logger.
+        """
+        if self._logger is not None:
+            self._logger.flush()
+
     def write_to_log(self, *args, **kwargs):
         """
-        Write to log.
+        Write to log at INFO level, see LogWriter.write.
         """
-        self._logger.write(*args, **kwargs)
+        if INFO >= self._log_gate:
+            self._logger.write(*args, **kwargs)
 
     def setup_board(self):
         raise NotImplementedError
@@ -101,8 +1037,138 @@ class Game():
     def resolve_action(self, phase, agent, action):
         raise NotImplementedError
 
+    def default_actions(self, phase, agent):
+        """
+        Actions played by an agent who did not decide in time.
+
+        :rtype: list
+        """
+        return [ ]
+
+    def get_legal_actions(self, phase, agent):
+        """
+        Get legal actions of an agent, from cache when possible.
+
+        Legal actions generated by list_legal_actions are cached by phase and
+        agent, along with the board, its fork epoch and the components read
+        while generating them. Cached actions are generated again when one of
+        these components changes, undo included, or when the board is replaced
+        or forked: the components of a forked board are copied on change.
+        Games whose legal actions depend on other state shall call
+        invalidate_legal_actions when it changes.
+
+        :rtype: list
+        """
+        return list(self._get_legal_entry(phase, agent)[0])
+
+    def invalidate_legal_actions(self):
+        """
+        Clear the cache of legal actions.
+        """
+        self._legal_actions = { }
+        self._legal_masks = { }
+
+    def _get_legal_entry(self, phase, agent):
+        key = (phase, agent)
+        board = self._board
+        origin = (id(board), getattr(board, "_epoch", None))
+        entry = self._legal_actions.get(key)
+        if entry is not None and entry[3] == origin:
+            for component, stamp in entry[2]:
+                if component._stamp != stamp:
+                    break
+            else:
+                #Generation of enclosing legal actions depends on these reads
+                if Component._tracking:
+                    track_reads(entry[2])
+                return entry
+        with tracking() as reads:
+            actions = self.list_legal_actions(phase, agent)
+        try:
+            action_set = frozenset(actions)
+        except TypeError:
+            action_set = None
+        entry = (actions, action_set, tuple(reads.values()), origin)
+        self._legal_actions[key] = entry
+        return entry
+
     def is_legal_action(self, phase, agent, action):
-        raise NotImplementedError
+        """
+        Check whether an action is legal.
+
+        Answers from the cache of legal actions, in O(1) if actions are
+        hashable: games may override it with a direct check.
+
+        :rtype: bool
+        """
+        actions, action_set = self._get_legal_entry(phase, agent)[:2]
+        if action_set is not None:
+            try:
+                return action in action_set
+            except TypeError:
+                pass
+        return action in actions
+
+    def legal_action_mask(self, phase, agent):
+        """
+        Get the mask of legal actions of an agent over the action space.
+
+        :return: read-only boolean array indexed by action ids, list if numpy
+            is not installed
+        """
+        return self.generate_legal_action_mask(phase, agent)
+
+    def generate_legal_action_mask(self, phase, agent):
+        """
+        Generate the mask of legal actions of an agent.
+
+        Defaults to encoding the cached legal actions, the mask being cached
+        as long as they are valid: games able to compute masks directly from
+        their state should override it.
+        """
+        key = (phase, agent)
+        entry = self._get_legal_entry(phase, agent)
+        cached = self._legal_masks.get(key)
+        if cached is not None and cached[0] is entry:
+            return cached[1]
+        space = self.get_action_space()
+        ids = space.encode_all(entry[0])
+        if numpy is None:
+            mask = [False] * len(space)
+            for i in ids:
+                mask[i] = True
+        else:
+            mask = numpy.zeros(len(space), dtype=bool)
+            mask[ids] = True
+            mask.flags.writeable = False
+        self._legal_masks[key] = (entry, mask)
+        return mask
 
     def list_legal_actions(self, phase, agent):
         raise NotImplementedError
+
+    def get_action_space(self):
+        """
+        Get the space of all actions of game, numbering them by integer ids.
+
+        :rtype: ActionSpace
+        """
+        raise NotImplementedError
+
+    def get_observation(self, agent):
+        """
+        Get the state of game as seen by an agent, for learning agents.
+
+        :return: flat sequence of numbers
+        :rtype: list
+        """
+        raise NotImplementedError
+
+    def get_scores(self):
+        """
+        Get scores of agents once the game has ended.
+
+        :return: scores by agent name
+        :rtype: dict
+        """
+        raise NotImplementedError
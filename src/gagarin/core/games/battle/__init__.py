@@ -0,0 +1,230 @@
+#!encoding: utf-8
+
+"""
+Battle card game for two players.
+
+Each player reveals the top card of his/her deck, highest card wins both cards.
+On a tie, each player adds a card face down then a card face up until one of
+them wins. A player who has no more card loses the game.
+"""
+from ...board import Board
+from ...zone import Zone
+from ...deck import Deck
+from ...card import Card
+from ...agent import Agent, ActionSpace
+from ...game import Game
+from ...log import INFO
+
+
+FACEVALUES = ["A", "K", "Q", "J", "10", "9", "8", "7", "6", "5", "4", "3", "2"]
+#Spades, Hearts, Diamonds, Clubs
+COLOURS = [u"♠", u"♥", u"♦", u"♣"]
+ACTIONS = ActionSpace([('Play', 'face up'), ('Play', 'face down')])
+
+
+class BattleCard(Card):
+    """
+    Standard playing card ranked by face value.
+    """
+
+    def __init__(self, facevalue, colour):
+        Card.__init__(self, facevalue=facevalue, colour=colour)
+        try:
+            self._score = int(facevalue)
+        except ValueError:
+            self._score = {"J": 11, "Q": 12, "K": 13, "A": 14}[facevalue]
+
+    def __str__(self):
+        return u"{}{}".format(self.facevalue, self.colour)
+
+    def get_rank(self):
+        """
+        Get rank of card, from 2 to 14 (ace).
+
+        :rtype: int
+        """
+        return self._score
+
+
+def standard_deck():
+    """
+    Create a shuffled deck of 52 cards.
+
+    :rtype: Deck
+    """
+    deck = Deck(name="Deck")
+    for c in COLOURS:
+        for fv in FACEVALUES:
+            deck.add(BattleCard(facevalue=fv, colour=c))
+    deck.shuffle()
+    return deck
+
+
+class Battle(Game):
+    end_by_flag = True
+
+    def __init__(self, max_turns=1000, logger=None, seed=None):
+        super(Battle, self).__init__(logger, seed)
+        self.add_phase("main", simultaneous=True)
+        self.set_phases_order(["main"])
+        self._components = { }
+        self._max_turns = max_turns
+
+    def setup_board(self):
+        #Initialisation
+        self.log(INFO, "Setting up the board...\n")
+        board = Board(name="Board", turn=0)
+        self.log(INFO, "   board: {}\n", board.name)
+        #Draw cards
+        deck = standard_deck()
+        nb_cards = len(deck) // self.count_agents()
+        piles = deck.deal(self.count_agents(), nb_cards)
+        #Create player area
+        self._components = { }
+        for agent, pile in zip(self.get_agents(), piles):
+            self._components[agent] = { }
+            zone = Zone(name=agent.get_name())
+            board.add(zone)
+            deck = Deck(name="{}/Deck".format(agent.get_name()))
+            for card in pile:
+                deck.add(card)
+            zone.add(deck)
+            self._components[agent]["deck"] = deck
+            discard = Deck(name="{}/Discard".format(agent.get_name()),
+                    face_up=True)
+            zone.add(discard)
+            self._components[agent]["discard"] = discard
+            area = Zone(name="{}/PlayArea".format(agent.get_name()))
+            zone.add(area)
+            self._components[agent]["area"] = area
+        self.log(INFO, "Board setup complete!\n")
+        return board
+
+    def prepare_phase(self, phase):
+        board = self.get_board()
+        if phase == "main":
+            board.turn += 1
+            self.log(INFO, "Turn: {}\n", board.turn)
+            #Reshuffle deck ?
+            for agent in self.get_agents():
+                deck = self._components[agent]["deck"]
+                discard = self._components[agent]["discard"]
+                if deck.is_empty():
+                    for card in discard.draw_all():
+                        deck.add(card)
+                    deck.shuffle()
+                    self.log(INFO, "   {} deck is empty, reshuffle discard. "
+                            "He/she now has {} cards\n", agent.get_name(),
+                            len(deck))
+                    if deck.is_empty():
+                        self.log(INFO, "   {} has lost the game\n",
+                                agent.get_name())
+                        return self.declare_end()
+
+    def terminate_phase(self, phase):
+        board = self.get_board()
+        if phase == "main":
+            agents = self.get_agents()
+            areas = [self._components[agent]["area"] for agent in agents]
+            discards = [self._components[agent]["discard"] for agent in agents]
+            top_cards = [list(area)[-1] for area in areas]
+            #Check who has won
+            winner = None
+            ranks = [card.get_rank() for card in top_cards]
+            if any(card.is_face_down() for card in top_cards):
+                #Hidden cards of a battle, reveal next turn
+                pass
+            elif ranks[0] > ranks[1]:
+                winner = 0
+            elif ranks[0] < ranks[1]:
+                winner = 1
+            else:
+                self.log(INFO, "   Battle !\n")
+            if winner is not None:
+                self.log(INFO, "   {} wins\n", agents[winner].get_name())
+                loot = [ ]
+                for area in areas:
+                    local_loot = list(area)
+                    for card in local_loot:
+                        area.remove(card)
+                    loot.extend(local_loot)
+                for card in loot:
+                    discards[winner].add(card)
+            if board.turn >= self._max_turns:
+                self.log(INFO, "Game now ends.\n")
+                self.declare_end()
+
+    def get_scores(self):
+        scores = { }
+        for agent in self.get_agents():
+            scores[agent.get_name()] = sum(len(self._components[agent][name])
+                    for name in ["deck", "discard", "area"])
+        return scores
+
+    def get_observation(self, agent):
+        #Own counts first, then opponent's, then visible top cards ranks
+        agents = sorted(self.get_agents(), key=lambda a: a is not agent)
+        observation = [self.get_board().turn]
+        for a in agents:
+            observation.extend(len(self._components[a][name])
+                    for name in ["deck", "discard", "area"])
+        for a in agents:
+            cards = list(self._components[a]["area"])
+            if cards and cards[-1].is_face_up():
+                observation.append(cards[-1].get_rank())
+            else:
+                observation.append(0)
+        return observation
+
+    def is_legal_action(self, phase, agent, action):
+        play_area = self._components[agent]["area"]
+        if play_area.is_empty():
+            #If it's empty you can only play a card face up
+            return action == ('Play', 'face up')
+        #If it's not empty, it's a battle
+        last_is_visible = list(play_area)[-1].is_face_up()
+        if action == ('Play', 'face down'):
+            return last_is_visible
+        else:
+            return not last_is_visible
+
+    def list_legal_actions(self, phase, agent):
+        return list(filter(lambda x: self.is_legal_action(phase, agent, x),
+                ACTIONS))
+
+    def get_action_space(self):
+        return ACTIONS
+
+    def default_actions(self, phase, agent):
+        return self.get_legal_actions(phase, agent)[:1]
+
+    def resolve_action(self, phase, agent, action):
+        if phase == "main":
+            deck = self._components[agent]["deck"]
+            play_area = self._components[agent]["area"]
+            if deck.is_empty():
+                #Player has run out of cards in the middle of a battle
+                self.log(INFO, "   {} has lost the game\n", agent.get_name())
+                return self.declare_end()
+            if action == ('Play', 'face up'):
+                card = deck.draw(face_up=True)[0]
+                self.log(INFO, "   {} plays {}\n", agent.get_name(), card)
+                play_area.add(card)
+            elif action == ('Play', 'face down'):
+                card = deck.draw(face_up=False)[0]
+                play_area.add(card)
+                self.log(INFO, "   {} plays a card face down\n",
+                        agent.get_name())
+
+
+class BattleAgent(Agent):
+    """
+    Agent playing the first legal action.
+    """
+
+    def take_actions(self, game, phase):
+        all_actions = game.get_legal_actions(phase, self)
+        if len(all_actions) > 0:
+            return [all_actions[0]]
+        else:
+            return [ ]
@@ -0,0 +1,107 @@
+#!encoding: utf-8
+
+"""
+Nim, a game of perfect information for two players.
+
+Stones are split into heaps. In turn, each player takes any number of stones
+from a single heap. The player who takes the last stone wins.
+"""
+from ...board import Board
+from ...token import Token, TokenPool
+from ...agent import Agent, Action, ActionSpace
+from ...game import Game
+from ...log import INFO
+
+
+STONE = Token(name="stone")
+
+
+class Nim(Game):
+    end_by_flag = True
+    deterministic = True
+
+    def __init__(self, heaps=(3, 4, 5), logger=None, seed=None):
+        """
+        Initializer.
+
+        :param heaps: number of stones of each heap
+        :type heaps: tuple
+        """
+        super(Nim, self).__init__(logger, seed)
+        self.add_phase("main")
+        self.set_phases_order(["main"])
+        self._sizes = tuple(heaps)
+        self._heaps = [ ]
+        self._space = ActionSpace.product(heap=range(len(self._sizes)),
+                take=range(1, max(self._sizes) + 1))
+
+    def setup_board(self):
+        board = Board(name="Board", last=None)
+        self._heaps = [ ]
+        for i, size in enumerate(self._sizes):
+            heap = TokenPool(name="Heap{}".format(i))
+            heap.put(STONE, size)
+            board.add(heap)
+            self._heaps.append(heap)
+        self.log(INFO, "Heaps: {}\n", self._sizes)
+        return board
+
+    def get_heaps(self):
+        """
+        Get number of stones of each heap.
+
+        :rtype: list
+        """
+        return [heap.count() for heap in self._heaps]
+
+    def list_legal_actions(self, phase, agent):
+        return [Action(heap=i, take=take) for i, count in
+                enumerate(self.get_heaps()) for take in range(1, count + 1)]
+
+    def is_legal_action(self, phase, agent, action):
+        heaps = self.get_heaps()
+        return 0 <= action.heap < len(heaps) and \
+                1 <= action.take <= heaps[action.heap]
+
+    def get_action_space(self):
+        return self._space
+
+    def default_actions(self, phase, agent):
+        return self.get_legal_actions(phase, agent)[:1]
+
+    def resolve_action(self, phase, agent, action):
+        self._heaps[action.heap].take(STONE, action.take)
+        board = self.get_board()
+        board.last = agent.get_name()
+        self.log(INFO, "   {} takes {} from heap {}\n", agent.get_name(),
+                action.take, action.heap)
+        if all(heap.is_empty() for heap in self._heaps):
+            self.log(INFO, "   {} wins\n", agent.get_name())
+            self.declare_end()
+
+    def get_scores(self):
+        last = self.get_board().last
+        return {agent.get_name(): int(agent.get_name() == last)
+                for agent in self.get_agents()}
+
+    def get_observation(self, agent):
+        return self.get_heaps()
+
+
+class NimAgent(Agent):
+    """
+    Agent playing perfectly: it leaves heaps whose stones count XOR to zero
+    when it can, otherwise it takes a random stone.
+    """
+
+    def take_actions(self, game, phase):
+        heaps = game.get_heaps()
+        total = 0
+        for count in heaps:
+            total ^= count
+        if total:
+            for i, count in enumerate(heaps):
+                if count ^ total < count:
+                    return [Action(heap=i, take=count - (count ^ total))]
+        actions = game.get_legal_actions(phase, self)
+        return [self.get_random().choice(actions)] if actions else [ ]
@@ -0,0 +1,165 @@
+#!encoding: utf-8
+
+"""
+Level-gated event logging for games.
+
+Events are logged as a template and arguments, formatted with str.format only
+when they are written: games log with Game.log, which costs a single
+comparison when the level of event is disabled.
+
+Writers buffering events format them when they flush: arguments shall
+therefore not change after being logged (names, numbers, cards which do not
+change face value...).
+"""
+import queue
+import sys
+import threading
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+#Level above any event
+DISABLED = sys.maxsize
+
+
+class LogWriter():
+    """
+    Write events to a stream as soon as they are logged.
+    """
+
+    def __init__(self, stream):
+        """
+        Initializer.
+
+        :param stream: file-like object
+        """
+        self._stream = stream
+
+    def get_stream(self):
+        return self._stream
+
+    def write_event(self, template, args):
+        """
+        Write an event.
+
+        :param template: str.format template, written as it is without args
+        :type template: str
+        :param args: arguments of template
+        :type args: tuple
+        """
+        self._stream.write(template.format(*args) if args else template)
+
+    def write(self, *args, **kwargs):
+        """
+        Write to stream as to a file-like object, after pending events.
+
+        Arguments are given as they are to the write method of stream.
+        """
+        return self._stream.write(*args, **kwargs)
+
+    def flush(self):
+        """
+        Write pending events and flush stream.
+        """
+        flush = getattr(self._stream, "flush", None)
+        if flush is not None:
+            flush()
+
+    def close(self):
+        """
+        Write pending events: the stream is not closed.
+        """
+        self.flush()
+
+
+class BufferedLogWriter(LogWriter):
+    """
+    Write events to a stream in batches.
+
+    In background mode, events are queued and a daemon thread formats and
+    writes them, so that the game thread only pays for appending to a queue.
+    """
+
+    def __init__(self, stream, batch_size=256, background=False):
+        """
+        Initializer.
+
+        :param stream: file-like object
+        :param batch_size: number of events buffered before writing them
+        :type batch_size: int
+        :param background: whether to write events in a background thread
+        :type background: bool
+        """
+        super(BufferedLogWriter, self).__init__(stream)
+        self._batch_size = batch_size
+        self._events = [ ]
+        self._queue = None
+        self._thread = None
+        if background:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                    name="gagarin-log")
+            self._thread.start()
+
+    def write_event(self, template, args):
+        events = self._events
+        events.append((template, args))
+        if len(events) >= self._batch_size:
+            self._dispatch()
+
+    def write(self, *args, **kwargs):
+        if len(args) == 1 and not kwargs:
+            #Text alone is buffered as an event without arguments
+            self.write_event(args[0], ())
+            return
+        self.flush()
+        return super(BufferedLogWriter, self).write(*args, **kwargs)
+
+    def _dispatch(self):
+        events = self._events
+        self._events = [ ]
+        if not events:
+            return
+        if self._queue is None:
+            self._write(events)
+        else:
+            self._queue.put(events)
+
+    def _write(self, events):
+        self._stream.write("".join(template.format(*args) if args
+                else template for template, args in events))
+
+    def _run(self):
+        while True:
+            events = self._queue.get()
+            try:
+                if events is None:
+                    return
+                self._write(events)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        self._dispatch()
+        if self._queue is not None:
+            self._queue.join()
+        super(BufferedLogWriter, self).flush()
+
+    def close(self):
+        """
+        Write pending events and stop background thread.
+        """
+        self.flush()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,548 @@
+#!encoding: utf-8
+
+"""
+Monte Carlo Tree Search agent.
+
+The agent explores moves of the game it plays: it plays them through
+Game.step and undoes them with Game.checkpoint and Game.restore, so that
+searching copies no board. States are identified by Game.get_state_hash, so
+that the tree is a transposition table: states reached by different orders
+of moves share their statistics, and the tree of a decision is reused for the
+following ones.
+
+Each decision of a simultaneous phase is a level of the tree, as if agents
+decided in turn. Chance events are drawn anew at each iteration (see
+Game.resample), so that stochastic games are searched through their possible
+outcomes.
+
+ParallelMCTSAgent spreads searches over the workers of an executor, either
+with independent trees (root parallelism) or by running playouts of a single
+tree in batches (leaf parallelism).
+"""
+import itertools
+import math
+import os
+import pickle
+import random
+import time
+
+from .agent import Agent
+from .clock import Deadline
+
+
+#Game unpickled by a worker process for current search, with checkpoint of its
+#root state
+_remote_search = (None, None, None)
+_searches = itertools.count()
+
+
+def random_policy(game, phase, agent, actions, generator):
+    """
+    Default rollout policy: play a random legal action.
+
+    :param game: game being played out
+    :type game: Game
+    :param phase: current phase
+    :type phase: str
+    :param agent: agent to decide
+    :type agent: Agent
+    :param actions: legal actions of agent, not empty
+    :type actions: list
+    :param generator: random generator of search
+    :type generator: random.Random
+    :return: action to play
+    """
+    return actions[int(generator.random() * len(actions))]
+
+
+class _Node():
+    """
+    State of the tree: agent to decide and statistics of its actions.
+    """
+    __slots__ = ("agent", "visits", "untried", "edges")
+
+    def __init__(self, agent, actions):
+        self.agent = agent
+        self.visits = 0
+        #Actions not played yet from this state
+        self.untried = actions
+        #Edges: [action, visits, total reward of agent]
+        self.edges = [ ]
+
+
+class SearchStatistics():
+    """
+    Effort of searches of an agent.
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.iterations = 0
+        self.elapsed = 0.
+        self.last_iterations = 0
+        self.last_elapsed = 0.
+
+    def update(self, iterations, elapsed):
+        """
+        Account for a search.
+
+        :param iterations: number of iterations
+        :type iterations: int
+        :param elapsed: duration of search in seconds
+        :type elapsed: float
+        """
+        self.searches += 1
+        self.iterations += iterations
+        self.elapsed += elapsed
+        self.last_iterations = iterations
+        self.last_elapsed = elapsed
+
+    def get_iterations_per_second(self):
+        """
+        Get mean number of iterations per second over all searches.
+
+        :rtype: float
+        """
+        return self.iterations / self.elapsed if self.elapsed else 0.
+
+    def __repr__(self):
+        return "SearchStatistics(searches={}, iterations={}, " \
+                "elapsed={:.6f}, iterations_per_second={:.1f})".format(
+                self.searches, self.iterations, self.elapsed,
+                self.get_iterations_per_second())
+
+
+class MCTSAgent(Agent):
+    """
+    Agent choosing its actions by Monte Carlo Tree Search with UCT selection.
+
+    Each decision is searched until the first of: number of iterations, time
+    limit, or deadline of game (see Game.set_time_control), the best action
+    found being proposed to the deadline regularly. Without any of them, 1000
+    iterations are run. The agent plays a single action per decision.
+
+    The game itself is searched, then restored: see Game.searching.
+    """
+
+    def __init__(self, name, iterations=None, time_limit=None,
+            exploration=math.sqrt(2), rollout_policy=random_policy,
+            max_depth=200, reuse_tree=True, max_nodes=1000000):
+        """
+        Initializer.
+
+        :param name: name of agent
+        :type name: str
+        :param iterations: number of iterations per decision
+        :type iterations: int
+        :param time_limit: time per decision in seconds
+        :type time_limit: float
+        :param exploration: exploration constant of UCT
+        :type exploration: float
+        :param rollout_policy: function choosing actions during rollouts, see
+            random_policy
+        :type rollout_policy: callable
+        :param max_depth: number of decisions after which a playout is
+            evaluated by evaluate instead of being played to the end
+        :type max_depth: int
+        :param reuse_tree: whether to keep statistics between decisions
+        :type reuse_tree: bool
+        :param max_nodes: number of states above which tree is cleared
+        :type max_nodes: int
+        """
+        super(MCTSAgent, self).__init__(name)
+        self._iterations = iterations
+        self._time_limit = time_limit
+        self._exploration = exploration
+        self._rollout_policy = rollout_policy
+        self._max_depth = max_depth
+        self._reuse_tree = reuse_tree
+        self._max_nodes = max_nodes
+        self._table = { }
+        self._statistics = SearchStatistics()
+
+    def reset(self):
+        self._table = { }
+
+    def get_statistics(self):
+        """
+        Get effort of searches of agent.
+
+        :rtype: SearchStatistics
+        """
+        return self._statistics
+
+    def count_nodes(self):
+        """
+        Count states of the search tree.
+
+        :rtype: int
+        """
+        return len(self._table)
+
+    def get_root_statistics(self, game):
+        """
+        Get statistics of actions of the current state of game.
+
+        :return: tuples (action, visits, mean reward), most visited first
+        :rtype: list
+        """
+        node = self._table.get(game.get_state_hash())
+        if node is None:
+            return [ ]
+        return sorted(((action, visits, total / visits) for action, visits,
+                total in node.edges), key=lambda edge: -edge[1])
+
+    def take_actions(self, game, phase):
+        actions = game.get_legal_actions(phase, self)
+        if len(actions) <= 1:
+            return actions
+        if not self._reuse_tree or len(self._table) > self._max_nodes:
+            self._table = { }
+        deadline = game.get_deadline(self)
+        if self._time_limit is not None:
+            limit = Deadline(self._time_limit)
+        else:
+            limit = Deadline()
+        iterations = self._iterations
+        if iterations is None and limit.is_unlimited() and \
+                deadline.is_unlimited():
+            iterations = 1000
+        generator = random.Random(self.get_random().getrandbits(64))
+        board = game.get_board()
+        recording = board.is_recording()
+        start = time.perf_counter()
+        with game.searching():
+            root = self._get_node(game)
+            checkpoint = game.checkpoint()
+            try:
+                count = self._search(game, root, checkpoint, generator,
+                        iterations, limit, deadline)
+            finally:
+                game.restore(checkpoint)
+                if not recording:
+                    board.commit()
+        self._statistics.update(count, time.perf_counter() - start)
+        return [self._best(root)]
+
+    def __getstate__(self):
+        #Copies sent to other processes start with an empty tree
+        state = self.__dict__.copy()
+        state["_table"] = { }
+        return state
+
+    def _search(self, game, root, checkpoint, generator, iterations, limit,
+            deadline):
+        """
+        Run iterations from root state until budget is exhausted.
+
+        :return: number of iterations
+        :rtype: int
+        """
+        count = 0
+        while iterations is None or count < iterations:
+            self._iterate(game, root, generator)
+            game.restore(checkpoint)
+            count += 1
+            if count % 16 == 0:
+                if limit.expired() or deadline.expired():
+                    break
+                deadline.propose([self._best(root)])
+        return count
+
+    def _best(self, node):
+        if not node.edges:
+            return node.untried[-1]
+        return max(node.edges, key=lambda edge: edge[1])[0]
+
+    def _get_node(self, game):
+        """
+        Get node of current state of game, creating it if needed.
+
+        :return: node, None if game has ended
+        """
+        key = game.get_state_hash()
+        node = self._table.get(key)
+        if node is None:
+            decisions = game.get_pending_decisions()
+            if not decisions:
+                return None
+            agent = decisions[0].get_agent()
+            node = _Node(agent, game.get_legal_actions(decisions[0]
+                    .get_phase(), agent))
+            self._table[key] = node
+        return node
+
+    def _iterate(self, game, root, generator):
+        """
+        Run an iteration: select a path of known states, expand the tree with
+        a new state, play out and update statistics along path.
+        """
+        game.resample(generator)
+        path, expanded = self._descend(game, root, generator)
+        if expanded:
+            rewards = self.playout(game, generator)
+        else:
+            rewards = self.evaluate(game)
+        self._backpropagate(path, rewards)
+
+    def _descend(self, game, root, generator):
+        """
+        Play moves from root state, selecting them by UCT, until a state not
+        in tree is reached (and added) or game ends.
+
+        :return: path of (node, edge) and whether a state was added
+        :rtype: tuple
+        """
+        path = [ ]
+        node = root
+        expanded = False
+        while node is not None and len(path) < self._max_depth:
+            if node.untried:
+                #Expand an action not played yet
+                actions = node.untried
+                index = int(generator.random() * len(actions))
+                actions[index], actions[-1] = actions[-1], actions[index]
+                edge = [actions.pop(), 0, 0.]
+                node.edges.append(edge)
+            elif node.edges:
+                edge = self._select(node)
+            else:
+                #No legal action
+                edge = None
+            path.append((node, edge))
+            game.step([[] if edge is None else [edge[0]]])
+            size = len(self._table)
+            node = self._get_node(game)
+            if len(self._table) > size:
+                expanded = True
+                break
+        return path, expanded
+
+    def _backpropagate(self, path, rewards, visited=False):
+        """
+        Update statistics along path.
+
+        :param rewards: rewards by agent
+        :type rewards: dict
+        :param visited: whether visits were already counted, by a virtual
+            loss
+        :type visited: bool
+        """
+        for node, edge in path:
+            if not visited:
+                node.visits += 1
+            if edge is not None:
+                if not visited:
+                    edge[1] += 1
+                edge[2] += rewards.get(node.agent, 0.)
+
+    def _select(self, node):
+        log_visits = math.log(node.visits)
+        exploration = self._exploration
+        best = None
+        best_value = -1.
+        for edge in node.edges:
+            value = edge[2] / edge[1] + exploration * math.sqrt(log_visits /
+                    edge[1])
+            if value > best_value:
+                best = edge
+                best_value = value
+        return best
+
+    def playout(self, game, generator):
+        """
+        Play game from current state with rollout policy.
+
+        :return: rewards by agent
+        :rtype: dict
+        """
+        game.playout(self._rollout_policy, generator, self._max_depth)
+        return self.evaluate(game)
+
+    def evaluate(self, game):
+        """
+        Get rewards of agents in current state of game.
+
+        Ended games are evaluated by scores: agents having the best score
+        share a reward of 1. Games still running are evaluated as a draw:
+        override it to use a heuristic.
+
+        :return: rewards by agent, between 0 and 1
+        :rtype: dict
+        """
+        agents = game.get_agents()
+        if not game.is_ended():
+            return {agent: 1. / len(agents) for agent in agents}
+        scores = game.get_scores()
+        best = max(scores.values())
+        winners = [agent for agent in agents if scores[agent.get_name()] ==
+                best]
+        return {agent: 1. / len(winners) if agent in winners else 0.
+                for agent in agents}
+
+
+def _remote_tree(data, index, iterations, time_limit, seed):
+    """
+    Search a tree in a worker process.
+
+    :return: statistics of root actions and number of iterations
+    :rtype: tuple
+    """
+    game = pickle.loads(data)
+    agent = game.get_agents()[index]
+    root = agent._get_node(game)
+    checkpoint = game.checkpoint()
+    with game.silenced():
+        count = MCTSAgent._search(agent, game, root, checkpoint,
+                random.Random(seed), iterations, Deadline(time_limit),
+                Deadline())
+    return [tuple(edge) for edge in root.edges], count
+
+
+def _remote_playouts(key, data, index, jobs):
+    """
+    Play out leaves in a worker process.
+
+    :param jobs: pairs of moves from root state to leaf and random seed
+    :type jobs: list
+    :return: rewards of each agent for each job
+    :rtype: list
+    """
+    global _remote_search
+    if _remote_search[0] != key:
+        game = pickle.loads(data)
+        _remote_search = (key, game, game.checkpoint())
+    key, game, checkpoint = _remote_search
+    agents = game.get_agents()
+    agent = agents[index]
+    results = [ ]
+    with game.silenced():
+        for actions, seed in jobs:
+            generator = random.Random(seed)
+            game.resample(generator)
+            for action in actions:
+                game.step([[] if action is None else [action]])
+            rewards = agent.playout(game, generator)
+            results.append([rewards.get(a, 0.) for a in agents])
+            game.restore(checkpoint)
+    return results
+
+
+class ParallelMCTSAgent(MCTSAgent):
+    """
+    MCTS agent searching with the workers of an executor, a process pool to
+    use several cores.
+
+    In root mode, each worker searches its own tree from the current state
+    with its share of iterations, and the statistics of actions of roots are
+    summed up. In leaf mode, the tree is kept by the agent: batches of leaves
+    are selected, each selection adding a virtual loss along its path so that
+    the next ones explore other moves, then played out by workers.
+
+    Games, agents and rollout policies shall be picklable.
+    """
+
+    def __init__(self, name, executor, workers, mode="root", batch_size=8,
+            **kwargs):
+        """
+        Initializer, other arguments being those of MCTSAgent.
+
+        :param executor: executor running searches
+        :type executor: concurrent.futures.Executor
+        :param workers: number of workers of executor
+        :type workers: int
+        :param mode: "root" or "leaf"
+        :type mode: str
+        :param batch_size: number of playouts sent to a worker at once in leaf
+            mode
+        :type batch_size: int
+        """
+        super(ParallelMCTSAgent, self).__init__(name, **kwargs)
+        if mode not in ("root", "leaf"):
+            raise ValueError("Unknown parallel MCTS mode: {}".format(mode))
+        self._executor = executor
+        self._workers = workers
+        self._mode = mode
+        self._batch_size = batch_size
+
+    def __getstate__(self):
+        state = super(ParallelMCTSAgent, self).__getstate__()
+        state["_executor"] = None
+        return state
+
+    def _search(self, game, root, checkpoint, generator, iterations, limit,
+            deadline):
+        data = pickle.dumps(game, pickle.HIGHEST_PROTOCOL)
+        index = game.get_agents().index(self)
+        if self._mode == "root":
+            return self._search_roots(data, index, root, generator, iterations,
+                    limit, deadline)
+        return self._search_leaves(game, data, index, root, checkpoint,
+                generator, iterations, limit, deadline)
+
+    def _search_roots(self, data, index, root, generator, iterations, limit,
+            deadline):
+        times = [t for t in (limit.remaining(), deadline.remaining())
+                if t is not None]
+        time_limit = min(times) if times else None
+        share = None
+        if iterations is not None:
+            share = -(-iterations // self._workers)
+        futures = [self._executor.submit(_remote_tree, data, index, share,
+                time_limit, generator.getrandbits(64))
+                for i in range(self._workers)]
+        count = 0
+        edges = {edge[0]: edge for edge in root.edges}
+        for future in futures:
+            statistics, iterations = future.result()
+            count += iterations
+            for action, visits, total in statistics:
+                edge = edges.get(action)
+                if edge is None:
+                    edge = edges[action] = [action, 0, 0.]
+                    root.edges.append(edge)
+                    if action in root.untried:
+                        root.untried.remove(action)
+                edge[1] += visits
+                edge[2] += total
+                root.visits += visits
+        return count
+
+    def _search_leaves(self, game, data, index, root, checkpoint, generator,
+            iterations, limit, deadline):
+        key = (os.getpid(), next(_searches))
+        agents = game.get_agents()
+        count = 0
+        while iterations is None or count < iterations:
+            size = self._workers * self._batch_size
+            if iterations is not None:
+                size = min(size, iterations - count)
+            pending = [ ]
+            for i in range(size):
+                seed = generator.getrandbits(64)
+                game.resample(random.Random(seed))
+                path, expanded = self._descend(game, root, generator)
+                #Virtual loss: visit without reward until playout returns
+                for node, edge in path:
+                    node.visits += 1
+                    if edge is not None:
+                        edge[1] += 1
+                if expanded:
+                    pending.append((path, ([None if edge is None else edge[0]
+                            for node, edge in path], seed)))
+                else:
+                    self._backpropagate(path, self.evaluate(game), True)
+                game.restore(checkpoint)
+            chunks = [pending[i::self._workers] for i in range(self._workers)]
+            chunks = [chunk for chunk in chunks if chunk]
+            futures = [self._executor.submit(_remote_playouts, key, data,
+                    index, [job for path, job in chunk]) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                for (path, job), rewards in zip(chunk, future.result()):
+                    self._backpropagate(path, dict(zip(agents, rewards)),
+                            True)
+            count += size
+            if limit.expired() or deadline.expired():
+                break
+            deadline.propose([self._best(root)])
+        return count
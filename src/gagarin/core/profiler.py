@@ -0,0 +1,222 @@
+#!encoding: utf-8
+
+"""
+Profiling of games: wall time and calls of game hooks and agents decisions.
+
+A profiler attached to a game (see Game.set_profiler) replaces the hooks of
+the game instance and the take_actions method of its agents with probes, so
+that games which are not profiled run unchanged. Time is accounted by
+(phase, hook, agent) and by call stack, nested hooks (legal actions listed by
+an agent while deciding for instance) being part of their caller's stack.
+"""
+import threading
+import time
+
+
+#Hooks of games profiled, with the positions of phase and agent arguments
+GAME_HOOKS = {
+    "setup_board": (None, None),
+    "prepare_phase": (0, None),
+    "terminate_phase": (0, None),
+    "resolve_action": (0, 1),
+    "list_legal_actions": (0, 1),
+    }
+#Methods of agents profiled, with the position of phase argument
+AGENT_HOOKS = {
+    "take_actions": 1,
+    }
+
+
+class _Probe():
+    """
+    Replacement of a method accounting for its calls.
+    """
+
+    def __init__(self, profiler, hook, method, phase, agent, owner):
+        self._profiler = profiler
+        self._hook = hook
+        self._method = method
+        self._phase = phase
+        self._agent = agent
+        self._owner = owner
+
+    def __call__(self, *args, **kwargs):
+        phase = None if self._phase is None else args[self._phase]
+        agent = self._owner
+        if self._agent is not None:
+            agent = args[self._agent]
+        return self._profiler._call((phase, self._hook,
+                None if agent is None else agent.get_name()), self._method,
+                args, kwargs)
+
+    def __reduce__(self):
+        #Copies of profiled objects (worker processes) are not profiled
+        return (getattr, (self._method.__self__, self._method.__name__))
+
+
+class Profiler():
+    """
+    Record wall time and calls of game hooks.
+
+    Usage::
+
+        profiler = Profiler()
+        game.set_profiler(profiler)
+        game.mainloop()
+        print(profiler.report())
+        with open("game.folded", "w") as f:
+            profiler.write_folded(f)
+    """
+
+    def __init__(self):
+        #(phase, hook, agent name) -> [calls, total time in ns]
+        self._stats = { }
+        #Call stack -> time spent in top frame itself, in ns
+        self._stacks = { }
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def attach(self, game):
+        """
+        Replace hooks of game and of its agents by probes.
+
+        :param game: profiled game
+        :type game: Game
+        """
+        for hook, (phase, agent) in GAME_HOOKS.items():
+            self._replace(game, hook, phase, agent, None)
+        for agent in game._agents:
+            self.attach_agent(agent)
+
+    def attach_agent(self, agent):
+        """
+        Replace methods of an agent by probes.
+
+        :param agent: profiled agent
+        :type agent: Agent
+        """
+        for hook, phase in AGENT_HOOKS.items():
+            self._replace(agent, hook, phase, None, agent)
+
+    def detach(self, game):
+        """
+        Restore hooks of game and of its agents.
+
+        :param game: profiled game
+        :type game: Game
+        """
+        for target, hooks in [(game, GAME_HOOKS)] + [(agent, AGENT_HOOKS)
+                for agent in game._agents]:
+            for hook in hooks:
+                probe = target.__dict__.get(hook)
+                if isinstance(probe, _Probe) and probe._profiler is self:
+                    del target.__dict__[hook]
+
+    def _replace(self, target, hook, phase, agent, owner):
+        probe = target.__dict__.get(hook)
+        if isinstance(probe, _Probe):
+            if probe._profiler is self:
+                return
+            method = probe._method
+        else:
+            method = getattr(target, hook)
+        target.__dict__[hook] = _Probe(self, hook, method, phase, agent, owner)
+
+    def _call(self, key, method, args, kwargs):
+        local = self._local
+        try:
+            stack = local.stack
+        except AttributeError:
+            stack = local.stack = [ ]
+        #Frames: key and time spent in nested calls
+        frame = [key, 0]
+        stack.append(frame)
+        start = time.perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            path = tuple(f[0] for f in stack)
+            stack.pop()
+            if stack:
+                stack[-1][1] += elapsed
+            with self._lock:
+                stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = [0, 0]
+                stats[0] += 1
+                stats[1] += elapsed
+                self._stacks[path] = self._stacks.get(path, 0) + elapsed - \
+                        frame[1]
+
+    def clear(self):
+        """
+        Forget recorded calls.
+        """
+        with self._lock:
+            self._stats = { }
+            self._stacks = { }
+
+    def get_statistics(self):
+        """
+        Get recorded calls.
+
+        :return: (calls, total time in ns) by (phase, hook, agent name), time
+            of a hook including nested hooks
+        :rtype: dict
+        """
+        with self._lock:
+            return {key: tuple(value) for key, value in self._stats.items()}
+
+    def report(self):
+        """
+        Summarize recorded calls, by decreasing total time.
+
+        :rtype: str
+        """
+        stats = sorted(self.get_statistics().items(),
+                key=lambda item: -item[1][1])
+        lines = ["{:<16} {:<20} {:<16} {:>10} {:>12} {:>12}".format("phase",
+                "hook", "agent", "calls", "total (ms)", "mean (us)")]
+        for (phase, hook, agent), (calls, total) in stats:
+            lines.append("{:<16} {:<20} {:<16} {:>10} {:>12.3f} {:>12.3f}"
+                    .format(str(phase or "-"), hook, str(agent or "-"), calls,
+                    total / 1e6, total / calls / 1e3))
+        return "\n".join(lines) + "\n"
+
+    def get_folded(self):
+        """
+        Get recorded call stacks in folded format, as read by flamegraph.pl
+        and speedscope: a line by stack, frames separated by semicolons,
+        followed by the time spent in top frame itself in nanoseconds.
+
+        Frames of a hook are its phase, its name and its agent.
+
+        :rtype: list
+        """
+        with self._lock:
+            stacks = list(self._stacks.items())
+        lines = [ ]
+        for path, elapsed in stacks:
+            frames = [ ]
+            for phase, hook, agent in path:
+                if phase is not None:
+                    frames.append(_frame(phase))
+                frames.append(hook)
+                if agent is not None:
+                    frames.append(_frame(agent))
+            lines.append("{} {}".format(";".join(frames), elapsed))
+        return lines
+
+    def write_folded(self, file):
+        """
+        Write recorded call stacks in folded format.
+
+        :param file: output text file
+        """
+        for line in self.get_folded():
+            file.write(line + "\n")
+
+
+def _frame(name):
+    return str(name).replace(";", ":").replace(" ", "_")
@@ -0,0 +1,115 @@
+#!encoding: utf-8
+
+"""
+Independent, reproducible random number streams.
+
+A SeedSequence is a node of a tree of seeds: its children are spawned
+deterministically from its entropy and its position in the tree, so that
+streams drawn from different nodes are independent and any of them can be
+recreated from the root entropy and the spawn key of the node.
+
+Components draw random numbers from their own generator if any, otherwise
+from the generator of their board, otherwise from the generator in use by the
+current context (see using), and finally from the random module.
+"""
+import contextlib
+import contextvars
+import hashlib
+import random
+import secrets
+
+
+_current = contextvars.ContextVar("gagarin_random", default=random)
+
+
+class SeedSequence():
+    """
+    Node of a tree of seeds.
+    """
+
+    def __init__(self, entropy=None, spawn_key=()):
+        """
+        Initializer.
+
+        :param entropy: root seed, drawn from the operating system if None
+        :type entropy: int
+        :param spawn_key: position of node in tree
+        :type spawn_key: tuple
+        """
+        if entropy is None:
+            entropy = secrets.randbits(128)
+        self._entropy = entropy
+        self._spawn_key = tuple(spawn_key)
+        self._spawned = 0
+
+    def get_entropy(self):
+        return self._entropy
+
+    def get_spawn_key(self):
+        return self._spawn_key
+
+    def spawn(self, number):
+        """
+        Spawn child sequences.
+
+        Successive calls give different children.
+
+        :param number: number of children
+        :type number: int
+        :rtype: list
+        """
+        children = [SeedSequence(self._entropy, self._spawn_key + (i,))
+                for i in range(self._spawned, self._spawned + number)]
+        self._spawned += number
+        return children
+
+    def generate_state(self):
+        """
+        Get the seed of this node.
+
+        :return: 256-bit integer
+        :rtype: int
+        """
+        data = "{}/{}".format(self._entropy, "/".join(str(k) for k in
+                self._spawn_key)).encode("ascii")
+        return int.from_bytes(hashlib.blake2b(data, digest_size=32).digest(),
+                "little")
+
+    def generator(self):
+        """
+        Create a random generator seeded by this node.
+
+        :rtype: random.Random
+        """
+        return random.Random(self.generate_state())
+
+    def __repr__(self):
+        return "SeedSequence(entropy={}, spawn_key={})".format(self._entropy,
+                self._spawn_key)
+
+
+def current():
+    """
+    Get the generator in use by the current context, random module by default.
+    """
+    return _current.get()
+
+
+@contextlib.contextmanager
+def using(generator):
+    """
+    Context manager making a generator the one in use by the current context.
+
+    Contexts are local to threads and asyncio tasks.
+
+    :param generator: random generator, None to keep current one
+    :type generator: random.Random
+    """
+    if generator is None:
+        yield
+        return
+    token = _current.set(generator)
+    try:
+        yield
+    finally:
+        _current.reset(token)
@@ -0,0 +1,267 @@
+#!encoding: utf-8
+
+"""
+Batch simulation of complete games across worker processes.
+
+Games are created in workers from factories, which must therefore be
+picklable: module-level functions or classes, or functools.partial objects
+built on them. Games are dispatched in chunks so that short games do not spend
+most of their time in inter-process communication.
+"""
+import concurrent.futures
+import os
+import time
+
+from . import rng
+
+
+class GameResult():
+    """
+    Outcome of a simulated game.
+    """
+
+    def __init__(self, index, seed, scores, duration):
+        """
+        Initializer.
+
+        :param index: index of game in the simulation
+        :type index: int
+        :param seed: seed of game
+        :type seed: int
+        :param scores: scores by agent name
+        :type scores: dict
+        :param duration: duration of game in seconds
+        :type duration: float
+        """
+        self.index = index
+        self.seed = seed
+        self.scores = scores
+        self.duration = duration
+
+    def get_winners(self):
+        """
+        Get names of agents having the best score.
+
+        :rtype: list
+        """
+        if not self.scores:
+            return [ ]
+        best = max(self.scores.values())
+        return [name for name, score in self.scores.items() if score == best]
+
+    def __repr__(self):
+        return "GameResult(index={}, seed={}, scores={}, duration={:.6f})" \
+                .format(self.index, self.seed, self.scores, self.duration)
+
+
+class SimulationStatistics():
+    """
+    Aggregated statistics of simulated games, updated as results come in.
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.duration = 0.
+        self.wins = { }
+        self.draws = 0
+        self._score_sums = { }
+        self._score_squares = { }
+
+    def update(self, result):
+        """
+        Account for the result of a game.
+
+        :param result: result of game
+        :type result: GameResult
+        """
+        self.games += 1
+        self.duration += result.duration
+        for name, score in result.scores.items():
+            self._score_sums[name] = self._score_sums.get(name, 0) + score
+            self._score_squares[name] = self._score_squares.get(name, 0) + \
+                    score * score
+            self.wins.setdefault(name, 0)
+        winners = result.get_winners()
+        if len(winners) == 1:
+            self.wins[winners[0]] += 1
+        else:
+            self.draws += 1
+
+    def get_win_rate(self, name):
+        """
+        Get ratio of games won by an agent.
+
+        :rtype: float
+        """
+        return self.wins.get(name, 0) / self.games if self.games else 0.
+
+    def get_mean_score(self, name):
+        """
+        Get mean score of an agent.
+
+        :rtype: float
+        """
+        return self._score_sums.get(name, 0) / self.games if self.games else 0.
+
+    def get_score_variance(self, name):
+        """
+        Get variance of scores of an agent.
+
+        :rtype: float
+        """
+        if not self.games:
+            return 0.
+        mean = self.get_mean_score(name)
+        return max(self._score_squares.get(name, 0) / self.games - mean * mean,
+                0.)
+
+    def get_mean_duration(self):
+        """
+        Get mean duration of games in seconds.
+
+        :rtype: float
+        """
+        return self.duration / self.games if self.games else 0.
+
+    def __repr__(self):
+        return "SimulationStatistics(games={}, wins={}, draws={})".format(
+                self.games, self.wins, self.draws)
+
+
+def play_game(game_factory, agent_factories, index, seed):
+    """
+    Play a complete game.
+
+    :param game_factory: callable creating the game
+    :type game_factory: callable
+    :param agent_factories: callables creating agents, in order of play
+    :type agent_factories: list
+    :param index: index of game in the simulation
+    :type index: int
+    :param seed: root seed of game random streams, see Game.set_seed
+    :type seed: int
+    :rtype: GameResult
+    """
+    start = time.perf_counter()
+    game = game_factory()
+    for factory in agent_factories:
+        game.add_agent(factory())
+    game.set_seed(seed)
+    game.mainloop()
+    scores = game.get_scores()
+    return GameResult(index, seed, scores, time.perf_counter() - start)
+
+
+def _play_chunk(game_factory, agent_factories, tasks):
+    return [play_game(game_factory, agent_factories, index, seed)
+            for index, seed in tasks]
+
+
+class SimulationRunner():
+    """
+    Run many games of a game against the same agents.
+
+    Usage::
+
+        runner = SimulationRunner(functools.partial(Battle, 1000),
+                [functools.partial(BattleAgent, "A"),
+                functools.partial(BattleAgent, "B")])
+        for result in runner.results(10000):
+            print(result.scores, runner.get_statistics().get_win_rate("A"))
+    """
+
+    def __init__(self, game_factory, agent_factories, workers=None,
+            chunk_size=None, seed=0, mp_context=None):
+        """
+        Initializer.
+
+        :param game_factory: callable creating a game
+        :type game_factory: callable
+        :param agent_factories: callables creating agents, in order of play
+        :type agent_factories: list
+        :param workers: number of worker processes, defaults to the number of
+            cores. With 0, games are played in the current process
+        :type workers: int
+        :param chunk_size: number of games sent at once to a worker, defaults to
+            a quarter of the share of each worker
+        :type chunk_size: int
+        :param seed: seed from which game seeds are derived
+        :type seed: int
+        :param mp_context: multiprocessing context of workers
+        """
+        self._game_factory = game_factory
+        self._agent_factories = list(agent_factories)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self._workers = workers
+        self._chunk_size = chunk_size
+        self._seed = seed
+        self._mp_context = mp_context
+        self._statistics = SimulationStatistics()
+
+    def get_statistics(self):
+        """
+        Get statistics of games played so far.
+
+        :rtype: SimulationStatistics
+        """
+        return self._statistics
+
+    def get_seed(self, index):
+        """
+        Get seed of a game: replaying it with this seed gives the same game.
+
+        Seeds are drawn from the children of seed of runner in the seed tree,
+        see rng.SeedSequence.
+
+        :param index: index of game
+        :type index: int
+        :rtype: int
+        """
+        return rng.SeedSequence(self._seed, (index,)).generate_state()
+
+    def results(self, games):
+        """
+        Play games and yield their results as soon as they finish.
+
+        Results come in order of completion, not in order of index.
+
+        :param games: number of games
+        :type games: int
+        :return: generator of GameResult
+        """
+        tasks = [(i, self.get_seed(i)) for i in range(games)]
+        if self._workers == 0:
+            for index, seed in tasks:
+                result = play_game(self._game_factory, self._agent_factories,
+                        index, seed)
+                self._statistics.update(result)
+                yield result
+            return
+        chunk_size = self._chunk_size
+        if chunk_size is None:
+            chunk_size = max(1, games // (self._workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(self._workers,
+                mp_context=self._mp_context) as executor:
+            futures = [executor.submit(_play_chunk, self._game_factory,
+                    self._agent_factories, tasks[i:i + chunk_size])
+                    for i in range(0, games, chunk_size)]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    for result in future.result():
+                        self._statistics.update(result)
+                        yield result
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def run(self, games):
+        """
+        Play games and wait for all of them.
+
+        :param games: number of games
+        :type games: int
+        :return: results sorted by index
+        :rtype: list
+        """
+        return sorted(self.results(games), key=lambda r: r.index)
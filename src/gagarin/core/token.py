@@ -3,8 +3,26 @@
 """
 Base classes for tokens in game.
 """
-from .zone import Component
+from .zone import Component, Zone
 from .die import Face
+from .predicate import Predicate
+from . import zobrist
+
+
+#Marks stand-ins of unhashable property values in kinds of tokens
+_UNHASHABLE = "<unhashable>"
+
+
+def _hashable(value):
+	"""
+	Get a hashable stand-in for a property value: unhashable values are
+	identified by their type and representation.
+	"""
+	try:
+		hash(value)
+	except TypeError:
+		return (_UNHASHABLE, type(value).__name__, repr(value))
+	return value
 
 
 class Token(Component):
@@ -33,6 +51,8 @@ class OneSidedToken(Token):
 	The generic side is used to identify the nature of token while specific side has an actual value hidden from player
 	until revealed.
 	"""
+	_zobrist_fields = ("_face_up",)
+
 	def __init__(self, **properties):
 		"""
 		Constructor.
@@ -51,6 +71,8 @@ class OneSidedToken(Token):
 
 		:rtype: bool
 		"""
+		if self._tracking:
+			self._track()
 		return self._face_up
 
 	def set_face_up(self, toggle):
@@ -62,7 +84,7 @@ class OneSidedToken(Token):
 		:return: current instance
 		:rtype: OneSidedToken
 		"""
-		self._face_up = toggle
+		self._set_field("_face_up", toggle)
 		return self
 
 	def set_face_down(self, toggle):
@@ -74,7 +96,7 @@ class OneSidedToken(Token):
 		:return: current instance
 		:rtype: OneSidedToken
 		"""
-		self._face_up = not toggle
+		self._set_field("_face_up", not toggle)
 		return self
 
 	def flip(self):
@@ -84,7 +106,7 @@ class OneSidedToken(Token):
 		:return: current instance
 		:rtype: OneSidedToken
 		"""
-		self._face_up = not self._face_up
+		self._set_field("_face_up", not self._face_up)
 		return self
 
 	def is_face_up(self):
@@ -93,6 +115,8 @@ class OneSidedToken(Token):
 
 		:rtype: bool
 		"""
+		if self._tracking:
+			self._track()
 		return self._face_up
 
 
@@ -100,6 +124,8 @@ class TwoSidedToken(Token):
 	"""
 	Suitable for tokens with two specific faces.
 	"""
+	_zobrist_fields = ("_visible_face",)
+
 	def __init__(self, face1, face2, **properties):
 		"""
 		Constructor.
@@ -126,9 +152,9 @@ class TwoSidedToken(Token):
 		:rtype: TwoSidedToken
 		"""
 		if self._visible_face == self._face1:
-			self._visible_face = self._face2
+			self._set_field("_visible_face", self._face2)
 		else:
-			self._visible_face = self._face1
+			self._set_field("_visible_face", self._face1)
 		return self
 
 	def set_visible_face(self, predicate):
@@ -139,9 +165,9 @@ class TwoSidedToken(Token):
 		:type predicate: function
 		"""
 		if predicate(self._face1):
-			self._visible_face = self._face1
+			self._set_field("_visible_face", self._face1)
 		elif predicate(self._face2):
-			self._visible_face = self._face2
+			self._set_field("_visible_face", self._face2)
 		return self
 
 	def get_visible_face(self):
@@ -150,4 +176,394 @@ class TwoSidedToken(Token):
 
 		:rtype: Face
 		"""
-		return self._visible_face
\ No newline at end of file
+		if self._tracking:
+			self._track()
+		return self._visible_face
+
+class TokenPool(Zone):
+	"""
+	Suitable class for large quantities of identical tokens (coins, cubes, gems).
+
+	Identical tokens (same class and same properties) are stored as a single
+	prototype and a count, so that putting, taking and transferring tokens does
+	not depend on the number of tokens in the pool.
+	When searched, a pool behaves as a zone holding as many tokens as its count:
+	each prototype is returned once per logical token.
+	Pooled tokens are interchangeable and shall not be modified in place: pools
+	keep their own copy of the tokens put, which apply replaces rather than
+	changes.
+	"""
+	_transient_fields = Zone._transient_fields + ("_kind_keys",)
+	#Keys of kinds in pool hash, computed once per kind
+	_kind_keys = None
+
+	def __init__(self, **properties):
+		"""
+		Constructor.
+
+		:param properties: properties of the pool
+		:type properties: dict
+		"""
+		super(TokenPool, self).__init__(**properties)
+		self._counts = { }
+		self._prototypes = { }
+
+	@staticmethod
+	def kind(token):
+		"""
+		Get the kind of a token: tokens of the same kind are identical.
+
+		Unhashable property values (lists, dictionaries...) are identified by
+		their representation.
+
+		:param token: token to be identified
+		:type token: Token
+		:return: hashable key of the token kind
+		:rtype: tuple
+		"""
+		properties = tuple(sorted(token._properties.items()))
+		try:
+			hash(properties)
+		except TypeError:
+			properties = tuple((name, _hashable(value))
+					for name, value in properties)
+		return (type(token), properties)
+
+	def _find_kinds(self, token):
+		"""
+		Find the kinds of tokens matching given token, predicate or query.
+
+		:param token: token, predicate function or string query
+		:type token: Token, callable or str
+		:return: kinds of matching tokens, in order of pool
+		:rtype: list
+		"""
+		if isinstance(token, Token):
+			kind = self.kind(token)
+			if kind in self._counts:
+				return [kind]
+			return [ ]
+		predicate = Predicate(token)
+		return [kind for kind, prototype in self._prototypes.items()
+				if predicate(prototype)]
+
+	@staticmethod
+	def _copy_prototype(token):
+		"""
+		Copy a token to represent its kind in a pool.
+
+		:param token: token to be copied
+		:type token: Token
+		:return: copy belonging to no board
+		:rtype: Token
+		"""
+		state = token._copy_state()
+		for name in Component._transient_fields:
+			state.pop(name, None)
+		prototype = object.__new__(token.__class__)
+		prototype.__dict__.update(state)
+		prototype.__dict__.update(_board=None, _epoch=None,
+				_shared_children=False)
+		return prototype
+
+	def put(self, token, number=1):
+		"""
+		Put tokens into pool.
+
+		A new kind of tokens is represented by a copy of token.
+
+		:param token: token identifying the kind of tokens to put
+		:type token: Token
+		:param number: number of tokens
+		:type number: int
+		:return: current pool
+		:rtype: TokenPool
+		"""
+		if number <= 0:
+			return self
+		kind = self.kind(token)
+		if kind in self._counts:
+			self._set_count(kind, self._counts[kind] + number,
+					self._prototypes[kind])
+		else:
+			self._set_count(kind, number, self._copy_prototype(token))
+		return self
+
+	def take(self, token, number=1):
+		"""
+		Take tokens out of pool.
+
+		Tokens are taken from all matching kinds, in order of pool. If there are
+		not enough matching tokens, all of them are taken.
+
+		:param token: token, predicate function or string query identifying the
+		kinds of tokens to take
+		:type token: Token, callable or str
+		:param number: number of tokens
+		:type number: int
+		:return: number of tokens actually taken
+		:rtype: int
+		"""
+		taken = 0
+		for kind in self._find_kinds(token):
+			if taken >= number:
+				break
+			count = self._counts[kind]
+			taking = min(number - taken, count)
+			self._set_count(kind, count - taking, self._prototypes[kind])
+			taken += taking
+		return taken
+
+	def _set_count(self, kind, count, prototype):
+		"""
+		Set the number of tokens of a kind.
+
+		:param kind: kind of tokens
+		:type kind: tuple
+		:param count: number of tokens, the kind is removed when it is zero
+		:type count: int
+		:param prototype: token representing the kind
+		:type prototype: Token
+		"""
+		board = self._writable_board()
+		self._touch()
+		old = self._counts.get(kind, 0)
+		if board is not None and board._journal is not None:
+			board._journal.append((self._set_count, kind, old,
+					self._prototypes.get(kind, prototype)))
+		if self._hashing():
+			self._rehash(self._zobrist_count(kind, old)
+					^ self._zobrist_count(kind, count))
+		if count > 0:
+			self._counts[kind] = count
+			self._prototypes[kind] = prototype
+		else:
+			self._counts.pop(kind, None)
+			self._prototypes.pop(kind, None)
+			if self._kind_keys is not None:
+				self._kind_keys.pop(kind, None)
+
+	def _zobrist_count(self, kind, count):
+		"""
+		Compute the hash feature of the number of tokens of a kind.
+
+		:rtype: int
+		"""
+		if count == 0:
+			return 0
+		keys = self._kind_keys
+		if keys is None:
+			keys = self.__dict__["_kind_keys"] = { }
+		key = keys.get(kind)
+		if key is None:
+			key = keys[kind] = self._zkey ^ zobrist.value_key(kind)
+		return zobrist.mix(key, zobrist.value_key(count))
+
+	def _zobrist_state(self):
+		"""
+		Compute the hash contribution of the pool own state.
+
+		:rtype: int
+		"""
+		h = super(TokenPool, self)._zobrist_state()
+		for kind, count in self._counts.items():
+			h ^= self._zobrist_count(kind, count)
+		return h
+
+	def _bind(self, board):
+		super(TokenPool, self)._bind(board)
+		#Keys may derive from hashes of objects, see Component._bind
+		self.__dict__["_kind_keys"] = None
+
+	def _iter_children(self):
+		"""
+		Pooled tokens are not components of the board on their own.
+
+		:rtype: iterable
+		"""
+		return ()
+
+	def transfer(self, pool, token, number=1):
+		"""
+		Transfer tokens from this pool to another one.
+
+		:param pool: destination pool
+		:type pool: TokenPool
+		:param token: token, predicate function or string query identifying the
+		kinds of tokens to transfer
+		:type token: Token, callable or str
+		:param number: number of tokens
+		:type number: int
+		:return: number of tokens actually transferred
+		:rtype: int
+		"""
+		transferred = 0
+		for kind in self._find_kinds(token):
+			if transferred >= number:
+				break
+			prototype = self._prototypes[kind]
+			taken = self.take(prototype, number - transferred)
+			pool.put(prototype, taken)
+			transferred += taken
+		return transferred
+
+	def count(self, token=None):
+		"""
+		Count tokens in pool.
+
+		:param token: token, predicate function or string query identifying the
+		kinds of tokens to count. All tokens are counted if not provided.
+		:type token: Token, callable or str
+		:return: number of tokens
+		:rtype: int
+		"""
+		if self._tracking:
+			self._track()
+		if token is None:
+			return len(self)
+		return sum(self._counts[kind] for kind in self._find_kinds(token))
+
+	def kinds(self):
+		"""
+		List the kinds of tokens in pool.
+
+		:return: pairs of prototype and count
+		:rtype: list of tuple
+		"""
+		if self._tracking:
+			self._track()
+		return [(self._prototypes[kind], count)
+				for kind, count in self._counts.items()]
+
+	def add(self, component):
+		"""
+		Add a single token to pool.
+
+		:param component: token to be added
+		:type component: Token
+		:return: current pool
+		:rtype: TokenPool
+		"""
+		return self.put(component)
+
+	def remove(self, component):
+		"""
+		Remove a single token from pool.
+
+		:param component: token to be removed
+		:type component: Token
+		:return: current pool
+		:rtype: TokenPool
+		"""
+		self.take(component)
+		return self
+
+	def __len__(self):
+		"""
+		Return number of tokens in pool.
+
+		:return: number of tokens
+		:rtype: int
+		"""
+		if self._tracking:
+			self._track()
+		return sum(self._counts.values())
+
+	def __iter__(self):
+		"""
+		Iterate over logical tokens: each prototype is repeated as many times as
+		its count.
+		"""
+		if self._tracking:
+			self._track()
+		for kind, count in list(self._counts.items()):
+			prototype = self._prototypes[kind]
+			for i in range(count):
+				yield prototype
+
+	def is_empty(self):
+		"""
+		State whether pool is empty.
+
+		:rtype: bool
+		"""
+		if self._tracking:
+			self._track()
+		return len(self._counts) == 0
+
+	def _find_paths(self, predicate, path, output, first):
+		"""
+		Collect the paths to the pool and to the prototypes fulfilling given
+		predicate.
+
+		The predicate is evaluated once per kind of tokens, but paths to
+		matching prototypes are collected once per logical token.
+
+		:param predicate: predicate function taking a single argument
+		:type predicate: Predicate
+		:param path: path from the zone where search started to this pool
+		:type path: tuple
+		:param output: list where paths are appended
+		:type output: list
+		:param first: stop on the first match
+		:type first: bool
+		:return: True if search shall stop
+		:rtype: bool
+		"""
+		if self._tracking:
+			self._track()
+		if predicate(self):
+			output.append(path)
+			if first:
+				return True
+		for kind, prototype in self._prototypes.items():
+			if predicate(prototype):
+				if first:
+					output.append(path + (kind,))
+					return True
+				output.extend([path + (kind,)] * self._counts[kind])
+		return False
+
+	def _own_child(self, kind):
+		"""
+		Get the prototype of a kind of tokens.
+
+		Prototypes are never modified in place, so they are never copied.
+
+		:param kind: kind of tokens
+		:type kind: tuple
+		:rtype: Token
+		"""
+		return self._prototypes[kind]
+
+	def apply(self, transform, predicate=None):
+		"""
+		Apply a transform function to the pool and to the prototypes matching
+		the specified predicate.
+
+		The transform is applied once per kind of tokens, to a copy of its
+		prototype which then replaces it, so it affects all tokens of that kind
+		and can be undone. Kinds becoming identical are merged.
+
+		:param transform: transformation function to be applied to matching components
+		:type transform: function
+		:param predicate: predicate function taking a single argument
+		:type predicate: function
+		:return: current pool
+		:rtype: TokenPool
+		"""
+		if predicate is None:
+			predicate = lambda x: True
+		predicate = Predicate(predicate)
+		if predicate(self):
+			transform(self)
+		changes = [ ]
+		for kind, prototype in list(self._prototypes.items()):
+			if predicate(prototype):
+				token = self._copy_prototype(prototype)
+				transform(token)
+				changes.append((token, self._counts[kind]))
+				self._set_count(kind, 0, prototype)
+		for token, count in changes:
+			self.put(token, count)
+		return self
@@ -0,0 +1,257 @@
+#!encoding: utf-8
+
+"""
+Compact binary traces of games, replayed with Game.replay.
+
+A trace holds what is needed to play a game again without its agents: the
+seed of its random streams, the names of its phases and agents, and the
+actions of each decision encoded by the action space of game. A trace stream
+is any number of traces appended to each other, each of them being:
+
+- magic bytes and format version,
+- flags (bit 0: game has a seed), then if seeded the entropy of root seed
+  (zigzag varint) and the spawn key of the game seed,
+- phase names, then agent names (count then length-prefixed UTF-8 strings),
+- decisions: varint 1 + phase index * number of agents + agent index, number
+  of actions, action ids,
+- varint 0 once the game has ended. A stream cut before this marker, while
+  a game is being recorded, gives the decisions recorded so far.
+"""
+from . import varint
+from .rng import SeedSequence
+
+
+MAGIC = b"GAGT"
+FORMAT_VERSION = 1
+
+_SEEDED = 1
+
+
+class TraceError(ValueError):
+    """
+    Invalid trace, or trace not matching a game.
+    """
+    pass
+
+
+class Trace():
+    """
+    Recorded game.
+
+    :ivar seed: seed of game random streams, None if game had no seed
+    :ivar phases: names of phases, in order
+    :ivar agents: names of agents, in order
+    :ivar decisions: tuples (phase index, agent index, action ids)
+    """
+
+    def __init__(self, seed, phases, agents, decisions=None):
+        self.seed = seed
+        self.phases = list(phases)
+        self.agents = list(agents)
+        self.decisions = [ ] if decisions is None else decisions
+
+    def __len__(self):
+        return len(self.decisions)
+
+    def to_bytes(self):
+        """
+        Encode trace.
+
+        :rtype: bytes
+        """
+        buffer = _header(self.seed, self.phases, self.agents)
+        size = len(self.agents)
+        for phase, agent, ids in self.decisions:
+            _write_decision(buffer, phase * size + agent, ids)
+        buffer.append(0)
+        return bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Decode a single trace.
+
+        :rtype: Trace
+        :raise TraceError: if data does not hold exactly one trace
+        """
+        traces = list(iter_traces(data))
+        if len(traces) != 1:
+            raise TraceError("Expected one trace, found {}".format(
+                    len(traces)))
+        return traces[0]
+
+    def __repr__(self):
+        return "Trace(agents={}, decisions={})".format(self.agents,
+                len(self.decisions))
+
+
+def _header(seed, phases, agents):
+    buffer = bytearray(MAGIC)
+    varint.write(buffer, FORMAT_VERSION)
+    if seed is None:
+        varint.write(buffer, 0)
+    else:
+        varint.write(buffer, _SEEDED)
+        varint.write(buffer, varint.zigzag(seed.get_entropy()))
+        key = seed.get_spawn_key()
+        varint.write(buffer, len(key))
+        for k in key:
+            varint.write(buffer, k)
+    for names in (phases, agents):
+        varint.write(buffer, len(names))
+        for name in names:
+            data = name.encode("utf-8")
+            varint.write(buffer, len(data))
+            buffer += data
+    return buffer
+
+
+def _write_decision(buffer, key, ids):
+    write = varint.write
+    write(buffer, key + 1)
+    write(buffer, len(ids))
+    for i in ids:
+        write(buffer, i)
+
+
+def iter_traces(data):
+    """
+    Iterate over the traces of a stream.
+
+    :param data: trace stream
+    :type data: bytes-like
+    :rtype: iterator
+    :raise TraceError: if stream is invalid
+    """
+    decode = varint.decode
+    offset = 0
+    try:
+        while offset < len(data):
+            if data[offset:offset + len(MAGIC)] != MAGIC:
+                raise TraceError("Not a trace at offset {}".format(offset))
+            version, offset = decode(data, offset + len(MAGIC))
+            if version > FORMAT_VERSION:
+                raise TraceError("Unsupported trace version: {}"
+                        .format(version))
+            flags, offset = decode(data, offset)
+            seed = None
+            if flags & _SEEDED:
+                entropy, offset = decode(data, offset)
+                size, offset = decode(data, offset)
+                key = [ ]
+                for i in range(size):
+                    k, offset = decode(data, offset)
+                    key.append(k)
+                seed = SeedSequence(varint.unzigzag(entropy), key)
+            names = [ ]
+            for i in range(2):
+                size, offset = decode(data, offset)
+                names.append([ ])
+                for j in range(size):
+                    length, offset = decode(data, offset)
+                    names[-1].append(bytes(data[offset:offset + length])
+                            .decode("utf-8"))
+                    offset += length
+            phases, agents = names
+            size = max(len(agents), 1)
+            decisions = [ ]
+            while offset < len(data):
+                key, offset = decode(data, offset)
+                if key == 0:
+                    break
+                count, offset = decode(data, offset)
+                ids = [ ]
+                for i in range(count):
+                    action, offset = decode(data, offset)
+                    ids.append(action)
+                decisions.append(((key - 1) // size, (key - 1) % size,
+                        tuple(ids)))
+            yield Trace(seed, phases, agents, decisions)
+    except EOFError:
+        raise TraceError("Truncated trace at offset {}".format(offset))
+
+
+def load(file):
+    """
+    Read all traces of a binary file object.
+
+    :rtype: list
+    """
+    return list(iter_traces(file.read()))
+
+
+class TraceWriter():
+    """
+    Record games into a binary file object, opened in append mode to add
+    traces to an existing stream.
+
+    Decisions are buffered and written when a game ends or on flush.
+    """
+
+    def __init__(self, file):
+        """
+        Initializer.
+
+        :param file: output binary file object
+        """
+        self._file = file
+        self._buffer = bytearray()
+        self._size = 1
+        self._recording = False
+
+    def begin(self, seed, phases, agents):
+        """
+        Start recording a game.
+
+        :param seed: seed of game random streams, None if game has no seed
+        :type seed: rng.SeedSequence
+        :param phases: names of phases
+        :type phases: list
+        :param agents: names of agents
+        :type agents: list
+        """
+        if self._recording:
+            #Previous game was abandoned before its end
+            self.end()
+        self._buffer += _header(seed, phases, agents)
+        self._size = len(agents)
+        self._recording = True
+
+    def record(self, phase, agent, ids):
+        """
+        Record a decision.
+
+        :param phase: index of phase
+        :type phase: int
+        :param agent: index of agent
+        :type agent: int
+        :param ids: action ids
+        :type ids: list
+        """
+        _write_decision(self._buffer, phase * self._size + agent, ids)
+
+    def end(self):
+        """
+        Mark the end of recorded game and write it.
+        """
+        if self._recording:
+            self._buffer.append(0)
+            self._recording = False
+        self.flush()
+
+    def flush(self):
+        """
+        Write buffered decisions.
+        """
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        flush = getattr(self._file, "flush", None)
+        if flush is not None:
+            flush()
+
+    def close(self):
+        """
+        End recorded game and write it: the file is not closed.
+        """
+        self.end()
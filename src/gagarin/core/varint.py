@@ -0,0 +1,98 @@
+#!encoding: utf-8
+
+"""
+Variable-length encoding of integers (unsigned LEB128 and zigzag for signed
+integers), shared by binary formats of the library.
+"""
+
+
+def zigzag(value):
+    """
+    Map a signed integer to an unsigned one: 0, -1, 1, -2... become 0, 1, 2, 3...
+
+    :rtype: int
+    """
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    """
+    Reverse zigzag mapping.
+
+    :rtype: int
+    """
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def write(buffer, value):
+    """
+    Append an unsigned integer to a buffer.
+
+    :param buffer: output buffer
+    :type buffer: bytearray
+    :param value: non-negative integer
+    :type value: int
+    """
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def encode(value):
+    """
+    Encode an unsigned integer.
+
+    :rtype: bytes
+    """
+    buffer = bytearray()
+    write(buffer, value)
+    return bytes(buffer)
+
+
+def decode(data, offset=0):
+    """
+    Decode an unsigned integer from a buffer.
+
+    :param data: input buffer
+    :type data: bytes-like
+    :param offset: position of the first byte of integer
+    :type offset: int
+    :return: decoded integer and position following it
+    :rtype: tuple
+    :raise EOFError: if buffer ends before the integer
+    """
+    result = 0
+    shift = 0
+    try:
+        while True:
+            byte = data[offset]
+            offset += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result, offset
+            shift += 7
+    except IndexError:
+        raise EOFError("Truncated varint")
+
+
+def read(file):
+    """
+    Read an unsigned integer from a binary file object.
+
+    :param file: input file
+    :type file: file-like object
+    :rtype: int
+    :raise EOFError: if file ends before the integer
+    """
+    result = 0
+    shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            raise EOFError("Truncated varint")
+        byte = byte[0]
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result
+        shift += 7
@@ -0,0 +1,240 @@
+#!encoding: utf-8
+
+"""
+Vectorized games: many instances of a game stepped in lockstep, so that
+agents evaluating a model take decisions for all of them in a single batch.
+
+Observations, ids of actions and masks are stacked into numpy arrays when
+numpy is installed, into lists otherwise.
+"""
+try:
+    import numpy
+except ImportError: # pragma: no cover
+    numpy = None
+
+
+def stack(rows, dtype=None):
+    """
+    Stack rows into an array.
+
+    :param rows: sequence of rows
+    :type rows: list
+    :param dtype: numpy type of array, object to keep rows as they are
+    :return: numpy array if numpy is installed, list otherwise
+    """
+    if numpy is None:
+        return list(rows)
+    if dtype is object:
+        array = numpy.empty(len(rows), dtype=object)
+        array[:] = rows
+        return array
+    return numpy.asarray(rows, dtype=dtype)
+
+
+class VecStep():
+    """
+    Decisions taken during a step of a vectorized game.
+
+    Decisions are listed in order of games, then in order of agents.
+
+    :ivar decisions: tuples (game index, agent, phase)
+    :ivar observations: stacked observations of agents before they decided,
+        None if game does not implement get_observation
+    :ivar actions: ids of actions taken by agents in the action space of game,
+        one row per decision padded with -1 to the largest number of actions
+        of a decision; stacked actions themselves if game does not implement
+        get_action_space
+    :ivar action_mask: for each id of actions, whether it is an action taken
+        rather than padding, None if game does not implement get_action_space
+    :ivar dones: for each game, whether it ended during this step
+    :ivar scores: for each game, scores if it ended during this step or None
+    """
+
+    def __init__(self, decisions, observations, actions, action_mask, dones,
+            scores):
+        self.decisions = decisions
+        self.observations = observations
+        self.actions = actions
+        self.action_mask = action_mask
+        self.dones = dones
+        self.scores = scores
+
+
+class VecGame():
+    """
+    Hold several instances of a game and advance them in lockstep.
+
+    All games are played by the same agents: each step, every agent having
+    decisions pending in some games is called once through
+    Agent.take_actions_batch for each phase. Finished games are reset
+    automatically.
+
+    Games neither reset their agents nor give them random generators, as
+    seeded games do: agents are only reset by VecGame.reset, and keep their
+    own generators.
+
+    Usage::
+
+        vec = VecGame(functools.partial(Battle, 1000), [a, b], 64)
+        vec.reset()
+        while ...:
+            step = vec.step()
+            learn(step.observations, step.actions, step.action_mask,
+                    step.dones, step.scores)
+    """
+
+    def __init__(self, game_factory, agents, size, observe=True):
+        """
+        Initializer.
+
+        :param game_factory: callable creating a game without agents
+        :type game_factory: callable
+        :param agents: agents of games, in order of play
+        :type agents: list
+        :param size: number of games
+        :type size: int
+        :param observe: whether to collect observations of agents
+        :type observe: bool
+        """
+        self._agents = list(agents)
+        self._games = [ ]
+        for i in range(size):
+            game = game_factory()
+            #Agents are shared by all games
+            game._owns_agents = False
+            for agent in agents:
+                game.add_agent(agent)
+            self._games.append(game)
+        self._observe = observe
+        #Games created by the same factory share their action space
+        try:
+            self._space = self._games[0].get_action_space() if size else None
+        except NotImplementedError:
+            self._space = None
+        self._plays = [None] * size
+        self._pending = [None] * size
+        self._episodes = 0
+
+    def __len__(self):
+        return len(self._games)
+
+    def get_games(self):
+        """
+        Get games.
+
+        :rtype: list
+        """
+        return self._games
+
+    def count_episodes(self):
+        """
+        Count games which have ended since last reset.
+
+        :rtype: int
+        """
+        return self._episodes
+
+    def get_pending_decisions(self):
+        """
+        Get decisions expected by the next step.
+
+        :return: tuples (game index, agent, phase)
+        :rtype: list
+        """
+        return [(i, agent, phase) for i, (phase, agents) in
+                enumerate(self._pending) for agent in agents]
+
+    def get_observations(self, agent):
+        """
+        Get stacked observations of all games by an agent.
+        """
+        return stack([game.get_observation(agent) for game in self._games])
+
+    def reset(self):
+        """
+        Reset agents and start all games again.
+
+        :return: current instance
+        :rtype: VecGame
+        """
+        self._episodes = 0
+        for agent in self._agents:
+            agent.reset()
+        for i in range(len(self._games)):
+            self._start(i)
+        return self
+
+    def step(self):
+        """
+        Ask agents to take all pending decisions, resolve them and advance each
+        game to its next decisions.
+
+        :rtype: VecStep
+        """
+        if any(pending is None for pending in self._pending):
+            self.reset()
+        decisions = self.get_pending_decisions()
+        observations = None
+        if self._observe:
+            try:
+                observations = stack([self._games[i].get_observation(agent)
+                        for i, agent, phase in decisions])
+            except NotImplementedError:
+                self._observe = False
+        #Group decisions by agent and phase
+        groups = { }
+        for i, agent, phase in decisions:
+            groups.setdefault((agent, phase), [ ]).append(i)
+        chosen = { }
+        for (agent, phase), indices in groups.items():
+            actions = agent.take_actions_batch(
+                    [self._games[i] for i in indices], phase)
+            for i, game_actions in zip(indices, actions):
+                chosen[(i, agent)] = game_actions
+        #Resolve
+        size = len(self._games)
+        dones = [False] * size
+        scores = [None] * size
+        for i, (phase, agents) in enumerate(self._pending):
+            try:
+                self._pending[i] = self._plays[i].send(
+                        [chosen[(i, agent)] for agent in agents])
+            except StopIteration:
+                dones[i] = True
+                self._episodes += 1
+                try:
+                    scores[i] = self._games[i].get_scores()
+                except NotImplementedError:
+                    pass
+                self._start(i)
+        actions, action_mask = self._encode([chosen[(i, agent)]
+                for i, agent, phase in decisions])
+        return VecStep(decisions, observations, actions, action_mask,
+                stack(dones, dtype=bool), scores)
+
+    def _encode(self, actions):
+        """
+        Encode actions of decisions by their ids in action space.
+
+        :param actions: list of actions of each decision
+        :type actions: list
+        :return: ids padded with -1 and mask of ids of actions taken, stacked
+            actions and None if game has no action space
+        :rtype: tuple
+        """
+        if self._space is None:
+            return stack(actions, dtype=object), None
+        rows = [self._space.encode_all(decision_actions)
+                for decision_actions in actions]
+        width = max([len(row) for row in rows] + [1])
+        return (stack([row + [-1] * (width - len(row)) for row in rows],
+                dtype=int), stack([[True] * len(row) + [False] *
+                (width - len(row)) for row in rows], dtype=bool))
+
+    def _start(self, index):
+        play = self._games[index]._play()
+        try:
+            self._pending[index] = next(play)
+        except StopIteration:
+            raise RuntimeError("Game ended before any decision")
+        self._plays[index] = play
@@ -0,0 +1,236 @@
+#!encoding: utf-8
+
+"""
+Helpers for Zobrist-style hashing of boards.
+
+Every component owns a 64-bit key drawn when it is created. The hash of a board
+is the exclusive or of features, each of them mixing the key of a component
+with one of its properties (or internal state fields) and its value. Changing a
+single value therefore only requires to remove the old feature and to add the
+new one.
+
+Order of cards in a deck is hashed as a polynomial of card keys so that adding
+or removing a card at the top or at the bottom of a deck is also O(1).
+"""
+import hashlib
+import itertools
+import os
+import struct
+
+
+MASK = (1 << 64) - 1
+
+#Base of deck polynomial hash and its inverse modulo 2^64
+BASE = 0x100000001B3
+BASE_INVERSE = pow(BASE, -1, 1 << 64)
+
+#Salts separating the different kinds of features
+_LOCATION = 0x6A09E667F3BCC908
+_ORDER = 0xBB67AE8584CAA73B
+_NONE = 0x3C6EF372FE94F82B
+_INT = 0xA54FF53A5F1D36F1
+_SEQUENCE = 0x510E527FADE682D1
+_FALSE = 0x9B05688C2B3E6C1F
+_TRUE = 0x1F83D9ABFB41BD6B
+_FLOAT = 0x5BE0CD19137E2179
+_BIG_INT = 0xCBBB9D5DC1059ED8
+_HASHABLE = 0x629A292A367CD507
+
+#Integers keyed directly by their value modulo 2^64
+_SMALL_INT = 1 << 63
+_DOUBLE = struct.Struct("<d")
+
+#Random start avoids collisions with keys of components loaded from snapshots
+_counter = itertools.count(int.from_bytes(os.urandom(8), "little"))
+_strings = { }
+_MAX_STRINGS = 1 << 16
+
+
+def mix(a, b):
+    """
+    Mix two 64-bit integers into a well-distributed 64-bit integer.
+
+    This is the finalizer of splitmix64 generator.
+
+    :rtype: int
+    """
+    z = (a * 0x9E3779B97F4A7C15 + b) & MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+
+def new_key():
+    """
+    Draw a new component key.
+
+    Keys are derived from a counter so that drawing them does not consume the
+    state of random module.
+
+    :rtype: int
+    """
+    return mix(next(_counter), 0)
+
+
+def string_key(text):
+    """
+    Get the key of a string.
+
+    Unlike built-in hash function, the key of a string does not depend on the
+    process.
+
+    :rtype: int
+    """
+    try:
+        return _strings[text]
+    except KeyError:
+        key = int.from_bytes(hashlib.blake2b(text.encode("utf-8"),
+                digest_size=8).digest(), "little")
+        if len(_strings) >= _MAX_STRINGS:
+            _strings.clear()
+        _strings[text] = key
+        return key
+
+
+def value_key(value):
+    """
+    Get the key of a property or state value.
+
+    Components are identified by their own key, classes by their qualified name.
+    Booleans, integers and floats are keyed separately, so that True, 1 and
+    1.0 are different values.
+
+    :rtype: int
+    """
+    if value is None:
+        return _NONE
+    if value is True:
+        return _TRUE
+    if value is False:
+        return _FALSE
+    if isinstance(value, int):
+        return int_key(value)
+    if isinstance(value, float):
+        return mix(int.from_bytes(_DOUBLE.pack(value), "little"), _FLOAT)
+    if isinstance(value, str):
+        return string_key(value)
+    if isinstance(value, type):
+        return string_key("{}.{}".format(value.__module__, value.__qualname__))
+    key = getattr(value, "_zkey", None)
+    if key is not None:
+        return key
+    if isinstance(value, (tuple, list)):
+        h = _SEQUENCE
+        for v in value:
+            h = mix(h, value_key(v))
+        return h
+    try:
+        return mix(hash(value) & MASK, _HASHABLE)
+    except TypeError:
+        return string_key(repr(value))
+
+
+def int_key(value):
+    """
+    Get the key of an integer.
+
+    Integers fitting in 64 bits are keyed by their value modulo 2^64, larger
+    ones by their sign and all their 64-bit limbs.
+
+    :rtype: int
+    """
+    if -_SMALL_INT <= value < _SMALL_INT:
+        return mix(value & MASK, _INT)
+    key = mix(_BIG_INT, value < 0)
+    value = abs(value)
+    while value:
+        key = mix(key, value & MASK)
+        value >>= 64
+    return key
+
+
+def feature(key, name, value):
+    """
+    Compute the feature of a named value belonging to a component.
+
+    :param key: component key
+    :type key: int
+    :param name: name of the property or state field
+    :type name: str
+    :param value: value of the property or state field
+    :type value: object
+    :rtype: int
+    """
+    return mix(key ^ string_key(name), value_key(value))
+
+
+def location(component, container):
+    """
+    Compute the feature stating that component lies into container.
+
+    :rtype: int
+    """
+    if container is None:
+        return 0
+    return mix(component._zkey, container._zkey ^ _LOCATION)
+
+
+def order(key, value):
+    """
+    Compute the feature of the order of cards in a deck.
+
+    :param key: deck key
+    :type key: int
+    :param value: polynomial hash of cards keys
+    :type value: int
+    :rtype: int
+    """
+    return mix(key ^ _ORDER, value)
+
+
+def sequence(keys):
+    """
+    Compute the polynomial hash of a sequence of keys: sum of key * BASE^index.
+
+    :rtype: int
+    """
+    h = 0
+    for key in reversed(keys):
+        h = (key + BASE * h) & MASK
+    return h
+
+
+def push_front(h, key):
+    """
+    Update a polynomial hash when a key is inserted at the front.
+
+    :rtype: int
+    """
+    return (key + BASE * h) & MASK
+
+
+def pop_front(h, key):
+    """
+    Update a polynomial hash when the front key is removed.
+
+    :rtype: int
+    """
+    return ((h - key) * BASE_INVERSE) & MASK
+
+
+def push_back(h, key, index):
+    """
+    Update a polynomial hash when a key is appended at given index.
+
+    :rtype: int
+    """
+    return (h + key * pow(BASE, index, 1 << 64)) & MASK
+
+
+def pop_back(h, key, index):
+    """
+    Update a polynomial hash when the last key, at given index, is removed.
+
+    :rtype: int
+    """
+    return (h - key * pow(BASE, index, 1 << 64)) & MASK
@@ -1,20 +1,143 @@
 #!encoding: utf-8
 
+import contextlib
+import copy
+import itertools
+import threading
+
 from .predicate import Predicate, PropertyError
+from . import zobrist
+from . import rng
 
 """
 Base class for zone and components
 """
 
+#Boards ownership epochs
+_epochs = itertools.count(1)
+#Stamps of components states, see Component._touch
+_stamps = itertools.count(1)
+#Reads being tracked by the current thread
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def tracking():
+    """
+    Context manager recording the components read in the current thread.
+
+    Yields a dictionary filled with (component, stamp) tuples: the state of
+    a component has not changed as long as its _stamp attribute is equal to
+    the recorded stamp. Tracking contexts may be nested, reads are then
+    recorded by all of them.
+    """
+    reads = { }
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = [ ]
+    stack.append(reads)
+    Component._tracking += 1
+    try:
+        yield reads
+    finally:
+        Component._tracking -= 1
+        stack.pop()
+
+
+def track_reads(reads):
+    """
+    Record reads tracked earlier into the tracking contexts of current thread.
+
+    :param reads: (component, stamp) tuples
+    :type reads: iterable
+    """
+    for reading in getattr(_local, "stack", ()):
+        for component, stamp in reads:
+            reading.setdefault(id(component), (component, stamp))
+
+
+class SharedComponentError(RuntimeError):
+    """
+    Exception raised when modifying a component shared between a board and its
+    forks, through a reference obtained before forking.
+    """
+    pass
+
+
 class Component():
     """
     Base class for all components in game
     """
+    #Internal state fields taken into account in board hash
+    _zobrist_fields = ()
+    #Fields rebuilt when a snapshot is loaded instead of being saved
+    _transient_fields = ("_board", "_epoch", "_shared_children", "_random",
+            "_stamp", "_container", "_zhash")
+    #Own random generator, see set_random
+    _random = None
+    #Stamp of component state, changed by every change of state
+    _stamp = 0
+    #Component holding this component
+    _container = None
+    #Hash of component state and of its children, its own location excluded:
+    #None until computed, see _get_zhash
+    _zhash = None
+    #Number of tracking contexts, in all threads
+    _tracking = 0
+    #Component classes by qualified name, for snapshots
+    _classes = { }
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Register component classes so that snapshots may refer to them.
+        """
+        super(Component, cls).__init_subclass__(**kwargs)
+        Component._classes["{}.{}".format(cls.__module__, cls.__qualname__)] = cls
+
     def __init__(self, **properties):
         """
         Constructor.
         """
         super(Component, self).__setattr__("_properties", properties)
+        super(Component, self).__setattr__("_board", None)
+        super(Component, self).__setattr__("_epoch", None)
+        super(Component, self).__setattr__("_shared_children", False)
+        super(Component, self).__setattr__("_zkey", zobrist.new_key())
+
+    def set_random(self, generator):
+        """
+        Set the random generator of component.
+
+        A board generator is used by all its components which have none.
+        Generators are not saved in snapshots.
+
+        :param generator: random generator, None to use the one of board
+        :type generator: random.Random
+        :return: current instance
+        :rtype: Component
+        """
+        if generator is None:
+            self.__dict__.pop("_random", None)
+        else:
+            self.__dict__["_random"] = generator
+        return self
+
+    def get_random(self):
+        """
+        Get the random generator used by component.
+
+        :return: own generator, or generator of board, or generator of current
+            context (see rng module)
+        :rtype: random.Random
+        """
+        generator = self._random
+        if generator is None:
+            board = self._board
+            if board is not None:
+                generator = board._random
+            if generator is None:
+                return rng.current()
+        return generator
 
     def is_visible(self):
         """
@@ -36,6 +159,8 @@ class Component():
         An optional cast function taking a single argument may be provided to
         change the type of returned property.
         """
+        if self._tracking:
+            self._track()
         if cast is None:
             cast = lambda x: x
         if self.is_visible():
@@ -50,7 +175,62 @@ class Component():
         """
         Change value of specified property.
         """
-        self._properties[name] = value
+        board = self._writable_board()
+        self.__dict__["_stamp"] = next(_stamps)
+        properties = self._properties
+        if board is not None and board._journal is not None:
+            if name in properties:
+                board._journal.append((self.set, name, properties[name]))
+            else:
+                board._journal.append((self._del_property, name))
+        if self._hashing():
+            key = self._zkey
+            delta = zobrist.feature(key, name, value)
+            if name in properties:
+                delta ^= zobrist.feature(key, name, properties[name])
+            self._rehash(delta)
+        properties[name] = value
+
+    def _del_property(self, name):
+        """
+        Remove specified property.
+
+        :param name: name of property
+        :type name: str
+        """
+        board = self._writable_board()
+        self.__dict__["_stamp"] = next(_stamps)
+        value = self._properties.pop(name)
+        if board is not None and board._journal is not None:
+            board._journal.append((self.set, name, value))
+        if self._hashing():
+            self._rehash(zobrist.feature(self._zkey, name, value))
+
+    def _set_field(self, name, value):
+        """
+        Change value of an internal state field.
+
+        All changes of the fields listed in _zobrist_fields shall go through
+        this method to keep the hash of the board up to date.
+
+        :param name: name of the field
+        :type name: str
+        :param value: new value of the field
+        :type value: object
+        """
+        board = self._writable_board()
+        old = self.__dict__[name]
+        if old is value:
+            #Nothing to record, like turning a face up card face up
+            return
+        self.__dict__["_stamp"] = next(_stamps)
+        if board is not None and board._journal is not None:
+            board._journal.append((self._set_field, name, old))
+        if self._hashing():
+            key = self._zkey
+            self._rehash(zobrist.feature(key, name, old)
+                    ^ zobrist.feature(key, name, value))
+        self.__dict__[name] = value
 
     def __getattr__(self, name):
         """
@@ -66,6 +246,8 @@ class Component():
         :type name: str
         :rtype: object
         """
+        if self._tracking:
+            self._track()
         try:
             return self.__dict__["_properties"][name]
         except KeyError:
@@ -82,10 +264,27 @@ class Component():
         :type value: Python object
         """
         if "_properties" in self.__dict__ and name in self._properties:
-            self._properties[name] = value
+            self.set(name, value)
         else:
             super(Component, self).__setattr__(name, value)
 
+    def _track(self):
+        """
+        Record that the component is being read, see tracking.
+
+        Reading methods shall call it when _tracking is not zero.
+        """
+        for reads in getattr(_local, "stack", ()):
+            if id(self) not in reads:
+                reads[id(self)] = (self, self._stamp)
+
+    def _touch(self):
+        """
+        Give a new stamp to the component: all changes of state which are not
+        made through set or _set_field shall call it.
+        """
+        self.__dict__["_stamp"] = next(_stamps)
+
     def is_leaf(self):
         """
         State whether this component is a leaf (it has no children).
@@ -94,6 +293,234 @@ class Component():
         """
         return True
 
+    def _iter_children(self):
+        """
+        Iterate over the components held by this component.
+
+        :rtype: iterable
+        """
+        return ()
+
+    def _writable_board(self):
+        """
+        Get the board of component before a change.
+
+        :return: board of component or None if it is not on a board
+        :rtype: Board
+        :raise SharedComponentError: if component is shared with a forked board
+        """
+        board = self._board
+        if board is not None and self._epoch != board._epoch:
+            raise SharedComponentError("{} object is shared with a forked "
+                    "board, look it up again from its board".format(
+                    self.__class__.__name__))
+        return board
+
+    def _copy_state(self):
+        """
+        Copy the instance dictionary, containers included but not their content.
+
+        :rtype: dict
+        """
+        state = { }
+        for name, value in self.__dict__.items():
+            if type(value) in (list, dict):
+                value = value.copy()
+            state[name] = value
+        return state
+
+    def _fork_copy(self, board):
+        """
+        Copy the component for a board it is shared with.
+
+        Children are not copied: they are still shared.
+
+        :param board: board owning the copy
+        :type board: Board
+        :return: copy of component
+        :rtype: Component
+        """
+        clone = object.__new__(self.__class__)
+        clone.__dict__.update(self._copy_state())
+        clone.__dict__.update(_board=board, _epoch=board._epoch,
+                _shared_children=True)
+        if "_random" in clone.__dict__:
+            clone.__dict__["_random"] = copy.copy(self._random)
+        return clone
+
+    def _own_child(self, index):
+        """
+        Get a child, copying it first if it is shared with a forked board.
+
+        :param index: position of child
+        :type index: int
+        :rtype: Component
+        """
+        children = self._iter_children()
+        child = children[index]
+        board = self._board
+        if (board is not None and child._epoch != board._epoch
+                and self._epoch == board._epoch):
+            child = child._fork_copy(board)
+            child.__dict__["_container"] = self
+            children[index] = child
+        return child
+
+    def _own_children(self):
+        """
+        Copy all children shared with a forked board.
+        """
+        if self._shared_children:
+            board = self._board
+            if board is not None and self._epoch == board._epoch:
+                for index in range(len(self._iter_children())):
+                    self._own_child(index)
+                self.__dict__["_shared_children"] = False
+
+    def _own_tree(self):
+        """
+        Copy all descendants shared with a forked board.
+        """
+        self._own_children()
+        for child in self._iter_children():
+            child._own_tree()
+
+    def _hashing(self):
+        """
+        Check whether a change of the component shall update hashes.
+
+        Hashes are only updated once they have been computed. Within
+        Board.deferred_hash, they are forgotten instead.
+
+        :rtype: bool
+        """
+        if self._zhash is None:
+            return False
+        board = self._board
+        if board is not None and board._deferred:
+            self._forget_hash()
+            return False
+        return True
+
+    def _rehash(self, delta):
+        """
+        Apply a change of hash to the component and to its containers.
+
+        :param delta: exclusive or of removed and added features
+        :type delta: int
+        """
+        component = self
+        while component is not None:
+            h = component._zhash
+            if h is None:
+                break
+            component.__dict__["_zhash"] = h ^ delta
+            component = component._container
+
+    def _forget_hash(self):
+        """
+        Forget the hashes of the component and of its containers.
+        """
+        component = self
+        while component is not None and component._zhash is not None:
+            component.__dict__["_zhash"] = None
+            component = component._container
+
+    def _get_zhash(self):
+        """
+        Get the hash of the component state and of its children, computing it
+        if it is not known.
+
+        Hashes of containers are only known if hashes of their children are,
+        so that changes are applied up to the first unknown hash.
+
+        :rtype: int
+        """
+        h = self._zhash
+        if h is None:
+            h = self._zobrist_state()
+            for child in self._iter_children():
+                h ^= child._get_zhash() ^ zobrist.location(child, self)
+            self.__dict__["_zhash"] = h
+        return h
+
+    def _zobrist_state(self):
+        """
+        Compute the hash contribution of the component own state.
+
+        :rtype: int
+        """
+        key = self._zkey
+        h = 0
+        for name, value in self._properties.items():
+            h ^= zobrist.feature(key, name, value)
+        for name in self._zobrist_fields:
+            h ^= zobrist.feature(key, name, self.__dict__[name])
+        return h
+
+    def _zobrist_tree(self, container):
+        """
+        Compute the hash contribution of the component and all its children,
+        from scratch.
+
+        :param container: component holding this component
+        :type container: Component
+        :rtype: int
+        """
+        h = self._zobrist_state() ^ zobrist.location(self, container)
+        for child in self._iter_children():
+            h ^= child._zobrist_tree(self)
+        return h
+
+    def _attach(self, board):
+        """
+        Attach component and its children to a board.
+
+        Components removed from a board stay attached to it, so that their
+        changes are still recorded in its journal and moving them within the
+        board does not walk their children.
+
+        :param board: board the component now belongs to
+        :type board: Board
+        """
+        if self._board is board and self._epoch == board._epoch:
+            return
+        self.__dict__["_board"] = board
+        self.__dict__["_epoch"] = board._epoch
+        for child in self._iter_children():
+            child._attach(board)
+
+    def _after_load(self):
+        """
+        Rebuild transient fields once the component has been loaded from a
+        snapshot.
+        """
+        self.__dict__.update(_board=None, _epoch=None, _shared_children=False,
+                _stamp=next(_stamps))
+        for child in self._iter_children():
+            child.__dict__["_container"] = self
+
+    def _bind(self, board):
+        """
+        Set the board of component and its children without hashing.
+
+        Hashes cached by the components are forgotten: keys of some property
+        values (plain objects hashed by identity) change once unpickled.
+
+        :param board: board the component belongs to
+        :type board: Board
+        """
+        self.__dict__["_board"] = board
+        self.__dict__["_epoch"] = board._epoch
+        self.__dict__["_zhash"] = None
+        for child in self._iter_children():
+            child.__dict__["_container"] = self
+            child._bind(board)
+
+
+Component._classes["{}.{}".format(Component.__module__,
+        Component.__qualname__)] = Component
+
 
 class Zone(Component):
     """
@@ -121,7 +548,7 @@ class Zone(Component):
         :return: current zone
         :rtype: Zone
         """
-        self._children.append(component)
+        self._insert_child(len(self._children), component)
         return self
 
     def remove(self, component):
@@ -134,11 +561,66 @@ class Zone(Component):
         :rtype: Zone
         """
         try:
-            self._children.remove(component)
+            index = self._children.index(component)
         except ValueError:
             pass
-        finally:
-            return self
+        else:
+            self._pop_child(index)
+        return self
+
+    def _insert_child(self, index, component):
+        """
+        Insert a component at given index of children.
+
+        :param index: position of component
+        :type index: int
+        :param component: component to be inserted
+        :type component: Component
+        """
+        board = self._writable_board()
+        component._writable_board()
+        self._touch()
+        self._children.insert(index, component)
+        component.__dict__["_container"] = self
+        if board is not None:
+            component._attach(board)
+            if board._journal is not None:
+                board._journal.append((self._pop_child, index))
+        if self._hashing():
+            self._rehash(component._get_zhash()
+                    ^ zobrist.location(component, self))
+
+    def _pop_child(self, index):
+        """
+        Remove the component at given index of children.
+
+        :param index: position of component
+        :type index: int
+        :return: removed component
+        :rtype: Component
+        """
+        board = self._writable_board()
+        if board is not None and self._shared_children:
+            #Removed component is no longer shared
+            self._own_child(index)
+        self._touch()
+        component = self._children.pop(index)
+        if board is not None and board._journal is not None:
+            #Later changes of the removed component are recorded as well
+            board._journal.append((self._insert_child, index, component))
+        if self._hashing():
+            self._rehash(component._get_zhash()
+                    ^ zobrist.location(component, self))
+        component.__dict__["_container"] = None
+        return component
+
+    def _iter_children(self):
+        """
+        Iterate over the components held by this zone.
+
+        :rtype: iterable
+        """
+        return self._children
 
     def __len__(self):
         """
@@ -147,6 +629,8 @@ class Zone(Component):
         :return: number of components
         :rtype: int
         """
+        if self._tracking:
+            self._track()
         return len(self._children)
 
     def is_leaf(self):
@@ -169,18 +653,9 @@ class Zone(Component):
         """
         #Convert predicate if it's a string query
         predicate = Predicate(predicate)
-        #Find if it's a self match
-        if predicate(self):
-            return self
-        #Then ask to children to find
-        for c in self._children:
-            if not c.is_leaf():
-                result = c.search_component(predicate)
-                if result is not None:
-                    return result
-            else:
-                if predicate(c):
-                    return c
+        paths = [ ]
+        if self._find_paths(predicate, (), paths, True):
+            return self._follow(paths[0])
         #Nothing has been found
         return None
 
@@ -194,24 +669,64 @@ class Zone(Component):
         :return: all matching components
         :rtype: list
         """
-        output = []
         #Convert predicate if it's a string query
         if predicate is None:
             predicate = lambda x: True
         predicate = Predicate(predicate)
+        paths = [ ]
+        self._find_paths(predicate, (), paths, False)
+        #Return all matches
+        return [self._follow(path) for path in paths]
+
+    def _find_paths(self, predicate, path, output, first):
+        """
+        Collect the paths to components fulfilling given predicate.
+
+        A path is a tuple of steps from this zone to the matching component, to
+        be given to _follow method. Search does not modify the zone so that
+        components shared with a forked board are only copied once found.
+
+        :param predicate: predicate function taking a single argument
+        :type predicate: Predicate
+        :param path: path from the zone where search started to this zone
+        :type path: tuple
+        :param output: list where paths are appended
+        :type output: list
+        :param first: stop on the first match
+        :type first: bool
+        :return: True if search shall stop
+        :rtype: bool
+        """
+        if self._tracking:
+            self._track()
         #Find if it's a self match
         if predicate(self):
-            output.append(self)
+            output.append(path)
+            if first:
+                return True
         #Then ask to children to find
-        for c in self._children:
+        for index, c in enumerate(self._children):
             if not c.is_leaf():
-                result = c.search_all_components(predicate)
-                output.extend(result)
-            else:
-                if predicate(c):
-                    output.append(c)
-        #Return all matches
-        return output
+                if c._find_paths(predicate, path + (index,), output, first):
+                    return True
+            elif predicate(c):
+                output.append(path + (index,))
+                if first:
+                    return True
+        return False
+
+    def _follow(self, path):
+        """
+        Get the component at the end of a path found by _find_paths.
+
+        :param path: steps from this zone to the component
+        :type path: tuple
+        :rtype: Component
+        """
+        component = self
+        for step in path:
+            component = component._own_child(step)
+        return component
 
     def apply(self, transform, predicate=None):
         """
@@ -236,12 +751,18 @@ class Zone(Component):
         if predicate(self):
             transform(self)
         #Transform children
-        for c in self._children:
+        board = self._board
+        for index, c in enumerate(self._children):
             if not c.is_leaf():
+                if board is not None and c._epoch != board._epoch:
+                    #Do not copy shared zones without any match
+                    if not c._find_paths(predicate, (), [ ], True):
+                        continue
+                    c = self._own_child(index)
                 c.apply(transform, predicate)
             else:
                 if predicate(c):
-                    transform(c)
+                    transform(self._own_child(index))
         #Return
         return self
 
@@ -249,6 +770,9 @@ class Zone(Component):
         """
         Turn zone object into iterables.
         """
+        if self._tracking:
+            self._track()
+        self._own_children()
         return iter(self._children)
 
     def is_empty(self):
@@ -257,4 +781,6 @@ class Zone(Component):
 
         :rtype: bool
         """
+        if self._tracking:
+            self._track()
         return len(self._children) == 0
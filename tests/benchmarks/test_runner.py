@@ -0,0 +1,41 @@
+#!encoding: utf-8
+
+import json
+
+from benchmarks import runner
+
+
+def result(name, seconds, **params):
+    return {"name": name, "params": params, "unit": "call",
+            "seconds": seconds, "rate": 1. / seconds}
+
+
+class TestRunner(object):
+    def test_suites(self):
+        names = set(name for name, unit, setup, params in runner.load())
+        assert {"snapshot.dumps", "game.noop", "mcts.search"} <= names
+
+    def test_compare(self):
+        baseline = {"results": [result("a", 1., n=1), result("a", 1., n=2),
+                result("b", 1.)]}
+        comparisons, regressions = runner.compare([result("a", 1.1, n=1),
+                result("a", 1.5, n=2), result("c", 1.)], baseline, 0.2)
+        #Results missing from baseline are not compared
+        assert [c[0] for c in comparisons] == ["a[n=1]", "a[n=2]"]
+        assert comparisons[1] == ("a[n=2]", 1., 1.5, 1.5)
+        assert regressions == ["a[n=2]"]
+
+    def test_main(self, tmp_path, capsys):
+        argv = ["-k", "predicate.function", "-r", "1", "--min-time", "0.001"]
+        output = str(tmp_path / "results.json")
+        assert runner.main(argv + ["-o", output]) == 0
+        with open(output) as f:
+            results = json.load(f)["results"]
+        assert [r["name"] for r in results] == ["predicate.function"]
+        baseline = str(tmp_path / "baseline.json")
+        for seconds, code in [(1., 0), (1e-12, 1)]:
+            results[0]["seconds"] = seconds
+            with open(baseline, "w") as f:
+                json.dump({"results": results}, f)
+            assert runner.main(argv + ["-b", baseline]) == code
+        assert "1 regression(s)" in capsys.readouterr().out
@@ -0,0 +1,60 @@
+#!encoding: utf-8
+
+import pickle
+
+import pytest
+
+from gagarin.core.agent import Action, ActionSpace
+from gagarin.core.games.battle import Battle
+
+
+class TestAction(object):
+    def test_interning(self):
+        action = Action(kind="play", card=3)
+        assert Action(card=3, kind="play") is action
+        assert Action(kind="play", card=4) is not action
+        assert action.kind == "play"
+        assert action.card == 3
+        assert action.get("target") is None
+        assert action.get_properties() == {"kind": "play", "card": 3}
+        assert {action: 1}[Action(kind="play", card=3)] == 1
+        with pytest.raises(AttributeError):
+            action.target
+        with pytest.raises(AttributeError):
+            action.card = 4
+        with pytest.raises(TypeError):
+            Action(cards=[1, 2])
+
+    def test_pickle(self):
+        action = Action(kind="play", card=3)
+        assert pickle.loads(pickle.dumps(action)) is action
+
+
+class TestActionSpace(object):
+    def test_product(self):
+        space = ActionSpace.product(kind=["play", "discard"], card=range(3))
+        assert len(space) == 6
+        assert space.decode(0) is Action(kind="play", card=0)
+        assert space.encode(Action(kind="discard", card=2)) == 5
+        for i, action in enumerate(space):
+            assert space.encode(action) == i
+            assert space.decode(i) is action
+        assert space.decode_all(space.encode_all([Action(kind="play",
+                card=1)])) == [Action(kind="play", card=1)]
+        assert Action(kind="play", card=3) not in space
+        assert [1, 2] not in space
+        with pytest.raises(ValueError):
+            space.encode(Action(kind="play", card=3))
+        with pytest.raises(IndexError):
+            space.decode(-1)
+        clone = pickle.loads(pickle.dumps(space))
+        assert list(clone) == list(space)
+
+    def test_duplicates(self):
+        with pytest.raises(ValueError):
+            ActionSpace(["a", "b", "a"])
+
+    def test_game(self):
+        space = Battle().get_action_space()
+        assert space.decode(space.encode(('Play', 'face up'))) == \
+                ('Play', 'face up')
@@ -0,0 +1,99 @@
+#!encoding: utf-8
+
+import io
+
+from gagarin.core.agent import Action
+from gagarin.core.alphabeta import AlphaBetaAgent, WIN
+from gagarin.core.games.nim import Nim, NimAgent
+
+
+def nim(agent, heaps=(3, 4, 5), first=True):
+    game = Nim(heaps, seed=1)
+    agents = [agent, NimAgent("Perfect")]
+    for a in agents if first else reversed(agents):
+        game.add_agent(a)
+    return game
+
+
+class TestAlphaBeta(object):
+    def test_winning(self):
+        #First player wins (3, 4, 5) with perfect play
+        agent = AlphaBetaAgent("AlphaBeta")
+        game = nim(agent)
+        game.mainloop()
+        assert game.get_scores() == {"AlphaBeta": 1, "Perfect": 0}
+        statistics = agent.get_statistics()
+        assert statistics.searches >= 1
+        assert statistics.nodes > 0
+        assert statistics.get_nodes_per_second() > 0
+
+    def test_solved(self):
+        stream = io.StringIO()
+        agent = AlphaBetaAgent("AlphaBeta")
+        game = nim(agent)
+        game.set_logger(stream)
+        game.reset()
+        state = game.get_state_hash()
+        actions = agent.take_actions(game, "main")
+        #Only winning move leaves heaps with a null xor
+        assert actions == [Action(heap=0, take=2)]
+        statistics = agent.get_statistics()
+        #Opponent delays its loss: 1 move, then the 10 stones one by one
+        assert statistics.last_value == WIN - 11
+        assert statistics.last_depth <= 12
+        #Search leaves no trace on game
+        assert game.get_state_hash() == state
+        assert game.get_heaps() == [3, 4, 5]
+        assert not game.get_board().is_recording()
+        assert stream.getvalue() == "Heaps: (3, 4, 5)\n"
+        #Transposition table answers the same search at once
+        nodes = statistics.last_nodes
+        agent.take_actions(game, "main")
+        assert statistics.last_nodes < nodes
+
+    def test_losing(self):
+        agent = AlphaBetaAgent("AlphaBeta")
+        game = nim(agent, (1, 2, 3))
+        game.reset()
+        agent.take_actions(game, "main")
+        assert agent.get_statistics().last_value < -WIN // 2
+
+    def test_depth(self):
+        agent = AlphaBetaAgent("AlphaBeta", max_depth=2)
+        game = nim(agent, (2, 3), first=False)
+        game.mainloop()
+        assert agent.get_statistics().last_depth <= 2
+        assert game.get_scores() == {"AlphaBeta": 0, "Perfect": 1}
+
+    def test_time_limit(self):
+        agent = AlphaBetaAgent("AlphaBeta", time_limit=0.02)
+        game = nim(agent, (5, 6, 7, 8))
+        game.reset()
+        actions = agent.take_actions(game, "main")
+        assert game.is_legal_action("main", agent, actions[0])
+        statistics = agent.get_statistics()
+        assert statistics.elapsed < 1.
+        assert statistics.last_nodes > 0
+        assert game.get_heaps() == [5, 6, 7, 8]
+
+    def test_time_control(self):
+        for seed in range(3):
+            agent = AlphaBetaAgent("AlphaBeta")
+            game = nim(agent, (7, 9, 11, 13))
+            game.set_seed(seed)
+            game.set_time_control(per_decision=0.002)
+            game.mainloop()
+            #Searches cut off by deadline leave the game consistent
+            assert game.is_ended()
+            assert sum(game.get_heaps()) == 0
+            assert sorted(game.get_scores().values()) == [0, 1]
+            assert not game.get_board().is_recording()
+            board = game.get_board()
+            assert board.get_hash() == board.compute_hash()
+
+    def test_table_size(self):
+        agent = AlphaBetaAgent("AlphaBeta", table_size=64)
+        game = nim(agent, (2, 3, 4))
+        game.mainloop()
+        assert game.get_scores() == {"AlphaBeta": 1, "Perfect": 0}
+        assert len(agent._table) == 64
@@ -0,0 +1,99 @@
+#!encoding: utf-8
+
+import pytest
+
+from gagarin.core.board import Board
+from gagarin.core.zone import Zone
+from gagarin.core.deck import Deck
+from gagarin.core.card import Card
+from gagarin.core.archive import SnapshotArchive, ArchiveError
+
+
+def play(board, turn):
+    deck = board.search_component("name == 'Deck'")
+    hand = board.search_component("name == 'Hand'")
+    board.turn = turn
+    if not deck.is_empty():
+        hand.add(deck.draw()[0])
+
+
+@pytest.fixture(scope="function")
+def board():
+    board = Board(name="Board", turn=0)
+    deck = Deck(name="Deck")
+    for value in range(10):
+        deck.add(Card(value=value))
+    board.add(deck)
+    board.add(Zone(name="Hand"))
+    yield board
+
+
+@pytest.fixture(scope="function")
+def path(tmp_path, board):
+    path = str(tmp_path / "games.gaga")
+    with SnapshotArchive(path, "w", segment_size=4) as archive:
+        for game in ["g1", "g2"]:
+            for turn in range(6):
+                play(board, turn)
+                archive.append(game, turn, board)
+    yield path
+
+
+class TestSnapshotArchive(object):
+    def test_random_access(self, path):
+        with SnapshotArchive(path) as archive:
+            assert len(archive) == 12
+            assert ("g2", 3) in archive and ("g3", 0) not in archive
+            assert archive.turns("g1") == list(range(6))
+            state = archive.load("g1", 3)
+            assert state.turn == 3
+            assert len(state.search_component("name == 'Hand'")) == 4
+            assert state.get_hash() == state.compute_hash()
+            with pytest.raises(KeyError):
+                archive.load("g1", 6)
+
+    def test_batches(self, path):
+        with SnapshotArchive(path) as archive:
+            batches = list(archive.iter_batches(5))
+            assert [len(b) for b in batches] == [5, 5, 2]
+            assert [(g, t) for g, t, s in batches[0]] == [("g1", t)
+                    for t in range(5)]
+            batch = next(archive.iter_batches(game_id="g2"))
+            assert [s.turn for g, t, s in batch] == list(range(6))
+            assert [(g, t) for g, t, s in archive] == archive.keys()
+
+    def test_append(self, path, board):
+        with SnapshotArchive(path, "a") as archive:
+            board.turn = 99
+            archive.append(3, 0, board)
+            #States are readable before archive is flushed
+            assert archive.load(3, 0).turn == 99
+            assert archive.load("g1", 0).turn == 0
+        with SnapshotArchive(path) as archive:
+            assert len(archive) == 13
+            assert archive.load(3, 0).turn == 99
+
+    def test_recovery(self, path, board):
+        archive = SnapshotArchive(path, "a", segment_size=100)
+        archive.append("g3", 0, board)
+        archive.append("g3", 1, board)
+        #Simulate a crash: no index is written for the last records
+        archive._file.flush()
+        size = archive._size
+        archive._file.close()
+        archive._file = None
+        with open(path, "ab") as file:
+            file.write(b"R\x01")
+        with SnapshotArchive(path, "a") as archive:
+            assert len(archive) == 14
+            assert archive._size == size
+            assert archive.load("g3", 1).turn == board.turn
+        with SnapshotArchive(path) as archive:
+            assert len(archive) == 14
+
+    def test_errors(self, tmp_path):
+        path = str(tmp_path / "bad.gaga")
+        with open(path, "wb") as file:
+            file.write(b"NOT AN ARCHIVE")
+        with pytest.raises(ArchiveError):
+            SnapshotArchive(path)
@@ -7,10 +7,11 @@ import os
 import pytest
 
 from gagarin.core.board import Board
-from gagarin.core.zone import Zone
+from gagarin.core.zone import Zone, SharedComponentError
 from gagarin.core.deck import Deck
 from gagarin.core.card import Card
-from gagarin.core.token import Token
+from gagarin.core.token import Token, OneSidedToken, TokenPool
+from gagarin.core.die import Die, Face
 
 
 class MyCard(Card):
@@ -56,6 +57,10 @@ def board(standard_poker):
     yield board
 
 
+class Owner(object):
+    pass
+
+
 class TestBoard(object):
     def test_get(self, board):
         assert board.get("name") == "Poker"
@@ -120,3 +125,266 @@ class TestBoard(object):
             for token in stack:
                 sum += token.get("value")
             assert sum == total
+
+
+@pytest.fixture(scope="function")
+def small_board():
+    board = Board(name="Small", turn=0)
+    deck = Deck(name="Deck")
+    for fv in ["A", "K", "Q", "J", "10"]:
+        deck.add(MyCard(facevalue=fv, colour="S"))
+    hand = Zone(name="Hand")
+    bank = TokenPool(name="Bank")
+    bank.put(Token(value=1), 10)
+    board.add(deck)
+    board.add(hand)
+    board.add(bank)
+    board.add(OneSidedToken(value="+3"))
+    board.add(Die([Face(value=v) for v in range(1, 7)], colour="Blue"))
+    yield board
+
+
+class TestBoardHash(object):
+    def check(self, board):
+        assert board.get_hash() == board.compute_hash()
+        return board.get_hash()
+
+    def test_incremental(self, small_board):
+        board = small_board
+        initial = self.check(board)
+        deck = board.search_component("name == 'Deck'")
+        hand = board.search_component("name == 'Hand'")
+        bank = board.search_component("name == 'Bank'")
+        for card in deck.draw(2):
+            hand.add(card)
+        self.check(board)
+        card = hand.search_component(lambda x: isinstance(x, Card))
+        card.flip()
+        self.check(board)
+        card.tap()
+        self.check(board)
+        hand.remove(card)
+        deck.add(card, position="bottom")
+        self.check(board)
+        deck.add(hand.search_component(lambda x: isinstance(x, Card)),
+                position="random")
+        self.check(board)
+        deck.shuffle()
+        deck.search("facevalue == 'Q'", 1)
+        self.check(board)
+        bank.take(Token(value=1), 3)
+        bank.put(Token(value=5))
+        self.check(board)
+        board.search_component(lambda x: isinstance(x, OneSidedToken)).flip()
+        board.search_component(lambda x: isinstance(x, Die)).roll()
+        board.turn += 1
+        board.set("phase", "main")
+        self.check(board)
+        assert board.get_hash() != initial
+
+    def test_transposition(self, small_board):
+        board = small_board
+        initial = board.get_hash()
+        deck = board.search_component("name == 'Deck'")
+        hand = board.search_component("name == 'Hand'")
+        #Same position reached in two different ways
+        card = deck.draw()[0]
+        hand.add(card)
+        card.rotate(90)
+        card.rotate(-90)
+        hand.remove(card)
+        deck.add(card)
+        assert board.get_hash() == initial
+        card = deck.draw(face_up=False)[0]
+        assert board.get_hash() != initial
+        deck.add(card, position="bottom")
+        assert board.get_hash() != initial
+
+    def test_lazy(self, small_board):
+        board = small_board
+        deck = board.search_component("name == 'Deck'")
+        hand = board.search_component("name == 'Hand'")
+        card = deck.draw()[0]
+        hand.add(card)
+        #Hash is only computed on demand
+        assert board._zhash is None
+        self.check(board)
+        #Moving a component keeps the hash of its own state
+        cached = card._zhash
+        hand.remove(card)
+        board.add(card)
+        assert card._zhash == cached
+        self.check(board)
+
+    def test_deferred(self, small_board):
+        board = small_board
+        initial = board.get_hash()
+        deck = board.search_component("name == 'Deck'")
+        hand = board.search_component("name == 'Hand'")
+        bank = board.search_component("name == 'Bank'")
+        checkpoint = board.checkpoint()
+        with board.deferred_hash():
+            for card in deck.draw(3):
+                hand.add(card.flip())
+            bank.take(Token(value=1), 2)
+            board.turn += 1
+            assert board._zhash is None
+            assert bank._zhash is None
+        self.check(board)
+        deck.shuffle()
+        self.check(board)
+        board.rollback(checkpoint)
+        assert self.check(board) == initial
+
+    def test_memento(self, small_board):
+        board = small_board
+        save = board.create_memento()
+        initial = board.get_hash()
+        board.search_component("name == 'Deck'").shuffle()
+        board.turn = 3
+        board.set_memento(save)
+        assert board.get_hash() == initial
+        board.turn = 3
+        assert board.get_hash() == board.compute_hash()
+
+    def test_memento_objects(self):
+        #Plain objects are keyed by their hash, which changes once unpickled
+        board = Board(name="Board")
+        board.add(Zone(name="Hand", owner=Owner()))
+        board.get_hash()
+        board.set_memento(board.create_memento())
+        assert board.get_hash() == board.compute_hash()
+        board.search_component("name == 'Hand'").add(Token(value=1))
+        assert board.get_hash() == board.compute_hash()
+
+
+class TestBoardJournal(object):
+    def test_rollback(self, small_board):
+        board = small_board
+        deck = board.search_component("name == 'Deck'")
+        hand = board.search_component("name == 'Hand'")
+        bank = board.search_component("name == 'Bank'")
+        order = list(deck)
+        initial = board.get_hash()
+        checkpoint = board.checkpoint()
+        card = deck.draw()[0]
+        card.tap()
+        hand.add(card)
+        deck.shuffle()
+        deck.add(MyCard(facevalue="2", colour="H"), position="random")
+        bank.take(Token(value=1), 4)
+        bank.put(Token(value=5), 2)
+        board.turn += 1
+        board.set("phase", "main")
+        board.search_component(lambda x: isinstance(x, Die)).roll()
+        hand.remove(card)
+        card.flip()
+        assert board.get_hash() == board.compute_hash()
+        board.rollback(checkpoint)
+        assert board.get_hash() == initial
+        assert board.get_hash() == board.compute_hash()
+        assert list(deck) == order
+        assert all(c.is_face_down() and c.is_untapped() for c in deck)
+        assert hand.is_empty()
+        assert bank.count() == 10
+        assert board.turn == 0
+        with pytest.raises(KeyError):
+            board.get("phase")
+
+    def test_removed(self, small_board):
+        board = small_board
+        deck = board.search_component("name == 'Deck'")
+        hand = board.search_component("name == 'Hand'")
+        hand.add(deck.draw()[0])
+        initial = board.get_hash()
+        checkpoint = board.checkpoint()
+        board.remove(hand)
+        #Removal only records the removal itself
+        assert len(board._journal) == 1
+        card = list(hand)[0]
+        card.flip()
+        card.set("marked", True)
+        hand.remove(card)
+        deck.add(card)
+        board.rollback(checkpoint)
+        assert board.get_hash() == initial
+        assert board.get_hash() == board.compute_hash()
+        hand = board.search_component("name == 'Hand'")
+        card = list(hand)[0]
+        assert card.is_face_up()
+        with pytest.raises(KeyError):
+            card.get("marked")
+
+    def test_nested(self, small_board):
+        board = small_board
+        deck = board.search_component("name == 'Deck'")
+        hand = board.search_component("name == 'Hand'")
+        outer = board.checkpoint()
+        hand.add(deck.draw()[0])
+        after_first = board.get_hash()
+        inner = board.checkpoint()
+        hand.add(deck.draw()[0])
+        board.rollback(inner)
+        assert board.get_hash() == after_first
+        assert len(hand) == 1
+        board.rollback(outer)
+        assert len(hand) == 0 and len(deck) == 5
+        with pytest.raises(ValueError):
+            board.rollback(inner + 1)
+        board.commit()
+        with pytest.raises(ValueError):
+            board.rollback(outer)
+
+
+class TestBoardFork(object):
+    def test_isolation(self, small_board):
+        board = small_board
+        initial = board.get_hash()
+        fork = board.fork()
+        assert fork.get_hash() == initial
+        deck = fork.search_component("name == 'Deck'")
+        hand = fork.search_component("name == 'Hand'")
+        for card in deck.draw(2):
+            hand.add(card.flip())
+        fork.turn = 1
+        fork.search_component("name == 'Bank'").take(Token(value=1), 5)
+        assert fork.get_hash() == fork.compute_hash()
+        assert fork.get_hash() != initial
+        assert board.get_hash() == initial
+        assert board.get_hash() == board.compute_hash()
+        assert len(board.search_component("name == 'Deck'")) == 5
+        assert board.search_component("name == 'Hand'").is_empty()
+        assert board.search_component("name == 'Bank'").count() == 10
+        assert board.turn == 0
+        assert len(fork.search_component("name == 'Deck'")) == 3
+
+    def test_sharing(self, small_board):
+        board = small_board
+        children = list(board)
+        fork = board.fork()
+        fork.search_component("name == 'Hand'").add(MyCard("2", "H"))
+        #Untouched components are still shared
+        shared = [c for c in fork._children if any(c is o for o in children)]
+        assert len(shared) == len(children) - 1
+        #Parent changes do not leak into the fork
+        board.search_component("name == 'Deck'").shuffle().draw()
+        assert len(fork.search_component("name == 'Deck'")) == 5
+        assert fork.get_hash() == fork.compute_hash()
+        assert board.get_hash() == board.compute_hash()
+
+    def test_stale_reference(self, small_board):
+        board = small_board
+        deck = board.search_component("name == 'Deck'")
+        fork = board.fork()
+        with pytest.raises(SharedComponentError):
+            deck.draw()
+        assert len(board.search_component("name == 'Deck'").draw()) == 1
+        assert len(fork.search_component("name == 'Deck'")) == 5
+
+    def test_memento(self, small_board):
+        board = small_board
+        fork = board.fork()
+        fork.search_component("name == 'Deck'").draw()
+        other = Board().set_memento(fork.create_memento())
+        assert len(other.search_component("name == 'Deck'")) == 4
+        assert other.get_hash() == other.compute_hash()
@@ -1,5 +1,11 @@
 #!encoding: utf-8
 
+import asyncio
+import concurrent.futures
+import io
+import random
+import time
+
 import pytest
 
 from gagarin.core.board import Board
@@ -7,7 +13,11 @@ from gagarin.core.zone import Zone
 from gagarin.core.deck import Deck
 from gagarin.core.card import Card
 from gagarin.core.agent import Agent
-from gagarin.core.game import Game
+from gagarin.core.game import Game, GameEnded
+from gagarin.core.games.battle import Battle, BattleAgent
+from gagarin.core import trace
+from gagarin.core import game as game_module
+from gagarin.core.trace import TraceWriter, TraceError
 
 
 @pytest.fixture(scope="module")
@@ -236,3 +246,581 @@ class TestGame(object):
         battle.add_agent(player2)
         battle.mainloop()
         assert battle.get_board().get("name") == "Board"
+
+
+class SlowAgent(MyAgent):
+    def __init__(self, name, delay):
+        super(SlowAgent, self).__init__(name)
+        self._delay = delay
+        self.calls = [ ]
+
+    async def atake_actions(self, game, phase):
+        self.calls.append(game.get_board().turn)
+        await asyncio.sleep(self._delay)
+        return self.take_actions(game, phase)
+
+
+class TestAsyncGame(object):
+    def test_concurrent(self):
+        game = Battle(5)
+        game.add_agent(SlowAgent("A", 0.05))
+        game.add_agent(SlowAgent("B", 0.05))
+        start = time.perf_counter()
+        asyncio.run(game.amainloop())
+        #Agents think concurrently: 5 turns of 50ms, not 10
+        assert time.perf_counter() - start < 0.45
+        assert game.get_board().turn == 5
+        assert sum(game.get_scores().values()) == 52
+
+    def test_timeout(self):
+        game = Battle(3)
+        slow = SlowAgent("Slow", 10)
+        fast = SlowAgent("Fast", 0)
+        game.add_agent(slow)
+        game.add_agent(fast)
+        game.set_time_control(per_decision=0.02, agent=slow)
+        start = time.perf_counter()
+        asyncio.run(game.amainloop())
+        assert time.perf_counter() - start < 1
+        assert slow.calls == [1, 2, 3]
+        assert game.get_thinking_statistics(slow).timeouts == 3
+        assert game.get_time_control(fast) is None
+
+    def test_threads(self):
+        game = Battle(4)
+        game.add_agent(SleepyAgent("A"))
+        game.add_agent(SleepyAgent("B"))
+        start = time.perf_counter()
+        asyncio.run(game.amainloop())
+        #Synchronous agents think in threads: 4 turns of 50ms, not 8
+        assert time.perf_counter() - start < 0.35
+        assert sum(game.get_scores().values()) == 52
+
+    def test_threads_timeout(self):
+        game = Battle(4)
+        agents = [SleepyAgent("A"), SleepyAgent("B")]
+        for agent in agents:
+            game.add_agent(agent)
+        game.set_time_control(per_decision=0.001)
+        start = time.perf_counter()
+        asyncio.run(game.amainloop())
+        assert time.perf_counter() - start < 0.15
+        for agent in agents:
+            assert game.get_thinking_statistics(agent).timeouts == 4
+
+    def test_sequential(self):
+        order = [ ]
+        class Ordered(SlowAgent):
+            async def atake_actions(self, game, phase):
+                order.append(self.get_name())
+                await asyncio.sleep(self._delay)
+                order.append(self.get_name())
+                return self.take_actions(game, phase)
+        game = Battle(2)
+        game._phases["main"]["simultaneous"] = False
+        game.add_agent(Ordered("A", 0.02))
+        game.add_agent(Ordered("B", 0))
+        asyncio.run(game.amainloop())
+        assert order == ["A", "A", "B", "B"] * 2
+
+
+class SleepyAgent(MyAgent):
+    def take_actions(self, game, phase):
+        time.sleep(0.05)
+        return super(SleepyAgent, self).take_actions(game, phase)
+
+
+class SearchingAgent(MyAgent):
+    def take_actions(self, game, phase):
+        with game.searching():
+            time.sleep(0.01)
+        return super(SearchingAgent, self).take_actions(game, phase)
+
+
+class RandomAgent(MyAgent):
+    def take_actions(self, game, phase):
+        return [self.get_random().random()]
+
+
+class TestParallelAgents(object):
+    def play(self, executor, agent_class=MyAgent, turns=50):
+        random.seed(3)
+        game = Battle(turns)
+        game.add_agent(agent_class("A"))
+        game.add_agent(agent_class("B"))
+        game.set_executor(executor)
+        game.mainloop()
+        return game
+
+    def test_threads(self):
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            start = time.perf_counter()
+            game = self.play(executor, SleepyAgent, 4)
+            assert time.perf_counter() - start < 0.35
+        assert game.get_scores() == self.play(None, turns=4).get_scores()
+
+    def test_processes(self):
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            game = self.play(executor)
+        assert game.get_board().turn == 50
+        assert game.get_scores() == self.play(None).get_scores()
+
+    def test_processes_random(self):
+        game = Battle(5, seed=2)
+        agents = [RandomAgent("A"), RandomAgent("B")]
+        for agent in agents:
+            game.add_agent(agent)
+        game.reset()
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            game.set_executor(executor)
+            first = game._take_simultaneous_actions(agents, "main")
+            second = game._take_simultaneous_actions(agents, "main")
+        #Agents in other processes draw new numbers each phase
+        assert first != second
+        assert first[0] != first[1]
+
+    def test_processes_shared(self, monkeypatch):
+        #Games of any size are sent through shared memory
+        monkeypatch.setattr(game_module, "_SHARED_DUMP_SIZE", 0)
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            game = self.play(executor)
+        assert game.get_board().turn == 50
+        assert game.get_scores() == self.play(None).get_scores()
+
+    def test_threads_searching(self):
+        #Each agent searches its own copy of game
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            game = self.play(executor, SearchingAgent, 4)
+        assert game.get_board().turn == 4
+
+
+class TestStepGame(object):
+    def test_step(self):
+        game = Battle(3)
+        game.add_agent(MyAgent("A"))
+        game.add_agent(MyAgent("B"))
+        decisions = game.reset()
+        assert [d.get_agent().get_name() for d in decisions] == ["A", "B"]
+        assert decisions[0].get_phase() == "main"
+        assert decisions[0].get_legal_actions() == [('Play', 'face up')]
+        #Simultaneous phase waits for all agents
+        decisions = game.step([decisions[0].get_legal_actions()])
+        assert [d.get_agent().get_name() for d in decisions] == ["B"]
+        assert game.get_board().turn == 1
+        decisions = game.step([[('Play', 'face up')]])
+        assert game.get_board().turn == 2
+        while decisions:
+            decisions = game.step([d.get_legal_actions() for d in decisions])
+        assert game.is_ended() and game.get_pending_decisions() == [ ]
+        assert game.get_board().turn == 3
+        with pytest.raises(GameEnded):
+            game.step([ ])
+
+    def test_sequential(self):
+        game = Battle(2)
+        game._phases["main"]["simultaneous"] = False
+        game.add_agent(MyAgent("A"))
+        game.add_agent(MyAgent("B"))
+        decisions = game.reset()
+        assert [d.get_agent().get_name() for d in decisions] == ["A"]
+        decisions = game.step([decisions[0].get_legal_actions()])
+        assert [d.get_agent().get_name() for d in decisions] == ["B"]
+        #A's card has been played before B decides
+        assert game.get_observation(decisions[0].get_agent())[3] == 0
+        assert game.get_observation(decisions[0].get_agent())[6] == 1
+
+
+class TestGameCheckpoint(object):
+    def play(self, game, steps):
+        decisions = game.get_pending_decisions()
+        trace = [ ]
+        for i in range(steps):
+            if not decisions:
+                break
+            decisions = game.step([decisions[0].get_legal_actions()])
+            trace.append((game.get_state_hash(), game.get_observation(
+                    game.get_agents()[0])))
+        return trace
+
+    def test_restore(self):
+        random.seed(5)
+        game = Battle(300)
+        game.add_agent(MyAgent("A"))
+        game.add_agent(MyAgent("B"))
+        game.reset()
+        self.play(game, 41)
+        #Middle of a simultaneous phase
+        assert len(game.get_pending_decisions()) == 1
+        checkpoint = game.checkpoint()
+        h = game.get_state_hash()
+        trace = self.play(game, 200)
+        assert game.get_state_hash() != h
+        game.restore(checkpoint)
+        assert game.get_state_hash() == h
+        assert game.get_board().get_hash() == game.get_board().compute_hash()
+        assert len(game.get_pending_decisions()) == 1
+        #Random module is restored too: same continuation
+        assert self.play(game, 200) == trace
+        game.restore(checkpoint)
+        assert self.play(game, 200) == trace
+
+    def test_deterministic(self):
+        game = Battle(300, seed=5)
+        game.deterministic = True
+        game.add_agent(MyAgent("A"))
+        game.add_agent(MyAgent("B"))
+        game.reset()
+        checkpoint = game.checkpoint()
+        state = game.get_random().getstate()
+        h = game.get_state_hash()
+        self.play(game, 50)
+        game.get_random().random()
+        game.restore(checkpoint)
+        #Board is restored, random streams are not
+        assert game.get_state_hash() == h
+        assert game.get_random().getstate() != state
+
+
+class AnytimeAgent(MyAgent):
+    def __init__(self, name, think):
+        super(AnytimeAgent, self).__init__(name)
+        self._think = think
+
+    def take_actions(self, game, phase):
+        deadline = game.get_deadline(self)
+        best = super(AnytimeAgent, self).take_actions(game, phase)
+        deadline.propose(best)
+        start = time.perf_counter()
+        while time.perf_counter() - start < self._think:
+            if deadline.expired():
+                break
+            time.sleep(0.001)
+        return best
+
+
+class StubbornAgent(MyAgent):
+    def take_actions(self, game, phase):
+        time.sleep(0.05)
+        return super(StubbornAgent, self).take_actions(game, phase)
+
+
+class LateAgent(MyAgent):
+    def take_actions(self, game, phase):
+        best = super(LateAgent, self).take_actions(game, phase)
+        #Keeps searching the game well after its deadline
+        checkpoint = game.checkpoint()
+        start = time.perf_counter()
+        while time.perf_counter() - start < 0.03:
+            game.playout(max_decisions=3)
+            game.restore(checkpoint)
+        return best
+
+
+class DozingAgent(MyAgent):
+    def take_actions(self, game, phase):
+        time.sleep(0.5)
+        return super(DozingAgent, self).take_actions(game, phase)
+
+
+class TestTimeBudget(object):
+    def test_per_decision(self):
+        game = Battle(5)
+        fast = AnytimeAgent("Fast", 0)
+        slow = AnytimeAgent("Slow", 10)
+        game.add_agent(fast)
+        game.add_agent(slow)
+        game.set_time_control(per_decision=0.01, agent=slow)
+        start = time.perf_counter()
+        game.mainloop()
+        assert time.perf_counter() - start < 1
+        #Best actions so far were played
+        assert sum(game.get_scores().values()) == 52
+        stats = game.get_thinking_statistics(slow)
+        #Agent either stopped by itself or was cut off at deadline
+        assert stats.decisions == 5
+        assert 0.009 <= stats.get_mean() and stats.longest < 0.1
+        assert game.get_thinking_statistics(fast).timeouts == 0
+        assert game.get_time_control(fast) is None
+
+    def test_bank(self):
+        game = Battle(10)
+        stubborn = StubbornAgent("Stubborn")
+        game.add_agent(MyAgent("Other"))
+        game.add_agent(stubborn)
+        game.set_time_control(bank=0.12)
+        game.mainloop()
+        stats = game.get_thinking_statistics(stubborn)
+        #Two decisions fit in bank, then it runs out: default actions
+        assert stats.decisions == 10
+        assert 7 <= stats.timeouts <= 8
+        assert game.get_remaining_bank(stubborn) == 0
+        assert game.get_board().turn == 10
+
+    def test_late(self):
+        game = Battle(5, seed=1)
+        late = LateAgent("Late")
+        game.add_agent(MyAgent("Other"))
+        game.add_agent(late)
+        game.set_time_control(per_decision=0.005, agent=late)
+        game.mainloop()
+        #Agent searches a copy of game, which goes on without it
+        assert game.is_ended()
+        assert game.get_board().turn == 5
+        assert sum(game.get_scores().values()) == 52
+        stats = game.get_thinking_statistics(late)
+        assert stats.timeouts == stats.decisions == 5
+        assert stats.get_mean() < 0.03
+        assert game.get_deadline(late).is_unlimited()
+
+    def test_abandoned(self):
+        game = Battle(3)
+        dozing = DozingAgent("Dozing")
+        game.add_agent(MyAgent("Other"))
+        game.add_agent(dozing)
+        game.set_time_control(per_decision=0.01, agent=dozing)
+        start = time.perf_counter()
+        game.mainloop()
+        #Game does not wait 3 * 0.5 seconds for agent
+        assert time.perf_counter() - start < 0.3
+        assert game.get_board().turn == 3
+        assert game.get_thinking_statistics(dozing).timeouts == 3
+
+    def test_unlimited(self):
+        game = Battle(3)
+        agent = MyAgent("A")
+        game.add_agent(agent)
+        game.add_agent(MyAgent("B"))
+        game.mainloop()
+        #No bookkeeping without time control
+        assert game.get_thinking_statistics(agent).decisions == 0
+
+
+class CountingBattle(Battle):
+    def __init__(self, *args, **kwargs):
+        super(CountingBattle, self).__init__(*args, **kwargs)
+        self.generated = 0
+
+    def list_legal_actions(self, phase, agent):
+        self.generated += 1
+        return super(CountingBattle, self).list_legal_actions(phase, agent)
+
+
+class TestLegalActionCache(object):
+    def test_cache(self):
+        game = CountingBattle(10)
+        a, b = MyAgent("A"), MyAgent("B")
+        game.add_agent(a)
+        game.add_agent(b)
+        game.reset()
+        assert game.get_legal_actions("main", a) == [('Play', 'face up')]
+        assert game.get_legal_actions("main", a) == [('Play', 'face up')]
+        assert game.generated == 1
+        assert Game.is_legal_action(game, "main", a, ('Play', 'face up'))
+        assert not Game.is_legal_action(game, "main", a, ('Play', 'face down'))
+        assert game.generated == 1
+        #Playing a card changes the play area of A only
+        area = game.get_board().search_component("name == 'A/PlayArea'")
+        area.add(game.get_board().search_component("name == 'A/Deck'")
+                .draw()[0])
+        game.get_legal_actions("main", b)
+        assert game.generated == 2
+        game.get_legal_actions("main", b)
+        assert game.generated == 2
+        expected = Battle.list_legal_actions(game, "main", a)
+        assert game.get_legal_actions("main", a) == expected
+        assert game.generated == 3
+        #Changes of state of components read are tracked too
+        list(area)[-1].flip()
+        assert game.get_legal_actions("main", a) != expected
+        #Undo changes components again: actions are generated anew
+        checkpoint = game.checkpoint()
+        list(area)[-1].flip()
+        generated = game.generated
+        game.get_legal_actions("main", a)
+        game.restore(checkpoint)
+        game.get_legal_actions("main", a)
+        assert game.generated == generated + 2
+
+    def test_fork(self):
+        class Searching(CountingBattle):
+            def list_legal_actions(self, phase, agent):
+                self.generated += 1
+                area = self.get_board().search_component(
+                        "name == '{}/PlayArea'".format(agent.get_name()))
+                if not area.is_empty() and list(area)[-1].is_face_up():
+                    return [('Play', 'face down')]
+                return [('Play', 'face up')]
+        game = Searching(10)
+        a, b = MyAgent("A"), MyAgent("B")
+        game.add_agent(a)
+        game.add_agent(b)
+        game.reset()
+        assert game.get_legal_actions("main", a) == [('Play', 'face up')]
+        fork = game.get_board().fork()
+        #Components read before forking are replaced by copies on change
+        board = game.get_board()
+        deck = board.search_component("name == 'A/Deck'")
+        board.search_component("name == 'A/PlayArea'").add(
+                deck.draw(face_up=True)[0])
+        assert game.get_legal_actions("main", a) == [('Play', 'face down')]
+        assert fork.search_component("name == 'A/PlayArea'").is_empty()
+
+    def test_nested(self):
+        class Nested(CountingBattle):
+            def list_legal_actions(self, phase, agent):
+                if agent.get_name() == "B" or self.get_legal_actions(phase,
+                        self.get_agents()[1]):
+                    return super(Nested, self).list_legal_actions(phase,
+                            agent)
+                return [ ]
+        game = Nested(10)
+        a, b = MyAgent("A"), MyAgent("B")
+        game.add_agent(a)
+        game.add_agent(b)
+        game.reset()
+        game.get_legal_actions("main", b)
+        game.get_legal_actions("main", a)
+        generated = game.generated
+        #Reads of B's cached actions are dependencies of A's actions
+        area = game.get_board().search_component("name == 'B/PlayArea'")
+        area.add(game.get_board().search_component("name == 'B/Deck'")
+                .draw(face_up=False)[0])
+        game.get_legal_actions("main", a)
+        assert game.generated > generated
+
+    def test_mask(self):
+        game = CountingBattle(10)
+        a, b = MyAgent("A"), MyAgent("B")
+        game.add_agent(a)
+        game.add_agent(b)
+        game.reset()
+        mask = game.legal_action_mask("main", a)
+        assert list(mask) == [True, False]
+        assert game.legal_action_mask("main", a) is mask
+        assert game.generated == 1
+        area = game.get_board().search_component("name == 'A/PlayArea'")
+        area.add(game.get_board().search_component("name == 'A/Deck'")
+                .draw(face_up=False)[0])
+        assert list(game.legal_action_mask("main", a)) == [True, False]
+        assert game.generated == 2
+        area.add(game.get_board().search_component("name == 'A/Deck'")
+                .draw(face_up=True)[0])
+        assert list(game.legal_action_mask("main", a)) == [False, True]
+
+
+class TestReplay(object):
+    def play(self, writer, seed):
+        game = Battle(50, seed=seed)
+        game.add_agent(BattleAgent("Alice"))
+        game.add_agent(BattleAgent("Bob"))
+        game.record(writer)
+        game.mainloop()
+        game.mainloop()
+        return game
+
+    def test_replay(self):
+        stream = io.BytesIO()
+        game = self.play(TraceWriter(stream), 7)
+        traces = trace.iter_traces(stream.getvalue())
+        first, second = list(traces)
+        assert len(first) > 0
+        assert trace.Trace.from_bytes(second.to_bytes()).decisions == \
+                second.decisions
+        replayed = self.play(None, 7).replay(second)
+        assert replayed.is_ended()
+        assert replayed.get_scores() == game.get_scores()
+        for a, b in zip(replayed.get_agents(), game.get_agents()):
+            assert replayed.get_observation(a) == game.get_observation(b)
+        #Replaying leaves the trace unchanged
+        again = self.play(None, 7).replay(second)
+        assert again.get_scores() == game.get_scores()
+        for a, b in zip(again.get_agents(), game.get_agents()):
+            assert again.get_observation(a) == game.get_observation(b)
+        #Traces are appendable
+        self.play(TraceWriter(stream), 8)
+        assert len(list(trace.iter_traces(stream.getvalue()))) == 4
+
+    def test_mismatch(self):
+        stream = io.BytesIO()
+        self.play(TraceWriter(stream), 7)
+        recorded = next(trace.iter_traces(stream.getvalue()))
+        game = Battle(50)
+        game.add_agent(BattleAgent("Bob"))
+        game.add_agent(BattleAgent("Alice"))
+        with pytest.raises(TraceError):
+            game.replay(recorded)
+        with pytest.raises(TraceError):
+            trace.Trace.from_bytes(stream.getvalue()[:-3])
+
+
+class TestSearchSupport(object):
+    def test_silenced(self):
+        stream = io.StringIO()
+        game = Battle(5, stream, seed=1)
+        game.add_agent(BattleAgent("Alice"))
+        game.add_agent(BattleAgent("Bob"))
+        writer = TraceWriter(io.BytesIO())
+        game.record(writer)
+        with game.silenced():
+            game.mainloop()
+        assert stream.getvalue() == ""
+        assert game.get_logger() is not None
+        game.log(20, "logged\n")
+        assert stream.getvalue() == "logged\n"
+
+    def test_resample(self):
+        game = Battle(5, seed=1)
+        game.add_agent(BattleAgent("Alice"))
+        game.add_agent(BattleAgent("Bob"))
+        game.reset()
+        deck = game.get_board().search_component("name == 'Alice/Deck'")
+        checkpoint = game.checkpoint()
+        orders = set()
+        for seed in range(5):
+            game.resample(random.Random(seed))
+            deck.shuffle()
+            orders.add(tuple(str(card) for card in deck))
+            game.restore(checkpoint)
+        assert len(orders) > 1
+        deck.shuffle()
+        first = [str(card) for card in deck]
+        game.restore(checkpoint)
+        deck.shuffle()
+        assert [str(card) for card in deck] == first
+
+
+class TestPlayout(object):
+    def battle(self, cls=Battle, logger=None):
+        game = cls(100, logger, seed=2)
+        game.add_agent(BattleAgent("Alice"))
+        game.add_agent(BattleAgent("Bob"))
+        game.reset()
+        return game
+
+    def test_playout(self):
+        stream = io.StringIO()
+        game = self.battle(logger=stream)
+        written = stream.getvalue()
+        checkpoint = game.checkpoint()
+        assert game.playout(max_decisions=10) is None
+        assert not game.is_ended()
+        assert game.get_board().turn == 6
+        scores = game.playout()
+        assert game.is_ended()
+        assert sum(scores.values()) == 52
+        assert stream.getvalue() == written
+        game.restore(checkpoint)
+        assert game.get_board().turn == 1
+        assert game.playout(lambda g, p, a, actions, r: actions[-1],
+                random.Random(1)) == scores
+        #Game still runs normally afterwards
+        game.restore(checkpoint)
+        with pytest.raises(GameEnded):
+            game.declare_end()
+
+    def test_exception(self):
+        class Legacy(Battle):
+            end_by_flag = False
+        game = self.battle(Legacy)
+        assert sum(game.playout().values()) == 52
+        assert game.is_ended()
@@ -0,0 +1,83 @@
+#!encoding: utf-8
+
+import io
+
+from gagarin.core.games.battle import Battle, BattleAgent
+from gagarin.core.log import (DEBUG, INFO, WARNING, DISABLED, LogWriter,
+        BufferedLogWriter)
+
+
+class Unprintable(object):
+    def __format__(self, spec):
+        raise AssertionError("Formatted while disabled")
+
+
+class TestLogWriter(object):
+    def test_write(self):
+        stream = io.StringIO()
+        writer = LogWriter(stream)
+        writer.write_event("{} plays {}\n", ("Alice", 3))
+        writer.write_event("{verbatim}\n", ())
+        assert stream.getvalue() == "Alice plays 3\n{verbatim}\n"
+
+    def test_batches(self):
+        stream = io.StringIO()
+        writer = BufferedLogWriter(stream, batch_size=3)
+        for i in range(5):
+            writer.write_event("{}\n", (i,))
+        assert stream.getvalue() == "0\n1\n2\n"
+        writer.flush()
+        assert stream.getvalue() == "0\n1\n2\n3\n4\n"
+
+    def test_background(self):
+        stream = io.StringIO()
+        with BufferedLogWriter(stream, batch_size=2, background=True) as \
+                writer:
+            for i in range(5):
+                writer.write_event("{}\n", (i,))
+            writer.flush()
+            assert stream.getvalue() == "0\n1\n2\n3\n4\n"
+            writer.write_event("{}\n", (5,))
+        assert stream.getvalue().endswith("5\n")
+
+    def test_stream_write(self):
+        class Stream(io.StringIO):
+            def write(self, text, suffix=""):
+                return super(Stream, self).write(text + suffix)
+        stream = Stream()
+        writer = BufferedLogWriter(stream, batch_size=10)
+        writer.write_event("{}\n", (0,))
+        writer.write("{1}\n")
+        writer.write("2", suffix="\n")
+        assert stream.getvalue() == "0\n{1}\n2\n"
+
+
+class TestGameLog(object):
+    def test_levels(self):
+        stream = io.StringIO()
+        game = Battle(10, stream)
+        game.log(DEBUG, "{}\n", Unprintable())
+        game.log(INFO, "{} {}\n", "info", 1)
+        game.set_log_level(WARNING)
+        game.log(INFO, "{}\n", Unprintable())
+        game.write_to_log("text\n")
+        game.log(WARNING, "warning\n")
+        game.set_log_level(INFO)
+        game.write_to_log("{text}\n")
+        game.set_log_level(WARNING)
+        assert stream.getvalue() == "info 1\nwarning\n{text}\n"
+        game.set_log_level(DISABLED)
+        game.log(WARNING, "{}\n", Unprintable())
+        game.set_logger(None)
+        game.set_log_level(DEBUG)
+        game.log(WARNING, "{}\n", Unprintable())
+
+    def test_game(self):
+        stream = io.StringIO()
+        game = Battle(10, BufferedLogWriter(stream, batch_size=1000))
+        game.add_agent(BattleAgent("Alice"))
+        game.add_agent(BattleAgent("Bob"))
+        game.mainloop()
+        #Buffered events are written once the game ends
+        assert "Turn: 10\n" in stream.getvalue()
+        assert stream.getvalue().endswith("Game now ends.\n")
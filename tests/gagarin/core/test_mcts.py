@@ -0,0 +1,115 @@
+#!encoding: utf-8
+
+import concurrent.futures
+import io
+
+import pytest
+
+from gagarin.core.agent import Action
+from gagarin.core.games.nim import Nim, NimAgent
+from gagarin.core.mcts import MCTSAgent, ParallelMCTSAgent
+
+
+def nim(agent, heaps=(2, 3)):
+    game = Nim(heaps, seed=1)
+    game.add_agent(agent)
+    game.add_agent(NimAgent("Perfect"))
+    return game
+
+
+class TestMCTS(object):
+    def test_winning(self):
+        #First player wins with perfect play
+        for seed in range(3):
+            agent = MCTSAgent("MCTS", iterations=500)
+            game = nim(agent)
+            game.set_seed(seed)
+            game.mainloop()
+            assert game.get_scores() == {"MCTS": 1, "Perfect": 0}
+        statistics = agent.get_statistics()
+        assert statistics.searches >= 1
+        assert statistics.iterations == 500 * statistics.searches
+        assert statistics.get_iterations_per_second() > 0
+
+    def test_search_state(self):
+        stream = io.StringIO()
+        agent = MCTSAgent("MCTS", iterations=200)
+        game = nim(agent, (3, 4, 5))
+        game.set_logger(stream)
+        game.reset()
+        state = game.get_state_hash()
+        actions = agent.take_actions(game, "main")
+        #Search leaves no trace on game
+        assert game.get_state_hash() == state
+        assert game.get_heaps() == [3, 4, 5]
+        assert not game.get_board().is_recording()
+        assert stream.getvalue() == "Heaps: (3, 4, 5)\n"
+        assert len(actions) == 1
+        assert game.is_legal_action("main", agent, actions[0])
+        visits = sum(v for a, v, r in agent.get_root_statistics(game))
+        assert visits == 200
+        #Tree is reused by the next search of the same state
+        nodes = agent.count_nodes()
+        agent.take_actions(game, "main")
+        assert sum(v for a, v, r in agent.get_root_statistics(game)) == 400
+        assert agent.count_nodes() >= nodes
+
+    def test_time_limit(self):
+        agent = MCTSAgent("MCTS", time_limit=0.05)
+        game = nim(agent, (3, 4, 5))
+        game.reset()
+        agent.take_actions(game, "main")
+        assert agent.get_statistics().last_elapsed < 1.
+        assert agent.get_statistics().last_iterations > 0
+
+    def test_time_control(self):
+        for seed in range(5):
+            agent = MCTSAgent("MCTS")
+            game = nim(agent, (7, 9, 11, 13))
+            game.set_seed(seed)
+            game.set_time_control(per_decision=0.002)
+            game.mainloop()
+            #Searches cut off by deadline leave the game consistent
+            assert game.is_ended()
+            assert sum(game.get_heaps()) == 0
+            assert sorted(game.get_scores().values()) == [0, 1]
+            assert not game.get_board().is_recording()
+            board = game.get_board()
+            assert board.get_hash() == board.compute_hash()
+
+    def test_exclusive(self):
+        agent = MCTSAgent("MCTS", iterations=10)
+        game = nim(agent, (3, 4, 5))
+        game.reset()
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            with game.searching():
+                #Nested search in the same thread
+                assert len(agent.take_actions(game, "main")) == 1
+                future = executor.submit(agent.take_actions, game, "main")
+                with pytest.raises(RuntimeError):
+                    future.result()
+            assert len(executor.submit(agent.take_actions, game,
+                    "main").result()) == 1
+        assert game.get_heaps() == [3, 4, 5]
+
+
+class TestParallelMCTS(object):
+    @pytest.mark.parametrize("mode", ["root", "leaf"])
+    def test_modes(self, mode):
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            agent = ParallelMCTSAgent("MCTS", executor, 2, mode,
+                    batch_size=4, iterations=400)
+            game = nim(agent, (1, 2))
+            game.reset()
+            assert agent.take_actions(game, "main") == \
+                    [Action(heap=1, take=1)]
+            assert game.get_heaps() == [1, 2]
+            assert sum(v for a, v, r in agent.get_root_statistics(game)) == \
+                    400
+            assert agent.get_statistics().iterations == 400
+            game.mainloop()
+            assert game.get_scores() == {"MCTS": 1, "Perfect": 0}
+
+    def test_mode(self):
+        with pytest.raises(ValueError):
+            ParallelMCTSAgent("MCTS", None, 2, "trunk")
@@ -0,0 +1,60 @@
+#!encoding: utf-8
+
+import concurrent.futures
+import io
+
+from gagarin.core.games.battle import Battle, BattleAgent
+from gagarin.core.profiler import Profiler, _Probe
+
+
+def battle():
+    game = Battle(20, seed=1)
+    game.add_agent(BattleAgent("Alice"))
+    game.add_agent(BattleAgent("Bob"))
+    return game
+
+
+class TestProfiler(object):
+    def test_statistics(self):
+        game = battle()
+        profiler = Profiler()
+        game.set_profiler(profiler)
+        game.mainloop()
+        stats = profiler.get_statistics()
+        assert stats[(None, "setup_board", None)][0] == 1
+        assert stats[("main", "prepare_phase", None)][0] == 20
+        assert stats[("main", "terminate_phase", None)][0] == 20
+        assert stats[("main", "take_actions", "Alice")][0] == 20
+        assert stats[("main", "resolve_action", "Bob")][0] == 20
+        #Legal actions are listed by agents while deciding
+        assert ("main", "list_legal_actions", "Alice") in stats
+        folded = profiler.get_folded()
+        assert any(line.startswith("main;take_actions;Alice;main;"
+                "list_legal_actions;Alice ") for line in folded)
+        assert len(profiler.report().splitlines()) == len(stats) + 1
+        output = io.StringIO()
+        profiler.write_folded(output)
+        assert output.getvalue().count("\n") == len(folded)
+
+    def test_detach(self):
+        game = battle()
+        profiler = Profiler()
+        game.set_profiler(profiler)
+        game.add_agent(BattleAgent("Carol"))
+        assert isinstance(game.get_agents()[2].__dict__["take_actions"],
+                _Probe)
+        game.set_profiler(None)
+        assert "resolve_action" not in game.__dict__
+        assert all("take_actions" not in agent.__dict__
+                for agent in game.get_agents())
+
+    def test_processes(self):
+        game = battle()
+        profiler = Profiler()
+        game.set_profiler(profiler)
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            game.set_executor(executor)
+            game.mainloop()
+        stats = profiler.get_statistics()
+        assert stats[("main", "resolve_action", "Alice")][0] == 20
+        assert ("main", "take_actions", "Alice") not in stats
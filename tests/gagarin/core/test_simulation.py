@@ -0,0 +1,59 @@
+#!encoding: utf-8
+
+import functools
+import random
+
+import pytest
+
+from gagarin.core.games.battle import Battle, BattleAgent
+from gagarin.core.simulation import SimulationRunner, play_game
+
+
+@pytest.fixture(scope="function")
+def runner():
+    yield SimulationRunner(functools.partial(Battle, 200),
+            [functools.partial(BattleAgent, "Alice"),
+            functools.partial(BattleAgent, "Bob")], workers=0, seed=42)
+
+
+class TestSimulation(object):
+    def test_play_game(self):
+        result = play_game(Battle, [functools.partial(BattleAgent, "Alice"),
+                functools.partial(BattleAgent, "Bob")], 0, 1)
+        assert set(result.scores) == {"Alice", "Bob"}
+        assert sum(result.scores.values()) == 52
+
+    def test_random_module(self, runner):
+        #Games are seeded through their own streams only
+        state = random.getstate()
+        runner.run(2)
+        assert random.getstate() == state
+
+    def test_statistics(self, runner):
+        results = runner.run(6)
+        assert [r.index for r in results] == list(range(6))
+        stats = runner.get_statistics()
+        assert stats.games == 6
+        assert sum(stats.wins.values()) + stats.draws == 6
+        assert stats.get_mean_score("Alice") + stats.get_mean_score("Bob") \
+                == 52
+        assert 0 <= stats.get_win_rate("Alice") <= 1
+
+    def test_seeds(self, runner):
+        #Games only depend on their seed
+        results = runner.run(4)
+        again = play_game(functools.partial(Battle, 200),
+                [functools.partial(BattleAgent, "Alice"),
+                functools.partial(BattleAgent, "Bob")], 2, results[2].seed)
+        assert again.scores == results[2].scores
+        assert len(set(r.seed for r in results)) == 4
+
+    def test_processes(self, runner):
+        parallel = SimulationRunner(functools.partial(Battle, 200),
+                [functools.partial(BattleAgent, "Alice"),
+                functools.partial(BattleAgent, "Bob")], workers=2,
+                chunk_size=3, seed=42)
+        results = parallel.run(8)
+        assert [r.scores for r in results] == [r.scores for r in
+                runner.run(8)]
+        assert parallel.get_statistics().games == 8
@@ -0,0 +1,98 @@
+#!encoding: utf-8
+
+import io
+
+import pytest
+
+from gagarin.core.board import Board
+from gagarin.core.zone import Zone
+from gagarin.core.deck import Deck
+from gagarin.core.card import Card
+from gagarin.core.die import Die, Face
+from gagarin.core.token import Token, TwoSidedToken, TokenPool
+from gagarin.core import snapshot
+
+
+class MyCard(Card):
+    def __init__(self, facevalue, colour):
+        Card.__init__(self, facevalue=facevalue, colour=colour)
+        self._score = len(facevalue)
+
+
+@pytest.fixture(scope="function")
+def board():
+    board = Board(name="Board", turn=3, ratio=0.5, tags=["a", "b"])
+    deck = Deck(name="Deck")
+    for c in ["S", "H"]:
+        for fv in ["A", "K", "Q", "10"]:
+            deck.add(MyCard(facevalue=fv, colour=c))
+    hand = Zone(name="Hand")
+    hand.add(deck.draw()[0].tap())
+    faces = [Face(value=v) for v in range(1, 7)]
+    die1 = Die(faces, colour="Red")
+    die2 = Die(faces, colour="Blue")
+    die2.set_visible_face(lambda x: x.get("value") == 4)
+    bank = TokenPool(name="Bank")
+    bank.put(Token(value=1), 30)
+    bank.put(Token(value=5), 7)
+    for c in [deck, hand, die1, die2, bank,
+            TwoSidedToken(Face(symbol="Gold"), Face(symbol="Iron")).flip()]:
+        board.add(c)
+    yield board
+
+
+class TestSnapshot(object):
+    @pytest.mark.parametrize("compression", [None, "zlib", "lzma"])
+    def test_round_trip(self, board, compression):
+        data = snapshot.dumps(board, compression)
+        other = snapshot.loads(data)
+        assert other is not board
+        assert other.get_hash() == board.get_hash()
+        assert other.get_hash() == other.compute_hash()
+        assert other.get("tags") == ["a", "b"] and other.ratio == 0.5
+        deck = other.search_component("name == 'Deck'")
+        assert [c.facevalue for c in deck] == [c.facevalue for c in
+                board.search_component("name == 'Deck'")]
+        card = other.search_component("name == 'Hand'").search_component(
+                lambda x: isinstance(x, MyCard))
+        assert card.is_tapped() and card._score == len(card.facevalue)
+        dice = other.search_all_components(lambda x: isinstance(x, Die))
+        assert dice[1].get_visible_face().get("value") == 4
+        #Shared faces are stored once
+        assert dice[0]._faces[3] is dice[1].get_visible_face()
+        assert other.search_component("name == 'Bank'").count(
+                Token(value=5)) == 7
+        #Loaded board is fully functional
+        other.turn += 1
+        deck.draw()
+        assert other.get_hash() == other.compute_hash()
+
+    def test_stream(self, board):
+        file = io.BytesIO()
+        with snapshot.SnapshotWriter(file, "zlib") as writer:
+            for i in range(5):
+                board.turn = i
+                writer.write(board)
+        file.seek(0)
+        turns = [b.turn for b in snapshot.SnapshotReader(file)]
+        assert turns == list(range(5))
+
+    def test_compact(self, board):
+        assert len(snapshot.dumps(board)) < len(board.create_memento())
+
+    def test_load_into(self, board):
+        other = Board()
+        snapshot.load(io.BytesIO(snapshot.dumps(board)), into=other)
+        assert other.get("name") == "Board"
+        assert other.get_hash() == board.get_hash()
+
+    def test_errors(self, board):
+        with pytest.raises(snapshot.SnapshotError):
+            snapshot.loads(b"PICKLE")
+        data = snapshot.dumps(Zone(name="Zone"))
+        with pytest.raises(snapshot.SnapshotError):
+            snapshot.loads(data, into=Deck())
+        with pytest.raises(snapshot.SnapshotError):
+            snapshot.dumps(Zone(value=object()))
+        with pytest.raises(snapshot.SnapshotError):
+            snapshot.loads(data[:-3])
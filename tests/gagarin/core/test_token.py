@@ -1,6 +1,9 @@
 import pytest
 
 from gagarin.core.token import Token, OneSidedToken, TwoSidedToken, Face
+from gagarin.core.token import TokenPool
+from gagarin.core.zone import Zone
+from gagarin.core.board import Board
 
 
 @pytest.fixture(scope="function")
@@ -42,3 +45,107 @@ class TestToken(object):
         token2.set_visible_face(lambda x: x.get("symbol") == "Research")
         assert token2.get_visible_face().get("symbol") == "Research"
         assert token2.get("color") == "Grey"
+
+
+@pytest.fixture(scope="function")
+def bank():
+    pool = TokenPool(name="Bank")
+    pool.put(Token(value=1), 50)
+    pool.put(Token(value=5), 20)
+    yield pool
+
+
+class TestTokenPool(object):
+    def test_put_and_count(self, bank):
+        assert len(bank) == 70
+        assert bank.count(Token(value=1)) == 50
+        assert bank.count("value == 5") == 20
+        assert bank.count(Token(value=10)) == 0
+        bank.add(Token(value=5))
+        assert bank.count(Token(value=5)) == 21
+        assert len(bank.kinds()) == 2
+
+    def test_take(self, bank):
+        assert bank.take(Token(value=1), 10) == 10
+        assert bank.count(Token(value=1)) == 40
+        assert bank.take(lambda x: x.get("value") == 5, 30) == 20
+        assert bank.count(Token(value=5)) == 0
+        assert len(bank.kinds()) == 1
+        bank.remove(Token(value=1))
+        assert len(bank) == 39
+
+    def test_transfer(self, bank):
+        purse = TokenPool(name="Purse")
+        assert bank.transfer(purse, Token(value=5), 3) == 3
+        assert purse.count(Token(value=5)) == 3
+        assert bank.count(Token(value=5)) == 17
+        assert purse.transfer(bank, Token(value=1)) == 0
+
+    def test_search(self, bank):
+        board = Zone(name="Board")
+        board.add(bank)
+        assert board.search_component("name == 'Bank'") is bank
+        assert board.search_component("value == 5").get("value") == 5
+        assert len(board.search_all_components("value == 5")) == 20
+        assert len(board.search_all_components(
+                lambda x: isinstance(x, Token))) == 70
+        assert sum(token.get("value") for token in bank) == 150
+
+    def test_apply(self, bank):
+        def devalue(token):
+            token.set("value", 1)
+        bank.apply(devalue, lambda x: isinstance(x, Token))
+        assert len(bank.kinds()) == 1
+        assert bank.count(Token(value=1)) == 70
+
+    def test_apply_shared(self, bank):
+        purse = TokenPool(name="Purse")
+        red = Token(value=1, colour="red")
+        bank.put(red, 2)
+        bank.transfer(purse, red, 2)
+        def paint(token):
+            token.set("colour", "blue")
+        bank.put(red)
+        bank.apply(paint, "colour == 'red'")
+        #Pools do not share prototypes, nor with the tokens put
+        assert bank.count(Token(value=1, colour="blue")) == 1
+        assert purse.count(Token(value=1, colour="red")) == 2
+        assert purse.count("colour == 'red'") == 2
+        assert red.get("colour") == "red"
+
+    def test_apply_rollback(self, bank):
+        board = Board(name="Board")
+        board.add(bank)
+        hash = board.get_hash()
+        checkpoint = board.checkpoint()
+        def devalue(token):
+            token.set("value", 0)
+        bank.apply(devalue, "value == 5")
+        assert bank.count(Token(value=0)) == 20
+        board.rollback(checkpoint)
+        assert bank.count(Token(value=0)) == 0
+        assert bank.count("value == 5") == 20
+        assert [p.get("value") for p, count in bank.kinds()] == [1, 5]
+        assert board.get_hash() == hash == board.compute_hash()
+
+    def test_unhashable(self, bank):
+        bank.put(Token(value=2, costs=[1, 2]), 3)
+        bank.put(Token(value=2, costs=[1, 2]))
+        bank.put(Token(value=2, costs={"gold": 1}))
+        assert len(bank.kinds()) == 4
+        assert bank.count(Token(value=2, costs=[1, 2])) == 4
+        assert bank.take(Token(value=2, costs=[1, 2]), 2) == 2
+        assert bank.count("value == 2") == 3
+
+    def test_take_kinds(self, bank):
+        bank.put(Token(value=10), 5)
+        #Tokens are taken from all matching kinds, in order of pool
+        assert bank.take(lambda x: x.get("value") >= 5, 22) == 22
+        assert bank.count(Token(value=5)) == 0
+        assert bank.count(Token(value=10)) == 3
+        assert bank.count(lambda x: x.get("value") >= 5) == 3
+        purse = TokenPool(name="Purse")
+        assert bank.transfer(purse, lambda x: x.get("value") != 5, 52) == 52
+        assert purse.count(Token(value=1)) == 50
+        assert purse.count(Token(value=10)) == 2
+        assert len(bank) == 1
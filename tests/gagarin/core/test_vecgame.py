@@ -0,0 +1,81 @@
+#!encoding: utf-8
+
+import functools
+
+import pytest
+
+from gagarin.core.games.battle import Battle, BattleAgent
+from gagarin.core.vecgame import VecGame
+
+
+class BatchAgent(BattleAgent):
+    def __init__(self, name):
+        super(BatchAgent, self).__init__(name)
+        self.batches = [ ]
+        self.resets = 0
+
+    def take_actions_batch(self, games, phase):
+        self.batches.append(len(games))
+        return super(BatchAgent, self).take_actions_batch(games, phase)
+
+    def reset(self):
+        self.resets += 1
+
+
+class NoSpaceBattle(Battle):
+    def get_action_space(self):
+        raise NotImplementedError
+
+
+@pytest.fixture(scope="function")
+def agents():
+    yield [BatchAgent("A"), BatchAgent("B")]
+
+
+class TestVecGame(object):
+    def test_step(self, agents):
+        vec = VecGame(functools.partial(Battle, 5), agents, 8).reset()
+        assert len(vec.get_pending_decisions()) == 16
+        step = vec.step()
+        #One batched call per agent for all games
+        assert agents[0].batches == [8] and agents[1].batches == [8]
+        assert len(step.decisions) == 16
+        assert len(step.observations) == 16
+        assert list(step.observations[0])[:4] == [1, 26, 0, 0]
+        #Actions are given by their ids in action space
+        space = vec.get_games()[0].get_action_space()
+        assert step.actions.shape == step.action_mask.shape == (16, 1)
+        assert space.decode_all(step.actions[0][step.action_mask[0]]) == \
+                [('Play', 'face up')]
+        assert not any(step.dones)
+        assert len(vec.get_observations(agents[0])) == 8
+
+    def test_auto_reset(self, agents):
+        vec = VecGame(functools.partial(Battle, 3), agents, 4).reset()
+        dones = [ ]
+        for i in range(3):
+            step = vec.step()
+            dones.append(list(step.dones))
+        assert dones[-1] == [True] * 4
+        assert all(sum(s.values()) == 52 for s in step.scores)
+        assert vec.count_episodes() == 4
+        #Games have started again
+        assert all(g.get_board().turn == 1 for g in vec.get_games())
+
+    def test_shared_agents(self, agents):
+        vec = VecGame(functools.partial(Battle, 2, seed=1), agents, 4).reset()
+        for i in range(5):
+            vec.step()
+        assert vec.count_episodes() == 8
+        #Agents are reset once, not by every game, and are not reseeded
+        assert agents[0].resets == agents[1].resets == 1
+        assert all(agent._random is None for agent in agents)
+        vec.reset()
+        assert agents[0].resets == 2
+
+    def test_no_action_space(self, agents):
+        vec = VecGame(functools.partial(NoSpaceBattle, 5), agents, 2).reset()
+        step = vec.step()
+        #Actions are stacked as they are
+        assert list(step.actions[0]) == [('Play', 'face up')]
+        assert step.action_mask is None
@@ -0,0 +1,19 @@
+#!encoding: utf-8
+
+from gagarin.core import zobrist
+
+
+class TestValueKey(object):
+    def test_numbers(self):
+        values = [0, 1, -1, -2, 2, True, False, 1.0, 0.0, -0.0, 2 ** 61 - 1,
+                2 ** 63, -2 ** 63, 2 ** 64 - 1, 2 ** 64, -2 ** 64, 2 ** 128,
+                -2 ** 128, 2 ** 128 + 1, None, "1"]
+        keys = [zobrist.value_key(v) for v in values]
+        assert len(set(keys)) == len(values)
+
+    def test_stable(self):
+        assert zobrist.value_key(12) == zobrist.value_key(12)
+        assert zobrist.value_key(2 ** 100) == zobrist.value_key(2 ** 100)
+        assert zobrist.value_key((1, "a", None)) == \
+                zobrist.value_key([1, "a", None])
+        assert zobrist.value_key((1, 2)) != zobrist.value_key((2, 1))